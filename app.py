@@ -1,8 +1,12 @@
-import sqlite3
+import functools
 import json
 import os
+import shutil
+import sqlite3
 import sys
-from flask import Flask, jsonify, request, send_file
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, jsonify, make_response, request, send_file, stream_with_context, url_for
 from flask_cors import CORS
 from datetime import datetime
 from werkzeug.utils import secure_filename
@@ -14,112 +18,37 @@ try:
 except ImportError:
     print("Warning: ASR module not found. Audio transcription will be skipped.")
     transcribe_audio = None
+from movi.asr_pool import ASRBusy
+from movi.assignments import AssignmentError, assign, parse_assignments
+from movi.bulk import BulkError, DEFAULT_BATCH_SIZE, detect_format, export_rows, get_entity, import_records, read_records
+from movi.changes import ChangeHub, latest_seq, oldest_seq, register_hub, trim_feed
+from movi.db import get_db, get_read_db, database_path
+from movi.listing import ListError, ListSpec, iter_json_array
+from movi.migrations import drop_all, migrate
+from movi.query_cache import bump_tables
+from movi.response_cache import response_cache
+from movi.snapshot import get_snapshot
+from movi.stats import read_stats
+from movi.warmup import readiness, start_warmup
+from movi.metrics import REQUEST_DURATION, render as render_metrics
 
 app = Flask(__name__)
-CORS(app)
-
-DATABASE = 'moveinsync.db'
+# Let browser clients read the pagination and caching headers
+CORS(app, expose_headers=['X-Next-Cursor', 'Link', 'ETag'])
 
-def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+def init_db(reset=False):
+    """
+    Creates the schema or upgrades an existing database in place.
 
-def init_db():
+    Args:
+        reset: Drop every table first (fresh, empty database)
+    """
     conn = get_db()
-    cursor = conn.cursor()
-    
-    # Drop existing tables
-    cursor.execute('DROP TABLE IF EXISTS Deployments')
-    cursor.execute('DROP TABLE IF EXISTS DailyTrips')
-    cursor.execute('DROP TABLE IF EXISTS Routes')
-    cursor.execute('DROP TABLE IF EXISTS Paths')
-    cursor.execute('DROP TABLE IF EXISTS Stops')
-    cursor.execute('DROP TABLE IF EXISTS Vehicles')
-    cursor.execute('DROP TABLE IF EXISTS Drivers')
-    
-    # Create Stops table
-    cursor.execute('''
-        CREATE TABLE Stops (
-            stop_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            latitude REAL NOT NULL,
-            longitude REAL NOT NULL
-        )
-    ''')
-    
-    # Create Paths table (stores ordered list as JSON)
-    cursor.execute('''
-        CREATE TABLE Paths (
-            path_id TEXT PRIMARY KEY,
-            path_name TEXT NOT NULL,
-            ordered_list_of_stop_ids TEXT NOT NULL
-        )
-    ''')
-    
-    # Create Routes table
-    cursor.execute('''
-        CREATE TABLE Routes (
-            route_id TEXT PRIMARY KEY,
-            path_id TEXT NOT NULL,
-            route_display_name TEXT NOT NULL,
-            shift_time TEXT NOT NULL,
-            direction TEXT NOT NULL,
-            start_point TEXT NOT NULL,
-            end_point TEXT NOT NULL,
-            capacity INTEGER NOT NULL,
-            allowed_waitlist INTEGER NOT NULL,
-            status TEXT NOT NULL DEFAULT 'active',
-            FOREIGN KEY (path_id) REFERENCES Paths(path_id)
-        )
-    ''')
-    
-    # Create Vehicles table
-    cursor.execute('''
-        CREATE TABLE Vehicles (
-            vehicle_id TEXT PRIMARY KEY,
-            license_plate TEXT NOT NULL UNIQUE,
-            type TEXT NOT NULL,
-            capacity INTEGER NOT NULL
-        )
-    ''')
-    
-    # Create Drivers table
-    cursor.execute('''
-        CREATE TABLE Drivers (
-            driver_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            phone_number TEXT NOT NULL
-        )
-    ''')
-    
-    # Create DailyTrips table
-    cursor.execute('''
-        CREATE TABLE DailyTrips (
-            trip_id TEXT PRIMARY KEY,
-            route_id TEXT NOT NULL,
-            display_name TEXT NOT NULL,
-            booking_status_percentage INTEGER NOT NULL,
-            live_status TEXT NOT NULL,
-            FOREIGN KEY (route_id) REFERENCES Routes(route_id)
-        )
-    ''')
-    
-    # Create Deployments table
-    cursor.execute('''
-        CREATE TABLE Deployments (
-            deployment_id TEXT PRIMARY KEY,
-            trip_id TEXT NOT NULL,
-            vehicle_id TEXT,
-            driver_id TEXT,
-            FOREIGN KEY (trip_id) REFERENCES DailyTrips(trip_id),
-            FOREIGN KEY (vehicle_id) REFERENCES Vehicles(vehicle_id),
-            FOREIGN KEY (driver_id) REFERENCES Drivers(driver_id)
-        )
-    ''')
-    
-    conn.commit()
+    if reset:
+        drop_all(conn)
+    migrate(conn)
     conn.close()
+    bump_tables()
 
 def populate_dummy_data():
     conn = get_db()
@@ -217,31 +146,212 @@ def populate_dummy_data():
     
     conn.commit()
     conn.close()
+    bump_tables()
 
 # API Endpoints
 
+# List endpoints: keyset pagination (?limit=&cursor=), filters and ?fields= projection.
+# Without limit the whole (filtered) list is returned; the body is always a JSON array
+# and the next page's cursor is sent in the X-Next-Cursor / Link headers.
+STOPS_LIST = ListSpec(
+    'Stops',
+    {'stop_id': 'stop_id', 'name': 'name', 'latitude': 'latitude', 'longitude': 'longitude'},
+    ['stop_id'],
+)
+
+VEHICLES_LIST = ListSpec(
+    'Vehicles v',
+    {'vehicle_id': 'v.vehicle_id', 'license_plate': 'v.license_plate', 'type': 'v.type', 'capacity': 'v.capacity'},
+    ['v.vehicle_id'],
+    {
+        'type': ('v.type = ?', str),
+        'unassigned': ('NOT EXISTS (SELECT 1 FROM Deployments d WHERE d.vehicle_id = v.vehicle_id)', None),
+    },
+)
+
+DRIVERS_LIST = ListSpec(
+    'Drivers dr',
+    {'driver_id': 'dr.driver_id', 'name': 'dr.name', 'phone_number': 'dr.phone_number'},
+    ['dr.driver_id'],
+    {
+        'unassigned': ('NOT EXISTS (SELECT 1 FROM Deployments d WHERE d.driver_id = dr.driver_id)', None),
+    },
+)
+
+DEPLOYMENTS_LIST = ListSpec(
+    'Deployments d',
+    {'deployment_id': 'd.deployment_id', 'trip_id': 'd.trip_id', 'vehicle_id': 'd.vehicle_id', 'driver_id': 'd.driver_id'},
+    ['d.deployment_id'],
+    {
+        'trip_id': ('d.trip_id = ?', str),
+        'vehicle_id': ('d.vehicle_id = ?', str),
+        'driver_id': ('d.driver_id = ?', str),
+        'unassigned': ('d.vehicle_id IS NULL', None),
+    },
+)
+
+DAILY_TRIPS_LIST = ListSpec(
+    '''DailyTrips dt
+        LEFT JOIN Routes r ON dt.route_id = r.route_id
+        LEFT JOIN Deployments d ON dt.trip_id = d.trip_id
+        LEFT JOIN Vehicles v ON d.vehicle_id = v.vehicle_id
+        LEFT JOIN Drivers dr ON d.driver_id = dr.driver_id''',
+    {
+        'trip_id': 'dt.trip_id',
+        'route_id': 'dt.route_id',
+        'display_name': 'dt.display_name',
+        'booking_status_percentage': 'dt.booking_status_percentage',
+        'live_status': 'dt.live_status',
+        'route_name': 'r.route_display_name',
+        'deployment_id': 'd.deployment_id',
+        'vehicle_id': 'd.vehicle_id',
+        'driver_id': 'd.driver_id',
+        'license_plate': 'v.license_plate',
+        'vehicle_type': 'v.type',
+        'driver_name': 'dr.name',
+        'driver_phone': 'dr.phone_number',
+    },
+    # Sorted by display_name; trip_id and deployment_id make the key unique
+    ['dt.display_name', 'dt.trip_id', "ifnull(d.deployment_id, '')"],
+    {
+        'route_id': ('dt.route_id = ?', str),
+        'status': ('dt.live_status = ?', str),
+        'vehicle_id': ('d.vehicle_id = ?', str),
+        'driver_id': ('d.driver_id = ?', str),
+        'min_booking': ('dt.booking_status_percentage >= ?', int),
+        'unassigned': ('d.vehicle_id IS NULL', None),
+    },
+)
+# Live deltas of DAILY_TRIPS_LIST, fed by the ChangeFeed triggers
+trip_changes = register_hub(ChangeHub(DAILY_TRIPS_LIST, 'dt.trip_id'))
+
+def cached_get(*tables):
+    """
+    Conditional GET and response caching for a read endpoint.
+
+    The ETag follows the versions of tables (moved by triggers on every write,
+    from any connection), so If-None-Match answers 304 and repeat requests are
+    served from memory until one of them changes.
+
+    Args:
+        tables: Every table the endpoint reads, joins included
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            etag, body = response_cache.lookup(key, tables)
+            # no-cache: browsers keep the body but revalidate on every fetch
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+            if request.if_none_match.contains(etag):
+                response_cache.record('not_modified')
+                return Response(status=304, headers=headers)
+            if body is not None:
+                response_cache.record('hits')
+                return Response(body, mimetype='application/json', headers=headers)
+            
+            response_cache.record('misses')
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.headers.update(headers)
+            if response.is_streamed:
+                response.response = response_cache.capture(key, tables, etag, response.response)
+            else:
+                response_cache.store(key, tables, etag, response.get_data())
+            return response
+        wrapper.cached_tables = tables
+        return wrapper
+    return decorator
+
+def _list_response(spec):
+    """Streams one page of a list endpoint as a JSON array."""
+    conn = get_read_db()
+    try:
+        rows, fields, next_cursor = spec.page(conn, request.args)
+    except ListError as e:
+        conn.close()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception:
+        conn.close()
+        raise
+    
+    headers = {}
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        headers['X-Next-Cursor'] = next_cursor
+        headers['Link'] = f'<{url_for(request.endpoint, _external=True, **args)}>; rel="next"'
+    
+    def generate():
+        try:
+            yield from iter_json_array(rows, fields)
+        finally:
+            conn.close()
+    
+    return Response(generate(), mimetype='application/json', headers=headers)
+
 @app.route('/api/stops', methods=['GET'])
+@cached_get('Stops')
 def get_stops():
+    return _list_response(STOPS_LIST)
+
+@app.route('/api/paths', methods=['GET'])
+@cached_get('Paths')
+def get_paths():
+    # SQLite builds the JSON body directly - no per-row json.loads/jsonify round trip
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM Stops')
-    stops = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('''
+        SELECT json_group_array(json_object(
+            'path_id', path_id,
+            'path_name', path_name,
+            'ordered_list_of_stop_ids', json(ordered_list_of_stop_ids)
+        ))
+        FROM Paths
+    ''')
+    body = cursor.fetchone()[0]
     conn.close()
-    return jsonify(stops)
+    return Response(body, mimetype='application/json')
 
-@app.route('/api/paths', methods=['GET'])
-def get_paths():
+@app.route('/api/stops/<stop_ref>/paths', methods=['GET'])
+@cached_get('Stops', 'Paths', 'PathStops', 'Routes')
+def get_stop_paths(stop_ref):
+    # Reverse lookup: which paths and routes pass through a stop (by stop_id or name)
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM Paths')
+    cursor.execute('''
+        SELECT * FROM Stops WHERE stop_id = ?
+        UNION ALL
+        SELECT * FROM Stops WHERE name = ? COLLATE NOCASE
+        LIMIT 1
+    ''', (stop_ref, stop_ref))
+    stop = cursor.fetchone()
+    if stop is None:
+        conn.close()
+        return jsonify({'success': False, 'message': 'Stop not found'}), 404
+    
+    cursor.execute('''
+        SELECT ps.path_id, p.path_name, ps.seq
+        FROM PathStops ps
+        JOIN Paths p ON p.path_id = ps.path_id
+        WHERE ps.stop_id = ?
+        ORDER BY ps.path_id, ps.seq
+    ''', (stop['stop_id'],))
     paths = [dict(row) for row in cursor.fetchall()]
-    # Parse JSON for ordered_list_of_stop_ids
-    for path in paths:
-        path['ordered_list_of_stop_ids'] = json.loads(path['ordered_list_of_stop_ids'])
+    
+    cursor.execute('''
+        SELECT r.*
+        FROM Routes r
+        WHERE r.path_id IN (SELECT path_id FROM PathStops WHERE stop_id = ?)
+        ORDER BY r.route_id
+    ''', (stop['stop_id'],))
+    routes = [dict(row) for row in cursor.fetchall()]
     conn.close()
-    return jsonify(paths)
+    return jsonify({'stop': dict(stop), 'paths': paths, 'routes': routes})
 
 @app.route('/api/routes', methods=['GET'])
+@cached_get('Routes')
 def get_routes():
     status = request.args.get('status')
     conn = get_db()
@@ -301,6 +411,7 @@ def update_route(route_id):
     cursor.execute(query, values)
     conn.commit()
     conn.close()
+    bump_tables('Routes')
     return jsonify({'success': True, 'message': 'Route updated successfully'})
 
 @app.route('/api/routes/<route_id>', methods=['DELETE'])
@@ -310,6 +421,7 @@ def delete_route(route_id):
     cursor.execute('DELETE FROM Routes WHERE route_id = ?', (route_id,))
     conn.commit()
     conn.close()
+    bump_tables('Routes')
     return jsonify({'success': True, 'message': 'Route deleted successfully'})
 
 @app.route('/api/routes', methods=['POST'])
@@ -333,64 +445,28 @@ def create_route():
     ))
     conn.commit()
     conn.close()
+    bump_tables('Routes')
     return jsonify({'success': True, 'message': 'Route created successfully'})
 
 @app.route('/api/vehicles', methods=['GET'])
+@cached_get('Vehicles', 'Deployments')
 def get_vehicles():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM Vehicles')
-    vehicles = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(vehicles)
+    return _list_response(VEHICLES_LIST)
 
 @app.route('/api/drivers', methods=['GET'])
+@cached_get('Drivers', 'Deployments')
 def get_drivers():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM Drivers')
-    drivers = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(drivers)
+    return _list_response(DRIVERS_LIST)
 
 @app.route('/api/daily-trips', methods=['GET'])
+@cached_get('DailyTrips', 'Routes', 'Deployments', 'Vehicles', 'Drivers')
 def get_daily_trips():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT 
-            dt.trip_id,
-            dt.route_id,
-            dt.display_name,
-            dt.booking_status_percentage,
-            dt.live_status,
-            r.route_display_name as route_name,
-            d.deployment_id,
-            d.vehicle_id,
-            d.driver_id,
-            v.license_plate,
-            v.type as vehicle_type,
-            dr.name as driver_name,
-            dr.phone_number as driver_phone
-        FROM DailyTrips dt
-        LEFT JOIN Routes r ON dt.route_id = r.route_id
-        LEFT JOIN Deployments d ON dt.trip_id = d.trip_id
-        LEFT JOIN Vehicles v ON d.vehicle_id = v.vehicle_id
-        LEFT JOIN Drivers dr ON d.driver_id = dr.driver_id
-        ORDER BY dt.display_name
-    ''')
-    trips = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(trips)
+    return _list_response(DAILY_TRIPS_LIST)
 
 @app.route('/api/deployments', methods=['GET'])
+@cached_get('Deployments')
 def get_deployments():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM Deployments')
-    deployments = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(deployments)
+    return _list_response(DEPLOYMENTS_LIST)
 
 @app.route('/api/deployments/<deployment_id>', methods=['PUT'])
 def update_deployment(deployment_id):
@@ -404,8 +480,33 @@ def update_deployment(deployment_id):
     ''', (data.get('vehicle_id'), data.get('driver_id'), deployment_id))
     conn.commit()
     conn.close()
+    bump_tables('Deployments')
     return jsonify({'success': True, 'message': 'Deployment updated successfully'})
 
+@app.route('/api/deployments/assign', methods=['POST'])
+def assign_deployments():
+    """
+    Applies many vehicle/driver assignments in one transaction, rejecting
+    double-bookings and under-capacity vehicles. ?atomic=0 applies the ones that pass.
+    """
+    try:
+        assignments = parse_assignments(request.get_json(silent=True))
+    except AssignmentError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    atomic = request.args.get('atomic', '1').lower() not in ('0', 'false', 'no')
+    
+    conn = get_db()
+    try:
+        summary = assign(conn, assignments, atomic=atomic)
+    finally:
+        conn.close()
+    if summary['applied']:
+        bump_tables('Deployments')
+    print(f"[ASSIGN] {summary['applied']} applied, {summary['rejected']} rejected (atomic={atomic})")
+    success = summary['rejected'] == 0
+    # 409: an atomic batch with conflicts was not applied
+    return jsonify({'success': success, **summary}), 200 if success or not atomic else 409
+
 @app.route('/api/deployments/<deployment_id>', methods=['DELETE'])
 def delete_deployment(deployment_id):
     conn = get_db()
@@ -417,34 +518,101 @@ def delete_deployment(deployment_id):
     ''', (deployment_id,))
     conn.commit()
     conn.close()
+    bump_tables('Deployments')
     return jsonify({'success': True, 'message': 'Deployment removed successfully'})
 
 @app.route('/api/stats', methods=['GET'])
+@cached_get('DashboardStats', 'RouteStats')
 def get_stats():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) as count FROM DailyTrips')
-    total_trips = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(*) as count FROM Vehicles')
-    total_vehicles = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(*) as count FROM Drivers')
-    total_drivers = cursor.fetchone()['count']
-    
+    # Materialized by triggers (movi/stats.py) - no COUNT(*) scans
+    conn = get_read_db()
+    stats = read_stats(conn)
     conn.close()
-    
-    return jsonify({
-        'total_trips': total_trips,
-        'total_vehicles': total_vehicles,
-        'total_drivers': total_drivers
-    })
+    return jsonify(stats)
 
 @app.route('/api/export/db', methods=['GET'])
 def export_db():
-    # Stream the SQLite database file for download
-    return send_file(DATABASE, as_attachment=True, download_name='moveinsync.db')
+    # Consistent online-backup snapshot, rebuilt in the background after a write; gzip unless
+    # ?gzip=0. send_file handles Range, If-Range and If-None-Match against the snapshot's ETag
+    snapshot = get_snapshot()
+    if snapshot is None:
+        response = jsonify({'success': False, 'message': 'Snapshot is being built, please retry shortly'})
+        response.headers['Retry-After'] = '2'
+        return response, 202
+    if request.args.get('gzip', '1').lower() in ('0', 'false', 'no'):
+        return send_file(snapshot.raw_path, mimetype='application/vnd.sqlite3', as_attachment=True,
+                         download_name='moveinsync.db', etag=f'{snapshot.etag}-raw', conditional=True)
+    return send_file(snapshot.gzip_path, mimetype='application/gzip', as_attachment=True,
+                     download_name='moveinsync.db.gz', etag=snapshot.etag, conditional=True)
+
+@app.route('/api/import/<entity>', methods=['POST'])
+def bulk_import(entity):
+    """
+    Bulk-loads CSV or NDJSON, sent as the request body or as a 'file' upload.
+    Query parameters: format, batch_size, on_conflict (error|ignore|replace), atomic=1
+    """
+    upload = request.files.get('file')
+    try:
+        spec = get_entity(entity)
+        fmt = detect_format(request.args.get('format'), upload.filename if upload else None, request.mimetype)
+    except BulkError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    try:
+        batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'batch_size must be an integer'}), 400
+    
+    records = read_records(upload.stream if upload else request.stream, fmt, spec)
+    conn = get_db()
+    summary = None
+    try:
+        summary = import_records(
+            conn, spec, records,
+            batch_size=batch_size,
+            on_conflict=request.args.get('on_conflict', 'error'),
+            atomic=request.args.get('atomic', '').lower() in ('1', 'true', 'yes'),
+        )
+    except BulkError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    finally:
+        conn.close()
+        # Without a summary the import failed part-way, possibly after committing batches
+        if summary is None or summary['inserted']:
+            bump_tables(spec.table)
+    print(f"[IMPORT] {spec.table}: {summary['inserted']}/{summary['rows']} rows, {summary['error_count']} errors")
+    return jsonify({'success': summary['error_count'] == 0, 'format': fmt, **summary})
+
+@app.route('/api/export/<entity>', methods=['GET'])
+def bulk_export(entity):
+    try:
+        spec = get_entity(entity)
+        fmt = detect_format(request.args.get('format', 'csv'))
+    except BulkError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    conn = get_read_db()
+    def generate():
+        try:
+            yield from export_rows(conn, spec, fmt)
+        finally:
+            conn.close()
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{entity}.{fmt}"
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    # Under servers that never run __main__, the first probe starts the warm-up
+    start_warmup()
+    status = readiness()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text exposition format
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/src/audio/<filename>', methods=['GET'])
 def serve_audio(filename):
@@ -454,99 +622,135 @@ def serve_audio(filename):
         return send_file(audio_path)
     return jsonify({'error': 'Audio file not found'}), 404
 
+# Keep a copy of uploaded voice messages (off the request path); MOVI_PERSIST_UPLOADS=0 skips it
+PERSIST_UPLOADS = os.getenv("MOVI_PERSIST_UPLOADS", "1") != "0"
+_upload_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='movi-upload')
+
+def _upload_name(upload, default_ext):
+    """Timestamped, sanitized name for an upload"""
+    filename = secure_filename(upload.filename)
+    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+    name, ext = os.path.splitext(filename)
+    return f"{name}_{ts}{ext or default_ext}"
+
+def _save_upload(files, field, subdir, default_ext):
+    """Save an uploaded file under frontend/src/<subdir>; returns (final_name, path) or (None, None)"""
+    upload = files.get(field)
+    if not upload or not upload.filename:
+        return None, None
+    final_name = _upload_name(upload, default_ext)
+    target_dir = os.path.join('frontend', 'src', subdir)
+    os.makedirs(target_dir, exist_ok=True)
+    target_path = os.path.join(target_dir, final_name)
+    upload.save(target_path)
+    return final_name, target_path
+
+def _read_upload(files, field, subdir, default_ext):
+    """
+    Read an uploaded file into memory; returns (final_name, bytes) or (None, None).
+    With MOVI_PERSIST_UPLOADS on, a copy is written under frontend/src/<subdir> in the background;
+    with it off, final_name is None since no file by that name will exist.
+    """
+    upload = files.get(field)
+    if not upload or not upload.filename:
+        return None, None
+    data = upload.read()
+    if not PERSIST_UPLOADS:
+        return None, data
+    final_name = _upload_name(upload, default_ext)
+    _upload_writer.submit(_write_upload, os.path.join('frontend', 'src', subdir), final_name, data)
+    return final_name, data
+
+def _write_upload(target_dir, final_name, data):
+    try:
+        os.makedirs(target_dir, exist_ok=True)
+        with open(os.path.join(target_dir, final_name), 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        print(f"[UPLOAD] Could not persist {final_name}: {e}")
+
+def _collect_movi_request(form, files, headers):
+    """Read the multipart Movi request (text/audio/image) into agent arguments"""
+    saved = {}
+    
+    # Audio is transcribed straight from memory; it is only reported as saved if a copy is kept
+    audio_name, audio_data = _read_upload(files, 'audio', 'audio', '.wav')
+    if audio_name:
+        saved['audio'] = audio_name
+
+    # Save image if present
+    image_name, image_path = _save_upload(files, 'image', 'images', '.png')
+    if image_name:
+        saved['image'] = image_name
+
+    # Determine message type
+    message_type = "text"
+    if audio_data:
+        message_type = "audio"
+    elif image_path:
+        message_type = "image"
+
+    return saved, {
+        # Get user ID from session or generate one
+        'user_id': headers.get('X-User-ID', 'default_user'),
+        'message_type': message_type,
+        # Capture text if present
+        'content': form.get('text', '').strip(),
+        'audio_data': audio_data,
+        'image_path': image_path,
+        # Get current page context
+        'current_page': form.get('currentPage', 'busDashboard'),
+        'thread_id': form.get('thread_id'),  # frontend-provided thread_id
+    }
+
+def _publish_tts_audio(tts_audio_path):
+    """Copy TTS audio to the frontend audio directory; returns its URL or None"""
+    if not tts_audio_path or not os.path.exists(tts_audio_path):
+        return None
+    tts_filename = os.path.basename(tts_audio_path)
+    target_dir = os.path.join('frontend', 'src', 'audio')
+    os.makedirs(target_dir, exist_ok=True)
+    target_path = os.path.join(target_dir, f"{tts_filename}")
+    shutil.copy2(tts_audio_path, target_path)
+    return f"/src/audio/{os.path.basename(target_path)}"
+
 @app.route('/api/movi', methods=['POST'])
 def movi_ingest():
     # Accept text/image/audio; process through Tribal Knowledge agent
     from movi.chat import run_movi_agent
     
-    saved = {}
+    start = time.perf_counter()
     response_message = ""
     needs_confirmation = False
     audio_url = None
     
-    # Get user ID from session or generate one
-    user_id = request.headers.get('X-User-ID', 'default_user')
-    
-    # Get current page context
-    current_page = request.form.get('currentPage', 'busDashboard')
-    
-    # Save and process audio if present
-    audio_path = None
-    if 'audio' in request.files:
-        audio_file = request.files['audio']
-        if audio_file and audio_file.filename:
-            filename = secure_filename(audio_file.filename)
-            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-            name, ext = os.path.splitext(filename)
-            final_name = f"{name}_{ts}{ext or '.wav'}"
-            target_dir = os.path.join('frontend', 'src', 'audio')
-            os.makedirs(target_dir, exist_ok=True)
-            target_path = os.path.join(target_dir, final_name)
-            audio_file.save(target_path)
-            saved['audio'] = final_name
-            audio_path = target_path
-
-    # Save image if present
-    image_path = None
-    if 'image' in request.files:
-        image_file = request.files['image']
-        if image_file and image_file.filename:
-            filename = secure_filename(image_file.filename)
-            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-            name, ext = os.path.splitext(filename)
-            final_name = f"{name}_{ts}{ext or '.png'}"
-            target_dir = os.path.join('frontend', 'src', 'images')
-            os.makedirs(target_dir, exist_ok=True)
-            target_path = os.path.join(target_dir, final_name)
-            image_file.save(target_path)
-            saved['image'] = final_name
-            image_path = target_path
-
-    # Capture text if present
-    text_value = request.form.get('text', '').strip()
-    
-    # Determine message type and process through agent
-    message_type = "text"
-    if audio_path:
-        message_type = "audio"
-    elif image_path:
-        message_type = "image"
+    saved, agent_args = _collect_movi_request(request.form, request.files, request.headers)
+    thread_id_return = agent_args['thread_id']
     
     # Process through chat agent
     try:
-        thread_id_input = request.form.get("thread_id")
-        result = run_movi_agent(
-            user_id=user_id,
-            message_type=message_type,
-            content=text_value,
-            audio_path=audio_path,
-            image_path=image_path,
-            current_page=current_page,
-            thread_id=thread_id_input  # <-- pass the frontend-provided thread_id
-        )
+        result = run_movi_agent(**agent_args)
         response_message = result.get('response', 'I received your message.')
         needs_confirmation = result.get('needs_confirmation', False)
         thread_id_return = result.get('thread_id')  # always return thread_id
 
         # Handle TTS audio file
-        tts_audio_path = result.get('audio_path')
-        if tts_audio_path and os.path.exists(tts_audio_path):
-            # Copy TTS audio to frontend audio directory
-            tts_filename = os.path.basename(tts_audio_path)
-            target_dir = os.path.join('frontend', 'src', 'audio')
-            os.makedirs(target_dir, exist_ok=True)
-            target_path = os.path.join(target_dir, f"{tts_filename}")
-            import shutil
-            shutil.copy2(tts_audio_path, target_path)
-            audio_url = f"/src/audio/{os.path.basename(target_path)}"
-            saved['tts_audio'] = f"+{os.path.basename(target_path)}"
+        audio_url = _publish_tts_audio(result.get('audio_path'))
+        if audio_url:
+            saved['tts_audio'] = f"+{os.path.basename(audio_url)}"
+    except ASRBusy:
+        # Backpressure from the Whisper worker pool: ask the client to retry
+        response = jsonify({'success': False, 'saved': saved, 'thread_id': thread_id_return,
+                            'message': 'Speech recognition is busy, please retry shortly'})
+        response.headers['Retry-After'] = '2'
+        return response, 503
     except Exception as e:
         print(f"[ERROR] Chat agent processing failed: {e}")
         import traceback
         traceback.print_exc()
         response_message = "I encountered an error. Please try again."
-        thread_id_return = thread_id_input if 'thread_id_input' in locals() else None
 
+    REQUEST_DURATION.observe(time.perf_counter() - start, endpoint='/api/movi')
     return jsonify({
         'success': True,
         'saved': saved,
@@ -556,28 +760,149 @@ def movi_ingest():
         'thread_id': thread_id_return,  # Return thread_id in response always
     })
 
+def _sse(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/movi/stream', methods=['POST'])
+def movi_stream():
+    """
+    Streaming variant of /api/movi (Server-Sent Events).
+    Events: start, thread, transcript, node, token, confirmation_required,
+    response, audio, error, done
+    """
+    from movi.chat import stream_movi_agent
+    
+    # Uploads must be read before the request context is gone
+    start = time.perf_counter()
+    saved, agent_args = _collect_movi_request(request.form, request.files, request.headers)
+
+    def generate():
+        # Flush something immediately so the client gets its first byte
+        yield _sse('start', {'saved': saved})
+        try:
+            for event, data in stream_movi_agent(**agent_args):
+                if event == 'audio':
+                    data = {'audio_url': _publish_tts_audio(data.get('audio_path'))}
+                yield _sse(event, data)
+        except ASRBusy:
+            yield _sse('error', {'response': "Speech recognition is busy, please retry shortly.", 'busy': True})
+        except Exception as e:
+            print(f"[ERROR] Chat agent streaming failed: {e}")
+            import traceback
+            traceback.print_exc()
+            yield _sse('error', {'response': "I encountered an error. Please try again."})
+        yield _sse('done', {})
+        REQUEST_DURATION.observe(time.perf_counter() - start, endpoint='/api/movi/stream')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _change_seq(value):
+    if value in (None, ''):
+        return None
+    seq = int(value)
+    if seq < 0:
+        raise ValueError
+    return seq
+
+@app.route('/api/changes/stream', methods=['GET'])
+def trip_changes_stream():
+    """
+    Live /api/daily-trips deltas (Server-Sent Events).
+    Events: change ({seq, trip_id, op, rows} - rows replace the trip's rows),
+    ready (caught up), reset (since no longer retained: reload the list).
+    Resumes after ?since= or the Last-Event-ID header sent on reconnect.
+    """
+    try:
+        since = _change_seq(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since must be a non-negative integer'}), 400
+
+    def generate():
+        yield "retry: 3000\n\n"
+        for item in trip_changes.stream(since):
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            event, data, seq = item
+            yield _sse(event, data, seq)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/changes', methods=['GET'])
+def trip_changes_poll():
+    """Polling fallback for /api/changes/stream: deltas after ?since=, at most ?limit= feed entries."""
+    try:
+        since = _change_seq(request.args.get('since')) or 0
+        limit = min(int(request.args.get('limit', 500)), 5000)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since and limit must be integers'}), 400
+    conn = get_read_db()
+    try:
+        head = latest_seq(conn)
+        if since < oldest_seq(conn) - 1 or since > head:
+            return jsonify({'success': True, 'reset': True, 'seq': head, 'changes': []})
+        changes, seq = trip_changes.read(conn, since, limit=max(limit, 1))
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'reset': False, 'seq': seq, 'changes': changes})
+
+@app.after_request
+def trim_change_feed(response):
+    # Writes grow the feed through triggers; keep it at its retention even with no subscriber
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+        try:
+            trim_feed()
+        except sqlite3.Error as e:
+            print(f"[CHANGES] Trim failed: {e}")
+    return response
+
 if __name__ == '__main__':
-    if not os.path.exists(DATABASE):
+    if not os.path.exists(database_path()):
         print("Database not found. Initializing and seeding...")
+        init_db()
+        populate_dummy_data()
         print("Database ready!")
     else:
-        print("Existing database found. Skipping initialization.")
+        print("Existing database found. Applying pending migrations...")
+        init_db()
+    # The debug reloader runs this block twice; only the serving child warms up
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
     print("\nStarting Flask server...")
     print("API will be available at http://localhost:5000")
     print("\nAvailable endpoints:")
-    print("  GET  /api/stops")
+    print("  GET  /api/stops?limit=&cursor=&fields=")
     print("  GET  /api/paths")
+    print("  GET  /api/stops/<stop_id or name>/paths")
     print("  GET  /api/routes?status=active")
     print("  POST /api/routes")
     print("  PUT  /api/routes/<route_id>")
     print("  DELETE /api/routes/<route_id>")
-    print("  GET  /api/vehicles")
-    print("  GET  /api/drivers")
-    print("  GET  /api/daily-trips")
-    print("  GET  /api/deployments")
+    print("  GET  /api/vehicles?type=&unassigned=1")
+    print("  GET  /api/drivers?unassigned=1")
+    print("  GET  /api/daily-trips?route_id=&status=&unassigned=1&min_booking=")
+    print("  GET  /api/deployments?trip_id=&vehicle_id=&driver_id=&unassigned=1")
     print("  PUT  /api/deployments/<deployment_id>")
+    print("  POST /api/deployments/assign?atomic=0")
     print("  DELETE /api/deployments/<deployment_id>")
     print("  GET  /api/stats")
-    print("  GET  /api/export/db")
+    print("  GET  /api/changes/stream?since=")
+    print("  GET  /api/changes?since=&limit=")
+    print("  GET  /api/export/db?gzip=0")
+    print("  POST /api/import/<stops|paths|routes|vehicles|drivers|trips|deployments>?format=csv|ndjson")
+    print("  GET  /api/export/<entity>?format=csv|ndjson")
+    print("  GET  /api/metrics")
+    print("  GET  /api/health/ready")
+    print("  POST /api/movi")
+    print("  POST /api/movi/stream")
     
     app.run(debug=True, port=5000)
\ No newline at end of file
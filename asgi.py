@@ -0,0 +1,171 @@
+"""
+ASGI entry point for Movi
+Serves the chat endpoints (/api/movi, /api/movi/stream) on the asyncio agent
+path, so one process can hold hundreds of concurrent sessions without a
+thread per request, and forwards everything else to the Flask app.
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi:app --port 5000
+"""
+import asyncio
+import io
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers
+from werkzeug.formparser import parse_form_data
+
+from app import app as flask_app, _collect_movi_request, _publish_tts_audio, _sse
+from movi.asr_pool import ASRBusy
+from movi.metrics import REQUEST_DURATION
+from movi.warmup import start_warmup
+
+_flask = WsgiToAsgi(flask_app)
+
+CHAT_PATHS = ("/api/movi", "/api/movi/stream")
+_CORS = [(b"access-control-allow-origin", b"*")]
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def _parse_request(scope, body):
+    """Parse the form body with werkzeug, exactly as Flask would"""
+    headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "CONTENT_TYPE": headers.get("Content-Type", ""),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+    }
+    _, form, files = parse_form_data(environ)
+    return _collect_movi_request(form, files, headers)
+
+
+async def _watch_disconnect(receive, task, status):
+    """Cancel the request task as soon as the client goes away"""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            status["disconnected"] = True
+            task.cancel()
+            return
+
+
+async def _send_json(send, saved, agent_args):
+    from movi.chat import arun_movi_agent
+
+    response = {
+        'success': True,
+        'saved': saved,
+        'response': "",
+        'needs_confirmation': False,
+        'audio_url': None,
+        'thread_id': agent_args['thread_id'],
+    }
+    status, headers = 200, []
+    try:
+        result = await arun_movi_agent(**agent_args)
+        response['response'] = result.get('response', 'I received your message.')
+        response['needs_confirmation'] = result.get('needs_confirmation', False)
+        response['thread_id'] = result.get('thread_id')
+        response['audio_url'] = await asyncio.to_thread(_publish_tts_audio, result.get('audio_path'))
+    except ASRBusy:
+        # Backpressure from the Whisper worker pool: ask the client to retry
+        status, headers = 503, [(b"retry-after", b"2")]
+        response = {'success': False, 'saved': saved, 'thread_id': agent_args['thread_id'],
+                    'message': 'Speech recognition is busy, please retry shortly'}
+    except Exception as e:
+        print(f"[ERROR] Chat agent processing failed: {e}")
+        response['response'] = "I encountered an error. Please try again."
+
+    body = json.dumps(response).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ] + headers + _CORS})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_stream(send, saved, agent_args):
+    from movi.chat import astream_movi_agent
+
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+    ] + _CORS})
+
+    async def emit(event, data):
+        await send({"type": "http.response.body", "body": _sse(event, data).encode(), "more_body": True})
+
+    await emit('start', {'saved': saved})
+    try:
+        async for event, data in astream_movi_agent(**agent_args):
+            if event == 'audio':
+                data = {'audio_url': await asyncio.to_thread(_publish_tts_audio, data.get('audio_path'))}
+            await emit(event, data)
+    except ASRBusy:
+        await emit('error', {'response': "Speech recognition is busy, please retry shortly.", 'busy': True})
+    except Exception as e:
+        print(f"[ERROR] Chat agent streaming failed: {e}")
+        await emit('error', {'response': "I encountered an error. Please try again."})
+    await emit('done', {})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _movi(scope, receive, send):
+    start = time.perf_counter()
+    try:
+        body = await _read_body(receive)
+    except ClientDisconnected:
+        return
+    saved, agent_args = await asyncio.to_thread(_parse_request, scope, body)
+
+    status = {"disconnected": False}
+    watcher = asyncio.create_task(_watch_disconnect(receive, asyncio.current_task(), status))
+    try:
+        if scope["path"].endswith("/stream"):
+            await _send_stream(send, saved, agent_args)
+        else:
+            await _send_json(send, saved, agent_args)
+    except asyncio.CancelledError:
+        if not status["disconnected"]:
+            raise
+        print(f"[ASGI] Client disconnected, cancelled {agent_args['thread_id'] or 'new thread'}")
+    finally:
+        watcher.cancel()
+        REQUEST_DURATION.observe(time.perf_counter() - start, endpoint=f"asgi:{scope['path']}")
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_warmup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in CHAT_PATHS:
+        await _movi(scope, receive, send)
+    else:
+        await _flask(scope, receive, send)
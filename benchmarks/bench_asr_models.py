@@ -0,0 +1,167 @@
+"""
+Whisper model size / quantization benchmark on transport commands
+Transcribes the COMMANDS below with every --models x --quantize variant
+and reports, per variant:
+  - load time and peak RSS of the process (each variant runs in its own process)
+  - real-time factor: transcription time / audio duration (lower is faster)
+  - word error rate against the command text
+
+Clips are read from --clips-dir as <id>.<ext> (any format ffmpeg reads),
+by default the committed set in benchmarks/clips/commands (see the README
+there). Recorded clips of real operators give more realistic WERs than
+that synthetic speech; point --clips-dir at them, named with the same ids.
+
+Usage (from the project root):
+    python -m benchmarks.bench_asr_models [--models tiny,base,small] [--quantize off,on]
+        [--beam-size 5] [--language en] [--clips-dir DIR]
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CLIPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips", "commands")
+
+COMMANDS = [
+    ("assign_v003_t008", "Assign vehicle V003 to T008"),
+    ("assign_driver", "Assign driver Priya Sharma to trip T008"),
+    ("remove_vehicle_t001", "Remove the vehicle from T001"),
+    ("unassigned_trips", "How many trips are unassigned"),
+    ("idle_vehicles", "Which vehicles are idle right now"),
+    ("driver_of_t004", "Who is driving trip T004"),
+    ("booking_t002", "What is the booking percentage of T002"),
+    ("stops_north_corridor", "Show me all stops on the North Corridor path"),
+    ("deactivate_r005", "Deactivate route R005"),
+    ("routes_silk_board", "List the routes that start at Silk Board"),
+    ("create_route", "Create a route from Whitefield Main to Tech Park Gate 1 at 7:30 AM"),
+    ("add_stop", "Add a stop called HSR Layout"),
+    ("swap_vehicles", "Swap the vehicles on T003 and T007"),
+    ("cab_capacity", "Which cabs have a capacity of four"),
+    ("evening_trips", "Show the evening shift trips on South Corridor"),
+    ("driver_phone", "What is Rajesh Kumar's phone number"),
+    ("confirm", "Yes, go ahead"),
+    ("cancel", "No, cancel that"),
+]
+
+_NUMBERS = {"zero": "0", "oh": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+            "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9"}
+
+
+def normalize(text):
+    """Lowercase words without punctuation; "V 003", "V-003" and "v zero zero three" all become "v003"."""
+    text = re.sub(r"\b([ap])\.m\.", r"\1m", text.lower())
+    words = re.sub(r"[^a-z0-9:' ]+", " ", text.replace("-", " ")).split()
+    words = [_NUMBERS.get(word, word) for word in words]
+    merged = []
+    for word in words:
+        # Join an id's letter and its digits, however the model split them
+        if merged and word.isdigit() and re.fullmatch(r"[a-z]\d*", merged[-1]):
+            merged[-1] += word
+        else:
+            merged.append(word)
+    return merged
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance and reference length."""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def _clips(clips_dir):
+    clips = []
+    for clip_id, text in COMMANDS:
+        found = sorted(glob.glob(os.path.join(clips_dir, f"{clip_id}.*")))
+        if not found:
+            sys.exit(f"No clip for {clip_id!r} in {clips_dir}")
+        clips.append((clip_id, text, found[0]))
+    return clips
+
+
+def _run_variant(model_name, quantize, options, clips, threads, out):
+    import torch
+    from movi.asr_model import load_whisper
+    from movi.audio import SAMPLE_RATE, decode_audio
+
+    torch.set_num_threads(threads)
+    audio = [(clip_id, text, decode_audio(path)) for clip_id, text, path in clips]
+    start = time.perf_counter()
+    model = load_whisper(model_name, quantize)
+    load_seconds = time.perf_counter() - start
+    fp16 = model.device.type == "cuda"
+    # First call pays for lazy initialisation
+    model.transcribe(audio[0][2], fp16=fp16, **options)
+
+    busy, duration, errors, words, worst = 0.0, 0.0, 0, 0, []
+    for clip_id, text, samples in audio:
+        start = time.perf_counter()
+        hypothesis = model.transcribe(samples, fp16=fp16, **options)["text"].strip()
+        busy += time.perf_counter() - start
+        duration += len(samples) / SAMPLE_RATE
+        e, n = word_errors(text, hypothesis)
+        errors, words = errors + e, words + n
+        if e:
+            worst.append((e / n, clip_id, hypothesis))
+    out.put({
+        "load": load_seconds,
+        "rtf": busy / duration,
+        "ms_per_clip": busy * 1000 / len(audio),
+        "wer": errors / words,
+        # Linux reports KB
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "worst": sorted(worst, reverse=True)[:3],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="tiny,base,small")
+    parser.add_argument("--quantize", default="off,on", help="off, on or both (off,on)")
+    parser.add_argument("--beam-size", type=int, default=None, help="Beam search width (default: greedy)")
+    parser.add_argument("--language", default="en", help="Pinned language; empty to auto-detect")
+    parser.add_argument("--timestamps", action="store_true")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clips-dir", default=CLIPS_DIR)
+    args = parser.parse_args()
+
+    from movi.asr_model import decode_options
+
+    options = decode_options(args.language, args.beam_size, args.timestamps)
+    clips = _clips(args.clips_dir)
+    context = multiprocessing.get_context("spawn")
+    print(f"{len(clips)} command clips from {args.clips_dir}, options {options}, {args.threads} threads\n")
+    print(f"{'model':<12} {'load (s)':>9} {'RTF':>7} {'ms/clip':>8} {'WER':>7} {'peak RSS (MB)':>14}")
+
+    for model_name in args.models.split(","):
+        for mode in args.quantize.split(","):
+            quantize = mode == "on"
+            out = context.Queue()
+            process = context.Process(target=_run_variant,
+                                      args=(model_name, quantize, options, clips, args.threads, out))
+            process.start()
+            process.join()
+            label = f"{model_name}{'-int8' if quantize else ''}"
+            if process.exitcode != 0:
+                print(f"{label:<12} failed (exit code {process.exitcode})")
+                continue
+            r = out.get(timeout=5)
+            print(f"{label:<12} {r['load']:>9.1f} {r['rtf']:>7.3f} {r['ms_per_clip']:>8.0f} "
+                  f"{r['wer']:>7.1%} {r['rss_mb']:>14.0f}")
+            for rate, clip_id, hypothesis in r["worst"]:
+                print(f"{'':<12}   {clip_id}: {hypothesis!r} ({rate:.0%})")
+
+
+if __name__ == "__main__":
+    main()
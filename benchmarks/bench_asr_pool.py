@@ -0,0 +1,120 @@
+"""
+ASR throughput and latency: in-process Whisper vs the worker pool
+Fires --requests transcriptions at 1, 4 and 16 concurrent callers and
+reports throughput and p50/p95 latency for:
+  - in-process: one shared model called from the request threads, as
+    transcribe_audio did before the pool (MOVI_ASR_WORKERS=0)
+  - pool: movi.asr_pool.ASRPool with --workers processes
+
+Both sides load the model with load_whisper() and decode with the
+configured DECODE_OPTIONS (MOVI_ASR_MODEL, MOVI_ASR_QUANTIZE, ...), so
+they run the same model the same way.
+
+Clips are the files given with --audio, or by default the spoken commands
+in benchmarks/clips/commands (1-5 s each, like real voice requests).
+--out also writes the rows as JSON, to keep with the machine they ran on.
+
+Usage (from the project root):
+    python -m benchmarks.bench_asr_pool [--workers 2] [--threads 2] [--requests 32] [--audio a.wav b.wav]
+                                        [--out results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONCURRENCY = (1, 4, 16)
+CLIPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips", "commands")
+
+
+def _run(transcribe, clips, concurrency, requests):
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        transcribe(clips[i % len(clips)])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return requests / elapsed, statistics.median(latencies), latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--requests", type=int, default=32, help="Transcriptions per concurrency level")
+    parser.add_argument("--audio", nargs="*", help="Clips to transcribe (default: the committed command clips)")
+    parser.add_argument("--skip-in-process", action="store_true")
+    parser.add_argument("--ready-timeout", type=float, default=600,
+                        help="Seconds to wait for the pool workers to load the model")
+    parser.add_argument("--out", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    import torch
+    from movi.asr_model import DECODE_OPTIONS, load_whisper, model_tag
+    from movi.asr_pool import ASRPool
+    from movi.audio import decode_audio
+
+    clips = [os.path.abspath(path) for path in args.audio or []]
+    clips = clips or sorted(glob.glob(os.path.join(CLIPS_DIR, "*.wav")))
+    if not clips:
+        sys.exit(f"No clips given and none in {CLIPS_DIR}")
+
+    print(f"{model_tag()}, {len(clips)} clip(s), {args.requests} requests per level, "
+          f"{os.cpu_count()} CPUs\n")
+    print(f"{'variant':<26} {'concurrency':>11} {'req/s':>7} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    rows = []
+
+    def report(variant, concurrency, rate, p50, p95):
+        print(f"{variant:<26} {concurrency:>11} {rate:>7.2f} {p50:>9.0f} {p95:>9.0f}")
+        rows.append({"variant": variant, "concurrency": concurrency, "req_per_s": round(rate, 2),
+                     "p50_ms": round(p50), "p95_ms": round(p95)})
+
+    if not args.skip_in_process:
+        torch.set_num_threads(os.cpu_count() or 1)
+        model = load_whisper()
+        # Decoded the way the pool workers do it, so both sides skip ffmpeg for WAV
+        transcribe = lambda path: model.transcribe(decode_audio(path), fp16=False, **DECODE_OPTIONS)["text"]
+        transcribe(clips[0])
+        for concurrency in CONCURRENCY:
+            report("in-process", concurrency, *_run(transcribe, clips, concurrency, args.requests))
+        del model
+
+    # Queue sized so the 16-caller level measures queueing, not rejections
+    pool = ASRPool(workers=args.workers, threads=args.threads, queue_size=max(CONCURRENCY))
+    try:
+        deadline = time.monotonic() + args.ready_timeout
+        while pool.stats()["ready_workers"] < args.workers:
+            if time.monotonic() > deadline:
+                sys.exit(f"Only {pool.stats()['ready_workers']} of {args.workers} workers loaded the model "
+                         f"within {args.ready_timeout:.0f}s")
+            time.sleep(0.1)
+        pool.transcribe(clips[0])
+        label = f"pool {args.workers}x{args.threads} threads"
+        for concurrency in CONCURRENCY:
+            report(label, concurrency, *_run(pool.transcribe, clips, concurrency, args.requests))
+    finally:
+        pool.shutdown()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"model": model_tag(), "cpus": os.cpu_count(), "machine": platform.platform(),
+                       "processor": platform.processor(), "clips": len(clips), "requests": args.requests,
+                       "rows": rows}, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Bulk deployment assignment benchmark
+Seeds --trips trips (default 1,000) on routes with shifts spread over the
+day, then re-assigns a vehicle and driver to every trip three ways:
+  - per-row PUT: what the dashboard does today - one connection, UPDATE and
+    commit per trip, no conflict checks
+  - per-row checked: the same plus double-booking/capacity queries per trip
+  - bulk: movi.assignments.assign() - one transaction, set-based lookups
+
+Usage (from the project root):
+    python -m benchmarks.bench_bulk_assign [--trips 1000] [--rounds 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _seed(path, n_trips):
+    from movi.db import close_all, get_db, set_database
+    from movi.migrations import migrate
+
+    close_all()
+    set_database(path)
+    conn = get_db()
+    migrate(conn)
+    conn.execute("INSERT INTO Stops VALUES ('S', 'Depot', 12.9, 77.6)")
+    conn.execute("INSERT INTO Paths VALUES ('P', 'Path', '[\"S\"]')")
+    # One route per 15-minute slot; every trip overlaps the trips of a few neighbouring slots
+    n_routes = 96
+    conn.executemany("INSERT INTO Routes VALUES (?, 'P', ?, ?, 'up', 'A', 'B', 40, 5, 'active')", [
+        (f"R{i:03d}", f"Route {i}", f"{i // 4:02d}:{i % 4 * 15:02d}") for i in range(n_routes)
+    ])
+    conn.executemany("INSERT INTO DailyTrips VALUES (?, ?, ?, 50, 'Scheduled')", [
+        (f"T{i:05d}", f"R{i % n_routes:03d}", f"Trip {i}") for i in range(n_trips)
+    ])
+    conn.executemany("INSERT INTO Deployments VALUES (?, ?, NULL, NULL)", [
+        (f"DP{i:05d}", f"T{i:05d}") for i in range(n_trips)
+    ])
+    conn.executemany("INSERT INTO Vehicles VALUES (?, ?, 'Bus', 45)", [
+        (f"V{i:05d}", f"KA-{i}") for i in range(n_trips)
+    ])
+    conn.executemany("INSERT INTO Drivers VALUES (?, ?, '+91')", [
+        (f"D{i:05d}", f"Driver {i}") for i in range(n_trips)
+    ])
+    conn.commit()
+    conn.close()
+
+
+def _assignments(n_trips, offset):
+    # Vehicles and drivers rotate by offset each round, so every round moves everything
+    return [{"trip_id": f"T{i:05d}", "vehicle_id": f"V{(i + offset) % n_trips:05d}",
+             "driver_id": f"D{(i + offset) % n_trips:05d}"} for i in range(n_trips)]
+
+
+def _clear():
+    from movi.db import get_db
+    conn = get_db()
+    conn.execute("UPDATE Deployments SET vehicle_id = NULL, driver_id = NULL")
+    conn.commit()
+    conn.close()
+
+
+def per_row_put(assignments):
+    from movi.db import get_db
+    for a in assignments:
+        conn = get_db()
+        conn.execute("UPDATE Deployments SET vehicle_id = ?, driver_id = ? WHERE trip_id = ?",
+                     (a["vehicle_id"], a["driver_id"], a["trip_id"]))
+        conn.commit()
+        conn.close()
+
+
+def per_row_checked(assignments):
+    from movi.assignments import _overlaps
+    from movi.db import get_db
+    for a in assignments:
+        conn = get_db()
+        conn.execute("BEGIN IMMEDIATE")
+        target = conn.execute('''
+            SELECT d.deployment_id, r.shift_time, r.capacity FROM Deployments d
+            JOIN DailyTrips t ON t.trip_id = d.trip_id JOIN Routes r ON r.route_id = t.route_id
+            WHERE d.trip_id = ?
+        ''', (a["trip_id"],)).fetchone()
+        seats = conn.execute("SELECT capacity FROM Vehicles WHERE vehicle_id = ?", (a["vehicle_id"],)).fetchone()
+        ok = seats is not None and seats[0] >= target["capacity"]
+        for field in ("vehicle_id", "driver_id"):
+            for row in conn.execute(f'''
+                SELECT d.deployment_id, r.shift_time FROM Deployments d
+                JOIN DailyTrips t ON t.trip_id = d.trip_id JOIN Routes r ON r.route_id = t.route_id
+                WHERE d.{field} = ? AND d.deployment_id != ?
+            ''', (a[field], target["deployment_id"])):
+                ok = ok and not _overlaps(row["shift_time"], target["shift_time"])
+        if ok:
+            conn.execute("UPDATE Deployments SET vehicle_id = ?, driver_id = ? WHERE deployment_id = ?",
+                         (a["vehicle_id"], a["driver_id"], target["deployment_id"]))
+        conn.commit()
+        conn.close()
+
+
+def bulk(assignments):
+    from movi.assignments import assign
+    from movi.db import get_db
+    conn = get_db()
+    summary = assign(conn, assignments)
+    conn.close()
+    assert summary["rejected"] == 0, summary["results"][:3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    from movi.stats import check_stats
+    from movi.db import get_db
+
+    print(f"{args.trips:,} assignments per run, median of {args.rounds} runs\n")
+    print(f"{'variant':<18} {'total (ms)':>11} {'per assignment (us)':>20}")
+    with tempfile.TemporaryDirectory() as tmp:
+        _seed(os.path.join(tmp, "bench.db"), args.trips)
+        for label, fn in (("per-row PUT", per_row_put), ("per-row checked", per_row_checked), ("bulk", bulk)):
+            samples = []
+            for round_ in range(args.rounds):
+                _clear()
+                assignments = _assignments(args.trips, round_ + 1)
+                start = time.perf_counter()
+                fn(assignments)
+                samples.append((time.perf_counter() - start) * 1000)
+            ms = statistics.median(samples)
+            print(f"{label:<18} {ms:>11.1f} {ms * 1000 / args.trips:>20.1f}")
+
+        conn = get_db()
+        problems = check_stats(conn)
+        conn.close()
+        print(f"\nDashboard stats after the runs: {'consistent' if not problems else problems}")
+
+
+if __name__ == "__main__":
+    main()
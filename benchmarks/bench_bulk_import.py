@@ -0,0 +1,141 @@
+"""
+Bulk import / export throughput
+Generates --rows synthetic stops, trips and deployments (default 100,000
+each), loads them through movi.bulk from in-memory CSV and NDJSON uploads
+at several batch sizes, and exports them again. The baseline is the
+one-row-per-transaction pattern of POST /api/routes, timed on a sample and
+reported per row.
+
+Trips and deployments go through foreign-key validation and the stats
+triggers; stops have no references.
+
+Usage (from the project root):
+    python -m benchmarks.bench_bulk_import [--rows 100000] [--batch-sizes 500,5000,50000]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _records(entity, n):
+    if entity == "stops":
+        return [{"stop_id": f"S{i:06d}", "name": f"Stop {i}", "latitude": 12.9 + i / 1e6,
+                 "longitude": 77.6 + i / 1e6} for i in range(n)]
+    if entity == "trips":
+        return [{"trip_id": f"T{i:06d}", "route_id": f"R{i % 1000:04d}", "display_name": f"Trip {i}",
+                 "booking_status_percentage": i % 101, "live_status": "Scheduled"} for i in range(n)]
+    return [{"deployment_id": f"DP{i:06d}", "trip_id": f"T{i:06d}",
+             "vehicle_id": f"V{i % 500:04d}" if i % 10 else None, "driver_id": f"D{i % 500:04d}"}
+            for i in range(n)]
+
+
+def _encode(records, fmt):
+    if fmt == "ndjson":
+        return "".join(json.dumps(r) + "\n" for r in records).encode()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(records[0]))
+    writer.writeheader()
+    writer.writerows({k: "" if v is None else v for k, v in r.items()} for r in records)
+    return buffer.getvalue().encode()
+
+
+def _fresh_db(path):
+    from movi.db import close_all, get_db, set_database
+    from movi.migrations import migrate
+
+    close_all()
+    if os.path.exists(path):
+        os.remove(path)
+    set_database(path)
+    conn = get_db()
+    migrate(conn)
+    # Parents for the foreign keys: 1,000 routes on one path, 500 vehicles and drivers
+    conn.execute("INSERT INTO Stops VALUES ('S', 'Depot', 12.9, 77.6)")
+    conn.execute("INSERT INTO Paths VALUES ('P', 'Path', '[\"S\"]')")
+    conn.executemany("INSERT INTO Routes VALUES (?, 'P', ?, '08:00', 'up', 'A', 'B', 40, 5, 'active')",
+                     [(f"R{i:04d}", f"Route {i}") for i in range(1000)])
+    conn.executemany("INSERT INTO Vehicles VALUES (?, ?, 'Bus', 40)", [(f"V{i:04d}", f"KA-{i}") for i in range(500)])
+    conn.executemany("INSERT INTO Drivers VALUES (?, ?, '+91')", [(f"D{i:04d}", f"Driver {i}") for i in range(500)])
+    conn.commit()
+    return conn
+
+
+def _import(conn, entity, body, fmt, batch_size):
+    from movi.bulk import get_entity, import_records, read_records
+
+    spec = get_entity(entity)
+    start = time.perf_counter()
+    summary = import_records(conn, spec, read_records(io.BytesIO(body), fmt, spec), batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    assert summary["error_count"] == 0, summary["errors"][:3]
+    return summary["inserted"], elapsed
+
+
+def _row_at_a_time(conn, entity, records):
+    from movi.bulk import get_entity
+
+    spec = get_entity(entity)
+    sql = f'INSERT INTO {spec.table} VALUES ({", ".join("?" * len(spec.columns))})'
+    start = time.perf_counter()
+    for record in records:
+        conn.execute(sql, spec.convert(record))
+        conn.commit()
+    return (time.perf_counter() - start) / len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-sizes", default="500,5000,50000")
+    parser.add_argument("--baseline-sample", type=int, default=2000, help="Rows timed one per transaction")
+    args = parser.parse_args()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    from movi.bulk import export_rows, get_entity
+    from movi.db import get_read_db
+
+    entities = ("stops", "trips", "deployments")
+    records = {entity: _records(entity, args.rows) for entity in entities}
+    print(f"{args.rows:,} rows per entity\n")
+    print(f"{'entity':<12} {'format':<7} {'batch':>6} {'seconds':>8} {'rows/s':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for fmt in ("csv", "ndjson"):
+            bodies = {entity: _encode(records[entity], fmt) for entity in entities}
+            for batch_size in batch_sizes:
+                conn = _fresh_db(db_path)
+                for entity in entities:
+                    inserted, elapsed = _import(conn, entity, bodies[entity], fmt, batch_size)
+                    print(f"{entity:<12} {fmt:<7} {batch_size:>6} {elapsed:>8.2f} {inserted / elapsed:>10,.0f}")
+                conn.close()
+
+        print("\nExport (full table, streamed):")
+        for entity in entities:
+            for fmt in ("csv", "ndjson"):
+                conn = get_read_db()
+                start = time.perf_counter()
+                size = sum(len(chunk) for chunk in export_rows(conn, get_entity(entity), fmt))
+                elapsed = time.perf_counter() - start
+                conn.close()
+                print(f"{entity:<12} {fmt:<7} {elapsed:>8.2f}s {args.rows / elapsed:>10,.0f} rows/s "
+                      f"{size / 1e6:>6.1f} MB")
+
+        conn = _fresh_db(db_path)
+        sample = args.baseline_sample
+        print(f"\nBaseline, one row per transaction ({sample:,}-row sample, extrapolated):")
+        for entity in entities:
+            per_row = _row_at_a_time(conn, entity, records[entity][:sample])
+            print(f"{entity:<12} {1 / per_row:>10,.0f} rows/s   ~{per_row * args.rows:.0f}s for {args.rows:,}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
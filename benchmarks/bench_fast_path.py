@@ -0,0 +1,116 @@
+"""
+Fast-path router benchmark
+Replays a sample of operator questions against a freshly seeded database
+and reports the fast-path hit rate and the latency saved versus the
+LangGraph agent.
+
+By default the agent cost is modelled as --llm-calls round trips of
+--llm-latency-ms each (a read needs classify_request + generate_response).
+With --live (and GOOGLE_API_KEY set) every fall-through question is also
+run through the real agent and measured.
+
+Usage (from the project root):
+    python -m benchmarks.bench_fast_path [--llm-latency-ms 800] [--llm-calls 2] [--live]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Representative operator traffic: mostly dashboard questions, plus writes
+# and open-ended questions that must fall through to the agent
+SAMPLE_QUESTIONS = [
+    "How many trips are there?",
+    "how many trips",
+    "Which trips have no vehicle assigned?",
+    "List trips without a vehicle",
+    "Show unassigned trips",
+    "What's the status of T001?",
+    "status of trip T004",
+    "T006 status",
+    "What is the status of the trip 'East Express - Morning - Trip 2'?",
+    "Which routes are active?",
+    "How many active routes are there?",
+    "List active routes",
+    "What routes are currently active?",
+    "Which trips have not been assigned?",
+    "How many trips do we have today?",
+    "Assign vehicle V008 to T008",
+    "Remove vehicle KA-07-MN-6789 from all trips",
+    "Which driver has the most trips?",
+    "Show me all stops on the North Corridor path",
+    "What is the average booking percentage per route?",
+]
+
+
+def _seed_database(path):
+    import app as movi_app
+    from movi.db import set_database
+    set_database(path)
+    movi_app.init_db()
+    movi_app.populate_dummy_data()
+    from movi.db import get_read_db
+    return get_read_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0,
+                        help="Modelled latency of one Gemini round trip")
+    parser.add_argument("--llm-calls", type=int, default=2,
+                        help="Modelled LLM calls per agent read request")
+    parser.add_argument("--rounds", type=int, default=50, help="Times to replay the sample")
+    parser.add_argument("--live", action="store_true", help="Measure the real agent for fall-throughs")
+    args = parser.parse_args()
+
+    from movi import fast_path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        get_db = _seed_database(os.path.join(tmp, "bench.db"))
+
+        hits, misses = [], []
+        for _ in range(args.rounds):
+            for question in SAMPLE_QUESTIONS:
+                start = time.perf_counter()
+                result = fast_path.answer(question, get_db)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                (hits if result is not None else misses).append((question, elapsed_ms))
+
+        agent_ms = args.llm_latency_ms * args.llm_calls
+        agent_label = f"modelled ({args.llm_calls} x {args.llm_latency_ms:.0f}ms)"
+        if args.live:
+            from movi import chat
+            live = []
+            for question in dict.fromkeys(q for q, _ in misses):
+                start = time.perf_counter()
+                chat.run_movi_agent(user_id="bench", message_type="text", content=question)
+                live.append((time.perf_counter() - start) * 1000)
+            agent_ms = statistics.mean(live)
+            agent_label = f"measured over {len(live)} live agent run(s)"
+
+    total = len(hits) + len(misses)
+    hit_ms = [ms for _, ms in hits]
+    print(f"Questions replayed:       {total} ({len(SAMPLE_QUESTIONS)} unique x {args.rounds})")
+    print(f"Fast-path hit rate:       {len(hits) / total:.1%}")
+    if hit_ms:
+        print(f"Fast-path latency:        mean {statistics.mean(hit_ms):.2f}ms, "
+              f"p95 {sorted(hit_ms)[int(len(hit_ms) * 0.95) - 1]:.2f}ms")
+    print(f"Agent latency per read:   {agent_ms:.0f}ms, {agent_label}")
+    saved_per_hit = agent_ms - (statistics.mean(hit_ms) if hit_ms else 0.0)
+    print(f"Latency saved per hit:    {saved_per_hit:.0f}ms")
+    print(f"Mean saved per request:   {saved_per_hit * len(hits) / total:.0f}ms")
+    print(f"LLM calls avoided:        {len(hits) * args.llm_calls}")
+    print("\nPer-intent hits:")
+    for intent, count in sorted(fast_path.get_stats()["by_intent"].items()):
+        print(f"  {intent:<18} {count}")
+    print("\nFell through to the agent:")
+    for question in dict.fromkeys(q for q, _ in misses):
+        print(f"  {question}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+LLM calls per request type: classify_request vs. legacy routing
+Runs the real LangGraph agent against a freshly seeded database with a
+stubbed LLM (canned answers, fixed latency per call), once with the single
+structured-output classify_request step and once with the legacy
+agent_entry + analyze_write pair, and reports LLM calls and wall time for
+each request type.
+
+Writes with consequences are two turns (request + "yes"); both are counted.
+
+Usage (from the project root):
+    python -m benchmarks.bench_llm_calls [--llm-latency-ms 800] [--rounds 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The stub never talks to Gemini, but the client still wants a key at import time
+os.environ.setdefault("GOOGLE_API_KEY", "bench-stub")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+# Request types and the answers a well-behaved model gives for them
+SCENARIOS = [
+    {
+        "type": "read",
+        "turns": ["How many drivers do we have?"],
+        "plan": {"intent": "read", "sql_queries": ["SELECT COUNT(*) AS drivers FROM Drivers"]},
+        "legacy_entry": "tool",
+    },
+    {
+        "type": "read (2 queries)",
+        "turns": ["How many vehicles and drivers are there?"],
+        "plan": {"intent": "read", "sql_queries": ["SELECT COUNT(*) AS vehicles FROM Vehicles",
+                                                   "SELECT COUNT(*) AS drivers FROM Drivers"]},
+        "legacy_entry": "tool",
+    },
+    {
+        "type": "write",
+        "turns": ["Add a stop called Hebbal Flyover at 13.04, 77.59"],
+        "plan": {"intent": "write", "has_consequences": False,
+                 "write_sql": "INSERT OR REPLACE INTO Stops (stop_id, name, latitude, longitude) "
+                              "VALUES ('S900', 'Hebbal Flyover', 13.04, 77.59)",
+                 "reasoning": "Add stop Hebbal Flyover"},
+        "legacy_entry": "write",
+    },
+    {
+        "type": "write + confirmation",
+        "turns": ["Remove the vehicle from trip T001", "yes"],
+        "plan": {"intent": "write", "has_consequences": True,
+                 "write_sql": "UPDATE Deployments SET vehicle_id = NULL WHERE trip_id = 'T001'",
+                 "reasoning": "Unassign the vehicle from T001"},
+        "legacy_entry": "write",
+    },
+    {
+        "type": "chat",
+        "turns": ["Hi, what can you do?"],
+        "plan": {"intent": "chat", "reply": "I can answer questions about and manage your routes, trips and fleet."},
+        "legacy_entry": "chat",
+    },
+]
+
+
+def _call(tool_name, sql):
+    return {"name": tool_name, "args": {"sql_query": sql}, "id": f"call_{uuid.uuid4().hex[:12]}"}
+
+
+class StubLLM:
+    """Stands in for ChatGoogleGenerativeAI: answers from the current scenario after a fixed delay."""
+
+    def __init__(self, latency_ms, state=None, tools=(), schema=None):
+        self.latency_ms = latency_ms
+        self.state = state if state is not None else {"calls": 0, "scenario": None}
+        self.tools = tuple(tools)
+        self.schema = schema
+
+    def bind_tools(self, tools):
+        return StubLLM(self.latency_ms, self.state, [t.name for t in tools])
+
+    def with_structured_output(self, schema, include_raw=False):
+        return StubLLM(self.latency_ms, self.state, schema=schema)
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+    def invoke(self, messages):
+        self.state["calls"] += 1
+        time.sleep(self.latency_ms / 1000)
+        scenario = self.state["scenario"]
+        prompt = str(messages[-1].content) if isinstance(messages[-1], HumanMessage) else ""
+
+        if self.schema is not None:
+            plan = self.schema(**scenario["plan"])
+            return {"raw": AIMessage(content=plan.model_dump_json()), "parsed": plan, "parsing_error": None}
+        if self.tools == ("execute_sql_query", "execute_sql_write"):
+            # Legacy agent_entry
+            if scenario["legacy_entry"] == "tool":
+                return AIMessage(content="", tool_calls=[_call("execute_sql_query", sql)
+                                                         for sql in scenario["plan"]["sql_queries"]])
+            if scenario["legacy_entry"] == "write":
+                return AIMessage(content="I understand you want to do that. "
+                                         "Let me check if there are any consequences first.")
+            return AIMessage(content=scenario["plan"]["reply"])
+        if self.tools == ("execute_sql_query",):
+            # check_consequences
+            return AIMessage(content="", tool_calls=[_call(
+                "execute_sql_query",
+                "SELECT dt.display_name, dt.booking_status_percentage FROM DailyTrips dt WHERE dt.trip_id = 'T001'"
+            )])
+        if self.tools == ("execute_sql_write",):
+            # execute_action without a pending SQL (legacy read/chat turns end up here)
+            return AIMessage(content="There is nothing to write.")
+        if "Analyze the user's request" in prompt:
+            plan = scenario["plan"]
+            return AIMessage(content=json.dumps({
+                "is_write_operation": plan["intent"] == "write",
+                "has_consequences": plan.get("has_consequences", False),
+                "sql_query": plan.get("write_sql", ""),
+                "reasoning": plan.get("reasoning", ""),
+            }))
+        return AIMessage(content="Here is what I found.")
+
+
+def _seed_database(path):
+    import app as movi_app
+    from movi.db import set_database
+    set_database(path)
+    movi_app.init_db()
+    movi_app.populate_dummy_data()
+
+
+def _run(chat, stub, scenario):
+    """Runs all turns of one scenario on a fresh thread. Returns (llm_calls, elapsed_ms)."""
+    stub.state["scenario"] = scenario
+    stub.state["calls"] = 0
+    thread_id = None
+    start = time.perf_counter()
+    for turn in scenario["turns"]:
+        result = chat.run_movi_agent(user_id="bench", message_type="text", content=turn, thread_id=thread_id)
+        thread_id = result["thread_id"]
+    return stub.state["calls"], (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0,
+                        help="Simulated latency of one Gemini round trip")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per request type and routing mode")
+    args = parser.parse_args()
+
+    from movi import chat, fast_path
+
+    # Measure the agent itself: no fast path, no speech synthesis
+    fast_path.ENABLED = False
+    chat.text_to_speech = lambda text: None
+    stub = StubLLM(args.llm_latency_ms)
+    chat.shared_llm = stub
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        _seed_database(db_path)
+
+        for mode, classify_routing in (("legacy", False), ("classify", True)):
+            chat._graph = chat.build_graph(MemorySaver(), classify_routing=classify_routing)
+            for scenario in SCENARIOS:
+                runs = [_run(chat, stub, scenario) for _ in range(args.rounds)]
+                results[(mode, scenario["type"])] = (
+                    statistics.mean(calls for calls, _ in runs),
+                    statistics.mean(ms for _, ms in runs),
+                )
+
+    print(f"Stubbed LLM latency: {args.llm_latency_ms:.0f}ms per call, {args.rounds} run(s) per cell\n")
+    print(f"{'request type':<22} {'LLM calls':>14} {'latency (ms)':>22} {'saved':>8}")
+    print(f"{'':<22} {'legacy':>6} {'new':>7} {'legacy':>10} {'new':>11}")
+    for scenario in SCENARIOS:
+        old_calls, old_ms = results[("legacy", scenario["type"])]
+        new_calls, new_ms = results[("classify", scenario["type"])]
+        saved = 1 - new_ms / old_ms if old_ms else 0.0
+        print(f"{scenario['type']:<22} {old_calls:>6.0f} {new_calls:>7.0f} {old_ms:>10.0f} {new_ms:>11.0f} {saved:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+PathStops benchmark
+Builds a database with --paths synthetic paths (default 10,000) and compares
+the old access patterns against the new ones:
+  - paths / routes through one stop: LIKE scan on the JSON column vs.
+    idx_pathstops_stop lookup
+  - the /api/paths body: json.loads per row + json.dumps vs. JSON built by SQLite
+
+Usage (from the project root):
+    python -m benchmarks.bench_path_stops [--paths 10000] [--stops-per-path 20] [--lookups 200]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _build(path, n_paths, stops_per_path, n_stops):
+    from movi.db import get_db, set_database
+    from movi.migrations import migrate
+
+    set_database(path)
+    conn = get_db()
+    migrate(conn)
+    rng = random.Random(42)
+    conn.executemany('INSERT INTO Stops VALUES (?, ?, ?, ?)', [
+        (f'S{i:05d}', f'Stop {i}', 12.9 + i / 1e4, 77.6 + i / 1e4) for i in range(n_stops)
+    ])
+    conn.executemany('INSERT INTO Paths VALUES (?, ?, ?)', [
+        (f'P{i:06d}', f'Path {i}',
+         json.dumps([f'S{s:05d}' for s in rng.sample(range(n_stops), stops_per_path)]))
+        for i in range(n_paths)
+    ])
+    conn.executemany('INSERT INTO Routes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+        (f'R{i:06d}', f'P{i // 2:06d}', f'Route {i}', '08:00', 'up', 'A', 'B', 40, 5, 'active')
+        for i in range(n_paths * 2)
+    ])
+    conn.commit()
+    return conn
+
+
+def _time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--stops-per-path", type=int, default=20)
+    parser.add_argument("--stops", type=int, default=2000, help="Distinct stops")
+    parser.add_argument("--lookups", type=int, default=200, help="Stop lookups per variant")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        conn = _build(os.path.join(tmp, "bench.db"), args.paths, args.stops_per_path, args.stops)
+        print(f"Built {args.paths} paths x {args.stops_per_path} stops "
+              f"({conn.execute('SELECT COUNT(*) FROM PathStops').fetchone()[0]} PathStops rows, "
+              f"filled by trigger) in {time.perf_counter() - start:.1f}s\n")
+
+        rng = random.Random(7)
+        stop_ids = [f'S{rng.randrange(args.stops):05d}' for _ in range(args.lookups)]
+
+        def like_paths():
+            for stop_id in stop_ids:
+                conn.execute('SELECT path_id FROM Paths WHERE ordered_list_of_stop_ids LIKE ?',
+                             (f'%"{stop_id}"%',)).fetchall()
+
+        def index_paths():
+            for stop_id in stop_ids:
+                conn.execute('SELECT path_id FROM PathStops WHERE stop_id = ?', (stop_id,)).fetchall()
+
+        def like_routes():
+            for stop_id in stop_ids:
+                conn.execute('''
+                    SELECT r.* FROM Routes r JOIN Paths p ON p.path_id = r.path_id
+                    WHERE p.ordered_list_of_stop_ids LIKE ?
+                ''', (f'%"{stop_id}"%',)).fetchall()
+
+        def index_routes():
+            for stop_id in stop_ids:
+                conn.execute('''
+                    SELECT r.* FROM Routes r
+                    WHERE r.path_id IN (SELECT path_id FROM PathStops WHERE stop_id = ?)
+                ''', (stop_id,)).fetchall()
+
+        def list_json():
+            paths = [dict(row) for row in conn.execute('SELECT * FROM Paths').fetchall()]
+            for path in paths:
+                path['ordered_list_of_stop_ids'] = json.loads(path['ordered_list_of_stop_ids'])
+            return json.dumps(paths)
+
+        def list_sql():
+            return conn.execute('''
+                SELECT json_group_array(json_object(
+                    'path_id', path_id,
+                    'path_name', path_name,
+                    'ordered_list_of_stop_ids', json(ordered_list_of_stop_ids)
+                ))
+                FROM Paths
+            ''').fetchone()[0]
+
+        rows = [
+            ("paths through a stop", like_paths, index_paths, args.lookups, 1),
+            ("routes through a stop", like_routes, index_routes, args.lookups, 1),
+            ("/api/paths body", list_json, list_sql, 1, 5),
+        ]
+        print(f"{'query':<30} {'before (ms)':>12} {'after (ms)':>16} {'speedup':>9}")
+        for label, old, new, per_call, repeat in rows:
+            old_ms = _time_ms(old, repeat) / per_call
+            new_ms = _time_ms(new, repeat) / per_call
+            print(f"{label:<30} {old_ms:>12.3f} {new_ms:>16.3f} {old_ms / new_ms:>8.1f}x")
+
+        print("\nPlans:")
+        for sql in ('SELECT path_id FROM PathStops WHERE stop_id = ?',
+                    'SELECT r.* FROM Routes r WHERE r.path_id IN (SELECT path_id FROM PathStops WHERE stop_id = ?)'):
+            for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', ('S00001',)).fetchall():
+                print(f"  {row[3]}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
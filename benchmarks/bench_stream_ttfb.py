@@ -0,0 +1,69 @@
+"""
+Time-to-first-byte benchmark: /api/movi vs /api/movi/stream
+Sends the same questions to both endpoints of a running server and reports
+time to first byte, to the first LLM token, to the final response and to
+the end of the response.
+
+Usage (start the server first with `python app.py`):
+    python -m benchmarks.bench_stream_ttfb [--base-url http://localhost:5000] [--rounds 3]
+"""
+import argparse
+import http.client
+import statistics
+import time
+from urllib.parse import urlencode, urlparse
+
+QUESTIONS = [
+    "Which driver has the most trips?",
+    "What is the average booking percentage per route?",
+    "Show me all stops on the North Corridor path",
+]
+
+
+def _post(base_url, path, question):
+    """POST a question and time the response; returns a dict of milestones in ms"""
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+    body = urlencode({"text": question, "currentPage": "home"})
+    start = time.perf_counter()
+    conn.request("POST", path, body=body, headers={
+        "Content-Type": "application/x-www-form-urlencoded",
+        "X-User-ID": "bench",
+    })
+    response = conn.getresponse()
+    timings = {}
+    buffer = b""
+    while True:
+        chunk = response.read1(4096)
+        if not chunk:
+            break
+        now = (time.perf_counter() - start) * 1000
+        timings.setdefault("first_byte", now)
+        buffer += chunk
+        if b"event: token" in buffer:
+            timings.setdefault("first_token", now)
+        if b"event: response" in buffer or path == "/api/movi":
+            timings.setdefault("response", now)
+    timings["complete"] = (time.perf_counter() - start) * 1000
+    conn.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for path in ("/api/movi", "/api/movi/stream"):
+        runs = [_post(args.base_url, path, q) for _ in range(args.rounds) for q in QUESTIONS]
+        print(f"{path} ({len(runs)} requests, mean ms)")
+        for milestone in ("first_byte", "first_token", "response", "complete"):
+            values = [run[milestone] for run in runs if milestone in run]
+            if values:
+                print(f"  {milestone:<12} {statistics.mean(values):8.0f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
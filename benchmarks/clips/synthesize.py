@@ -0,0 +1,75 @@
+"""
+Regenerates the command clips in benchmarks/clips/commands
+Speaks each COMMANDS entry of bench_asr_models with espeak-ng (en-us,
+150 words per minute) and writes it as 16 kHz mono 16-bit WAV, the format
+the chat widget uploads. Only needed to change the clip set; the
+benchmarks read the committed files.
+
+Needs the espeak-ng library and voice data from PyPI:
+    pip install espeakng-loader
+
+Usage (from the project root):
+    python -m benchmarks.clips.synthesize [--out DIR] [--rate 150]
+"""
+import argparse
+import ctypes
+import os
+import sys
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# espeak_AUDIO_OUTPUT / espeak_PARAMETER values from speak_lib.h
+_AUDIO_OUTPUT_SYNCHRONOUS = 2
+_ESPEAK_RATE = 1
+_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "commands"))
+    parser.add_argument("--voice", default="en-us")
+    parser.add_argument("--rate", type=int, default=150, help="Words per minute")
+    args = parser.parse_args()
+
+    import espeakng_loader
+
+    from benchmarks.bench_asr_models import COMMANDS
+    from movi.audio import SAMPLE_RATE, resample
+
+    lib = ctypes.CDLL(espeakng_loader.get_library_path())
+    rate = lib.espeak_Initialize(_AUDIO_OUTPUT_SYNCHRONOUS, 0, espeakng_loader.get_data_path().encode(), 0)
+    if rate <= 0:
+        sys.exit("espeak-ng failed to initialize")
+    chunks = []
+
+    @_CALLBACK
+    def collect(samples, count, events):
+        if count > 0:
+            chunks.append(np.ctypeslib.as_array(samples, shape=(count,)).copy())
+        return 0
+
+    lib.espeak_SetSynthCallback(collect)
+    lib.espeak_SetVoiceByName(args.voice.encode())
+    lib.espeak_SetParameter(_ESPEAK_RATE, args.rate, 0)
+
+    os.makedirs(args.out, exist_ok=True)
+    for clip_id, text in COMMANDS:
+        chunks.clear()
+        data = text.encode() + b"\0"
+        lib.espeak_Synth(data, len(data), 0, 0, 0, 0, None, None)
+        lib.espeak_Synchronize()
+        samples = resample(np.concatenate(chunks).astype(np.float32), rate)
+        path = os.path.join(args.out, f"{clip_id}.wav")
+        with wave.open(path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            out.writeframes(np.clip(samples, -32768, 32767).astype("<i2").tobytes())
+        print(f"{path}: {len(samples) / SAMPLE_RATE:.1f}s  {text!r}")
+
+
+if __name__ == "__main__":
+    main()
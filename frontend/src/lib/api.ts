@@ -55,6 +55,14 @@ export interface DailyTrip {
   driver_phone?: string | null;
 }
 
+// Live update for one trip from /api/changes/stream: rows replace all of the trip's rows
+export interface TripChange {
+  seq: number;
+  trip_id: string;
+  op: 'upsert' | 'delete';
+  rows: DailyTrip[];
+}
+
 export interface Deployment {
   deployment_id: string;
   trip_id: string;
@@ -62,10 +70,23 @@ export interface Deployment {
   driver_id: string | null;
 }
 
+export interface RouteStats {
+  route_id: string;
+  trips: number;
+  avg_booking_percentage: number | null;
+}
+
 export interface Stats {
   total_trips: number;
+  assigned_trips: number;
+  unassigned_trips: number;
   total_vehicles: number;
+  deployed_vehicles: number;
+  idle_vehicles: number;
   total_drivers: number;
+  deployed_drivers: number;
+  idle_drivers: number;
+  routes: RouteStats[];
 }
 
 // API Functions
@@ -173,13 +194,23 @@ export const api = {
     return response.json();
   },
 
-  // Export entire SQLite DB
+  // Export entire SQLite DB (gzip-compressed snapshot)
   exportDb: async (): Promise<Blob> => {
     const response = await fetch(`${API_BASE_URL}/export/db`);
     if (!response.ok) throw new Error('Failed to export DB');
     return response.blob();
   },
 
+  // Live trip changes (Server-Sent Events). EventSource reconnects on its own and
+  // resumes from the last event id; onReset means the list must be refetched.
+  // Returns a function that closes the stream.
+  subscribeTripChanges: (onChange: (change: TripChange) => void, onReset: () => void): (() => void) => {
+    const source = new EventSource(`${API_BASE_URL}/changes/stream`);
+    source.addEventListener('change', (event) => onChange(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('reset', onReset);
+    return () => source.close();
+  },
+
   // Movi chat endpoint - returns Response for JSON parsing
   sendMoviMessage: async (form: FormData): Promise<Response> => {
     const response = await fetch(`${API_BASE_URL}/movi`, {
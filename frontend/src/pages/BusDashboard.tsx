@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { Bus, Users, MapPin, Pencil, Trash2 } from "lucide-react";
 import { Button } from "@/components/ui/button";
@@ -26,7 +26,7 @@ import {
   AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
 import { Dialog, DialogContent, DialogDescription, DialogFooter, DialogHeader, DialogTitle } from "@/components/ui/dialog";
-import { api } from "@/lib/api";
+import { api, TripChange } from "@/lib/api";
 import { useToast } from "@/hooks/use-toast";
 import { Label } from "@/components/ui/label";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
@@ -64,6 +64,22 @@ const BusDashboard = () => {
     queryFn: api.getDailyTrips,
   });
 
+  // Apply live trip changes in place instead of refetching the whole list
+  useEffect(() => {
+    const applyChange = (change: TripChange) => {
+      queryClient.setQueryData<TripData[]>(["daily-trips"], (current) => {
+        if (!current) return current;
+        const rows = [...current.filter((trip) => trip.trip_id !== change.trip_id), ...(change.rows as TripData[])];
+        return rows.sort((a, b) =>
+          a.display_name.localeCompare(b.display_name) || a.trip_id.localeCompare(b.trip_id)
+        );
+      });
+      queryClient.invalidateQueries({ queryKey: ["stats"] });
+    };
+    const reload = () => queryClient.invalidateQueries({ queryKey: ["daily-trips"] });
+    return api.subscribeTripChanges(applyChange, reload);
+  }, [queryClient]);
+
   // Fetch stats
   const { data: stats } = useQuery({
     queryKey: ["stats"],
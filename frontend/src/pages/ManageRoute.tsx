@@ -814,7 +814,7 @@ const ManageRoute = () => {
                   const url = URL.createObjectURL(res);
                   const a = document.createElement("a");
                   a.href = url;
-                  a.download = `moveinsync_${Date.now()}.db`;
+                  a.download = `moveinsync_${Date.now()}.db.gz`;
                   a.click();
                   URL.revokeObjectURL(url);
                 } catch (e) {
@@ -824,7 +824,7 @@ const ManageRoute = () => {
                 }
               }}
             >
-              SQLite DB (.db)
+              SQLite DB (.db.gz)
             </Button>
           </div>
         </DialogContent>
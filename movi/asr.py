@@ -1,48 +1,101 @@
 """
 Automatic Speech Recognition using OpenAI Whisper
-Processes audio files and returns transcribed text
+Processes audio (a file path, or the upload's bytes straight from memory)
+and returns transcribed text
+Audio is decoded here, looked up in the transcription cache
+(movi/transcript_cache.py) and only transcribed on a miss - on the worker
+pool in movi/asr_pool.py, or with MOVI_ASR_WORKERS=0 in the calling thread.
+Model size, quantization and decode options: movi/asr_model.py.
 """
-import whisper
+# Imported here so a missing install surfaces as ImportError on import (app.py checks for it)
+import whisper  # noqa: F401
+import io
 import os
+import time
+import wave
 
-# Load Whisper base model (cached after first load)
+from movi.asr_model import DECODE_OPTIONS, load_whisper, model_tag
+from movi.asr_pool import ASRBusy, WORKERS, get_pool
+from movi.audio import SAMPLE_RATE, decode_audio
+from movi.metrics import ASR_DURATION
+from movi.transcript_cache import cache_key, transcript_cache
+
+# Load the configured Whisper model (cached after first load)
 _model = None
 
 def load_model():
-    """Load Whisper base model (lazy loading)"""
+    """Load the configured Whisper model (lazy loading)"""
     global _model
     if _model is None:
-        print("[ASR] Loading Whisper base model...")
-        _model = whisper.load_model("base")
-        print("[ASR] Whisper base model loaded successfully!")
+        print(f"[ASR] Loading Whisper {model_tag()} model...")
+        _model = load_whisper()
+        print(f"[ASR] Whisper {model_tag()} model loaded successfully!")
     return _model
 
-def transcribe_audio(audio_path: str) -> str:
+def warm_up(timeout: float = 600):
+    """
+    Loads the model (every pool worker) and runs one transcription of a
+    second of silence, so the first voice request pays for neither.
+    Raises on failure.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes(b'\0\0' * SAMPLE_RATE)
+    if WORKERS > 0:
+        pool = get_pool()
+        deadline = time.monotonic() + timeout
+        while pool.stats()["ready_workers"] < pool.workers:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"ASR workers not ready after {timeout:.0f}s")
+            time.sleep(0.2)
+        pool.transcribe(buffer.getvalue())
+    else:
+        _transcribe(decode_audio(buffer.getvalue()))
+
+def _transcribe(samples) -> str:
+    if WORKERS > 0:
+        return get_pool().transcribe(samples)
+    model = load_model()
+    return model.transcribe(samples, fp16=model.device.type == "cuda", **DECODE_OPTIONS)["text"].strip()
+
+def transcribe_audio(audio) -> str:
     """
-    Transcribe audio file using Whisper base model
+    Transcribe audio using the configured Whisper model
     
     Args:
-        audio_path: Path to the audio file (WAV, MP3, etc.)
+        audio: Path to an audio file, or its bytes / a file-like object
+            (WAV, MP3, WebM, etc.); PCM WAV is decoded without ffmpeg
     
     Returns:
         Transcribed text as string
+
+    Raises:
+        ASRBusy: The worker pool's queue is full
     """
     try:
-        if not os.path.exists(audio_path):
-            print(f"[ASR] Error: Audio file not found: {audio_path}")
-            return ""
-        
-        print(f"[ASR] Processing audio file: {audio_path}")
-        model = load_model()
-        
-        # Transcribe audio
-        result = model.transcribe(audio_path)
-        transcribed_text = result["text"].strip()
+        if isinstance(audio, (str, os.PathLike)):
+            if not os.path.exists(audio):
+                print(f"[ASR] Error: Audio file not found: {audio}")
+                return ""
+            print(f"[ASR] Processing audio file: {audio}")
+        else:
+            print("[ASR] Processing uploaded audio")
+        with ASR_DURATION.time():
+            samples = decode_audio(audio)
+            transcribed_text = transcript_cache.get_or_compute(
+                cache_key(samples, model_tag(), DECODE_OPTIONS), lambda: _transcribe(samples)
+            )
         
         print(f"[ASR] Transcription completed!")
         print(f"[ASR] Extracted speech: {transcribed_text}")
         
         return transcribed_text
+    except ASRBusy:
+        print("[ASR] Worker queue full, rejecting request")
+        raise
     except Exception as e:
         print(f"[ASR] Error during transcription: {str(e)}")
         return ""
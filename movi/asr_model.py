@@ -0,0 +1,74 @@
+"""
+Whisper model selection, quantization and decode options
+Shared by the in-process path (movi/asr.py) and the pool workers
+(movi/asr_pool.py), and part of the transcription cache key.
+
+  MOVI_ASR_MODEL      tiny | base | small (or their .en variants), default base
+  MOVI_ASR_QUANTIZE   1: dynamic int8 quantization of the Linear layers (CPU only)
+  MOVI_ASR_LANGUAGE   pinned language, default en; empty to auto-detect
+  MOVI_ASR_BEAM_SIZE  beam search width; unset for greedy decoding
+  MOVI_ASR_TIMESTAMPS 1 to predict timestamp tokens (not needed for commands)
+
+Short commands such as "assign vehicle V003 to T008" decode well with a
+small model: benchmarks/bench_asr_models.py reports the real-time factor,
+memory and word error rate of each combination.
+"""
+import os
+
+MODEL_SIZES = ("tiny", "base", "small", "tiny.en", "base.en", "small.en")
+
+MODEL_NAME = os.getenv("MOVI_ASR_MODEL", "base")
+if MODEL_NAME not in MODEL_SIZES:
+    print(f"[ASR] Unknown MOVI_ASR_MODEL {MODEL_NAME!r}, using base (choose from {', '.join(MODEL_SIZES)})")
+    MODEL_NAME = "base"
+QUANTIZE = os.getenv("MOVI_ASR_QUANTIZE", "0") not in ("0", "false", "no", "")
+
+
+def decode_options(language: str = None, beam_size: int = None, timestamps: bool = None) -> dict:
+    """Decode options for model.transcribe() / whisper.DecodingOptions, from the environment by default."""
+    if language is None:
+        language = os.getenv("MOVI_ASR_LANGUAGE", "en")
+    if beam_size is None and os.getenv("MOVI_ASR_BEAM_SIZE"):
+        beam_size = int(os.getenv("MOVI_ASR_BEAM_SIZE"))
+    if timestamps is None:
+        timestamps = os.getenv("MOVI_ASR_TIMESTAMPS", "0") not in ("0", "false", "no", "")
+    options = {"without_timestamps": not timestamps}
+    if language:
+        options["language"] = language
+    if beam_size:
+        options["beam_size"] = beam_size
+    return options
+
+
+DECODE_OPTIONS = decode_options()
+
+
+def model_tag(model_name: str = MODEL_NAME, quantize: bool = QUANTIZE) -> str:
+    """Model identity for cache keys and logs, e.g. "base-int8"."""
+    return f"{model_name}-int8" if quantize else model_name
+
+
+def load_whisper(model_name: str = MODEL_NAME, quantize: bool = QUANTIZE):
+    """
+    Loads a Whisper model, optionally with int8 dynamic quantization.
+
+    Args:
+        model_name: One of MODEL_SIZES
+        quantize: Quantize the Linear layers to int8 (forces CPU)
+
+    Returns:
+        The whisper model, in eval mode
+    """
+    import torch
+    import whisper
+
+    if not quantize:
+        return whisper.load_model(model_name)
+    model = whisper.load_model(model_name, device="cpu")
+    # whisper.model.Linear only adds a dtype cast for fp16, which int8 CPU inference never uses;
+    # quantize_dynamic only converts modules whose type is exactly nn.Linear
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model.eval()
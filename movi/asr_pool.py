@@ -0,0 +1,331 @@
+"""
+Whisper worker pool
+Transcription runs in MOVI_ASR_WORKERS separate processes, each with the
+model preloaded and torch limited to MOVI_ASR_THREADS threads, so voice
+requests neither hold the Flask threads' GIL nor oversubscribe the CPU.
+
+Jobs go through one shared queue. At most MOVI_ASR_QUEUE_SIZE jobs are
+queued or running; submit() waits up to MOVI_ASR_QUEUE_TIMEOUT seconds
+for a slot and then raises ASRBusy (reported as 503). A worker that picks
+up a job also takes whatever else is already waiting (up to
+MOVI_ASR_BATCH_SIZE) and decodes the clips of up to 30 s in one batched
+forward pass - but only while no other worker is idle, so batching only
+happens when the pool is saturated anyway.
+
+Each worker records the ids of the jobs it holds in a shared array as it
+dequeues them, so the jobs of a worker that dies are failed instead of
+waiting forever; transcribe() also gives up its job (and queue slot)
+after MOVI_ASR_JOB_TIMEOUT.
+
+This module does not import whisper or torch; only the workers do.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from movi.asr_model import DECODE_OPTIONS, MODEL_NAME, QUANTIZE, load_whisper, model_tag
+from movi.metrics import histogram, register_collector
+
+WORKERS = int(os.getenv("MOVI_ASR_WORKERS", min(2, os.cpu_count() or 1)))
+THREADS = int(os.getenv("MOVI_ASR_THREADS", max(1, (os.cpu_count() or 1) // max(WORKERS, 1))))
+QUEUE_SIZE = int(os.getenv("MOVI_ASR_QUEUE_SIZE", 32))
+QUEUE_TIMEOUT = float(os.getenv("MOVI_ASR_QUEUE_TIMEOUT", 5))
+JOB_TIMEOUT = float(os.getenv("MOVI_ASR_JOB_TIMEOUT", 120))
+BATCH_SIZE = int(os.getenv("MOVI_ASR_BATCH_SIZE", 8))
+# A worker that dies before loading the model is restarted at most this often
+RESTART_BACKOFF_SECONDS = 30
+
+ASR_BATCH_SIZE = histogram("movi_asr_batch_size", "Clips decoded per worker batch", buckets=(1, 2, 4, 8, 16))
+ASR_QUEUE_WAIT = histogram("movi_asr_queue_wait_seconds", "Time a transcription job waited for a worker")
+
+
+class ASRBusy(RuntimeError):
+    """The job queue stayed full for the whole queue timeout."""
+
+
+# Worker process
+
+def _transcribe_batch(model, jobs, results, options):
+    import torch
+    import whisper
+
+    from movi.audio import decode_audio
+
+    fp16 = model.device.type == "cuda"
+    clips = []
+    for job_id, audio in jobs:
+        try:
+            clips.append((job_id, decode_audio(audio)))
+        except Exception as e:
+            results.put(("done", job_id, None, f"could not decode audio: {e}", 1))
+
+    short = [clip for clip in clips if len(clip[1]) <= whisper.audio.N_SAMPLES]
+    if len(short) > 1:
+        try:
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels) for _, audio in short
+            ]).to(model.device)
+            decoding = whisper.DecodingOptions(fp16=fp16, **options)
+            for (job_id, _), decoded in zip(short, whisper.decode(model, mels, decoding)):
+                results.put(("done", job_id, decoded.text.strip(), None, len(short)))
+            batched = {job_id for job_id, _ in short}
+            clips = [clip for clip in clips if clip[0] not in batched]
+        except Exception as e:
+            print(f"[ASR] Batched decode failed, transcribing one by one: {e}")
+
+    for job_id, audio in clips:
+        try:
+            text = model.transcribe(audio, fp16=fp16, **options)["text"].strip()
+            results.put(("done", job_id, text, None, 1))
+        except Exception as e:
+            results.put(("done", job_id, None, str(e), 1))
+
+
+def _worker_main(index, model_name, quantize, options, threads, tasks, results, idle, current):
+    import torch
+
+    torch.set_num_threads(threads)
+    start = time.perf_counter()
+    model = load_whisper(model_name, quantize)
+    results.put(("ready", index, os.getpid(), time.perf_counter() - start))
+
+    stopping = False
+    while not stopping:
+        # Ids of the jobs this worker holds; the parent fails them if it dies
+        current[:] = [0] * len(current)
+        with idle.get_lock():
+            idle.value += 1
+        job = tasks.get()
+        with idle.get_lock():
+            idle.value -= 1
+        if job is None:
+            break
+        current[0] = job[0]
+        jobs = [job]
+        # Whatever is already waiting goes into the same batch, unless another worker is free for it
+        while len(jobs) < len(current) and idle.value == 0:
+            try:
+                job = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                stopping = True
+                break
+            current[len(jobs)] = job[0]
+            jobs.append(job)
+        results.put(("taken", index, [job_id for job_id, _ in jobs]))
+        _transcribe_batch(model, jobs, results, options)
+
+
+# Parent side
+
+class ASRPool:
+    """
+    Pool of Whisper worker processes.
+
+    Args:
+        workers: Number of processes
+        threads: torch threads per process
+        queue_size: Jobs queued or running before submit() blocks
+        model_name: Whisper model to load in every worker
+        quantize: int8 dynamic quantization (see movi/asr_model.py)
+        options: Decode options
+    """
+
+    def __init__(self, workers: int = WORKERS, threads: int = THREADS, queue_size: int = QUEUE_SIZE,
+                 model_name: str = MODEL_NAME, quantize: bool = QUANTIZE, options: dict = None):
+        self.workers = workers
+        self.threads = threads
+        self.queue_size = queue_size
+        self.model_name = model_name
+        self.quantize = quantize
+        self.options = DECODE_OPTIONS if options is None else options
+        # spawn: forking a process with torch and Flask threads loaded is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        # Workers blocked waiting for a job
+        self._idle = self._context.Value("i", 0)
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        # Worker index -> shared array of the job ids it holds (0 = free)
+        self._current = {}
+        self._processes = {}
+        self._spawned = {}
+        self._ready = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0}
+        for index in range(workers):
+            self._spawn(index)
+        self._collector = threading.Thread(target=self._collect, name="movi-asr-results", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, index):
+        self._current[index] = self._context.Array("q", BATCH_SIZE, lock=False)
+        process = self._context.Process(
+            target=_worker_main, name=f"movi-asr-{index}",
+            args=(index, self.model_name, self.quantize, self.options, self.threads,
+                  self._tasks, self._results, self._idle, self._current[index]), daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        self._spawned[index] = time.monotonic()
+
+    def _finish(self, job_id, text, error):
+        with self._lock:
+            future = self._jobs.pop(job_id, None)
+            if future is None:
+                return
+            self._stats["failed" if error else "completed"] += 1
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(text)
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._results.get(timeout=1)
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                return
+            if message is not None:
+                kind = message[0]
+                if kind == "ready":
+                    _, index, pid, seconds = message
+                    self._ready[index] = seconds
+                    print(f"[ASR] Worker {index} (pid {pid}) loaded Whisper {model_tag(self.model_name, self.quantize)} in {seconds:.1f}s")
+                elif kind == "taken":
+                    _, index, job_ids = message
+                    with self._lock:
+                        for job_id in job_ids:
+                            future = self._jobs.get(job_id)
+                            if future is not None:
+                                ASR_QUEUE_WAIT.observe(time.perf_counter() - future.submitted)
+                    ASR_BATCH_SIZE.observe(len(job_ids))
+                else:
+                    _, job_id, text, error, _ = message
+                    self._finish(job_id, text, error)
+            if self._closed:
+                return
+            self._check_workers()
+
+    def _check_workers(self):
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            if index not in self._ready and time.monotonic() - self._spawned[index] < RESTART_BACKOFF_SECONDS:
+                continue
+            # Finished jobs among these are already resolved; _finish skips them
+            lost = [job_id for job_id in self._current[index] if job_id]
+            print(f"[ASR] Worker {index} exited with code {process.exitcode}; restarting "
+                  f"({len(lost)} job(s) lost)")
+            self._ready.pop(index, None)
+            for job_id in lost:
+                self._finish(job_id, None, "ASR worker crashed")
+            self._spawn(index)
+
+    def submit(self, audio, timeout: float = QUEUE_TIMEOUT) -> Future:
+        """
+        Queues a transcription.
+
+        Args:
+            audio: Decoded samples, audio bytes or the path of an audio file
+            timeout: Seconds to wait for a free queue slot
+
+        Returns:
+            Future resolving to the transcribed text
+
+        Raises:
+            ASRBusy: The queue stayed full for timeout seconds
+        """
+        if self._closed:
+            raise RuntimeError("ASR pool is shut down")
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ASRBusy(f"ASR queue full ({self.queue_size} jobs)")
+        job_id = next(self._ids)
+        future = Future()
+        future.job_id = job_id
+        future.submitted = time.perf_counter()
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._jobs[job_id] = future
+        self._tasks.put((job_id, audio))
+        return future
+
+    def transcribe(self, audio, timeout: float = JOB_TIMEOUT) -> str:
+        """
+        Transcribes audio (samples, bytes or path) on a worker, waiting at most
+        timeout seconds for the result. On timeout the job is failed, which frees
+        its queue slot; a worker that still runs it discards the result.
+        """
+        future = self.submit(audio)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self._finish(future.job_id, None, f"transcription timed out after {timeout:g}s")
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._jobs)
+        stats["workers"] = sum(process.is_alive() for process in self._processes.values())
+        stats["ready_workers"] = len(self._ready)
+        return stats
+
+    def shutdown(self, timeout: float = 5):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            pending, self._jobs = list(self._jobs.values()), {}
+        for future in pending:
+            future.set_exception(RuntimeError("ASR pool is shut down"))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ASRPool:
+    """The process-wide pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            print(f"[ASR] Starting {WORKERS} Whisper worker(s), {THREADS} thread(s) each")
+            _pool = ASRPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _collect_metrics():
+    if _pool is None:
+        return []
+    stats = _pool.stats()
+    return [
+        ("movi_asr_jobs_total", "Transcription jobs since start", ("status",),
+         {(status,): stats[status] for status in ("completed", "failed", "rejected")}),
+        ("movi_asr_pending_jobs", "Transcription jobs queued or running", (), {(): stats["pending"]}),
+        ("movi_asr_workers", "Live ASR worker processes", ("state",),
+         {("alive",): stats["workers"], ("ready",): stats["ready_workers"]}),
+    ]
+
+
+register_collector(_collect_metrics)
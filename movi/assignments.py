@@ -0,0 +1,276 @@
+"""
+Bulk vehicle/driver assignment with conflict detection
+A batch of assignments is checked and applied in one write transaction:
+  - double-booking: a vehicle or driver may not be on two trips whose
+    shifts overlap (route shift_time + MOVI_TRIP_DURATION_MINUTES)
+  - capacity: the vehicle must seat the route's capacity
+
+Everything the checks need - target deployments, vehicles, drivers and
+their current bookings - is loaded with a few IN queries over the
+Deployments indexes, then the batch is checked in memory. Vehicles and
+drivers being moved off a deployment in the same batch are released
+first, so swaps between overlapping trips are accepted.
+"""
+import os
+import re
+import sqlite3
+
+TRIP_DURATION_MINUTES = int(os.getenv("MOVI_TRIP_DURATION_MINUTES", 90))
+MAX_ASSIGNMENTS = int(os.getenv("MOVI_MAX_BULK_ASSIGNMENTS", 5000))
+_IN_CHUNK = 500
+_DAY = 24 * 60
+
+_SHIFT_TIME = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s*$")
+
+
+class AssignmentError(ValueError):
+    """Malformed request (reported to the client as 400)."""
+
+
+def shift_minutes(text):
+    """Minutes after midnight for "08:00 AM" / "18:30"; None if unparseable."""
+    match = _SHIFT_TIME.match(text or "")
+    if not match:
+        return None
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def _overlaps(shift_a, shift_b) -> bool:
+    a, b = shift_minutes(shift_a), shift_minutes(shift_b)
+    if a is None or b is None:
+        # Unknown format: only identical shifts are known to clash
+        return shift_a == shift_b
+    gap = abs(a - b) % _DAY
+    return min(gap, _DAY - gap) < TRIP_DURATION_MINUTES
+
+
+def parse_assignments(payload) -> list:
+    """
+    Validates the request body.
+
+    Args:
+        payload: {"assignments": [{"deployment_id" or "trip_id", "vehicle_id"?, "driver_id"?}]};
+            an omitted vehicle_id/driver_id is left as is, null unassigns
+
+    Returns:
+        The list of assignment dicts
+    """
+    assignments = payload.get("assignments") if isinstance(payload, dict) else None
+    if not isinstance(assignments, list) or not assignments:
+        raise AssignmentError("Body must be {\"assignments\": [...]} with at least one assignment")
+    if len(assignments) > MAX_ASSIGNMENTS:
+        raise AssignmentError(f"At most {MAX_ASSIGNMENTS} assignments per request")
+    for index, item in enumerate(assignments):
+        if not isinstance(item, dict):
+            raise AssignmentError(f"Assignment {index} must be an object")
+        if not item.get("deployment_id") and not item.get("trip_id"):
+            raise AssignmentError(f"Assignment {index} needs a deployment_id or trip_id")
+        if "vehicle_id" not in item and "driver_id" not in item:
+            raise AssignmentError(f"Assignment {index} sets neither vehicle_id nor driver_id")
+        for field in ("deployment_id", "trip_id", "vehicle_id", "driver_id"):
+            if item.get(field) is not None and not isinstance(item[field], str):
+                raise AssignmentError(f"Assignment {index}: {field} must be a string or null")
+    return assignments
+
+
+def _fetch(conn, sql, values):
+    """Runs sql (with one "{ids}" IN placeholder) for values in chunks."""
+    values = list(values)
+    rows = []
+    for i in range(0, len(values), _IN_CHUNK):
+        chunk = values[i:i + _IN_CHUNK]
+        rows += conn.execute(sql.format(ids=", ".join("?" * len(chunk))), chunk).fetchall()
+    return rows
+
+
+_DEPLOYMENT = '''
+    SELECT d.deployment_id, d.trip_id, d.vehicle_id, d.driver_id, r.shift_time, r.capacity
+    FROM Deployments d
+    JOIN DailyTrips t ON t.trip_id = d.trip_id
+    JOIN Routes r ON r.route_id = t.route_id
+'''
+
+
+class _Context:
+    """Rows the checks need, loaded up front."""
+
+    def __init__(self, conn, assignments):
+        deployment_ids = {a["deployment_id"] for a in assignments if a.get("deployment_id")}
+        trip_ids = {a["trip_id"] for a in assignments if not a.get("deployment_id")}
+        self.deployments = {
+            row["deployment_id"]: dict(row)
+            for row in _fetch(conn, _DEPLOYMENT + "WHERE d.deployment_id IN ({ids})", deployment_ids)
+        }
+        self.by_trip = {}
+        for row in _fetch(conn, _DEPLOYMENT + "WHERE d.trip_id IN ({ids})", trip_ids):
+            self.deployments[row["deployment_id"]] = dict(row)
+            self.by_trip.setdefault(row["trip_id"], []).append(row["deployment_id"])
+
+        vehicle_ids = {a["vehicle_id"] for a in assignments if a.get("vehicle_id")}
+        driver_ids = {a["driver_id"] for a in assignments if a.get("driver_id")}
+        self.vehicles = {
+            row["vehicle_id"]: row["capacity"]
+            for row in _fetch(conn, "SELECT vehicle_id, capacity FROM Vehicles WHERE vehicle_id IN ({ids})",
+                              vehicle_ids)
+        }
+        self.drivers = {
+            row["driver_id"]
+            for row in _fetch(conn, "SELECT driver_id FROM Drivers WHERE driver_id IN ({ids})", driver_ids)
+        }
+
+        # Current bookings of every vehicle / driver the batch assigns:
+        # resource -> {deployment_id: shift_time}
+        self.bookings = {"vehicle_id": {}, "driver_id": {}}
+        for field, ids in (("vehicle_id", self.vehicles), ("driver_id", self.drivers)):
+            rows = _fetch(conn, _DEPLOYMENT + f"WHERE d.{field} IN ({{ids}})", ids)
+            for row in rows:
+                self.bookings[field].setdefault(row[field], {})[row["deployment_id"]] = row["shift_time"]
+                self.deployments.setdefault(row["deployment_id"], dict(row))
+
+    def resolve(self, assignment):
+        """Returns (deployment_id, error)."""
+        deployment_id = assignment.get("deployment_id")
+        if deployment_id:
+            if deployment_id not in self.deployments:
+                return deployment_id, f"deployment {deployment_id!r} not found"
+            trip_id = assignment.get("trip_id")
+            if trip_id and self.deployments[deployment_id]["trip_id"] != trip_id:
+                return deployment_id, f"deployment {deployment_id!r} is not for trip {trip_id!r}"
+            return deployment_id, None
+        matches = self.by_trip.get(assignment["trip_id"], [])
+        if len(matches) != 1:
+            problem = "has no deployment" if not matches else "has several deployments; give deployment_id"
+            return None, f"trip {assignment['trip_id']!r} {problem}"
+        return matches[0], None
+
+
+def _check(context, assignments, skip=None):
+    """
+    Checks assignments in order against the bookings. Assignments in skip
+    (index -> errors) are rejected up front and keep their current vehicle/driver.
+
+    Returns:
+        (results, updates): a result dict per assignment, and the
+        (vehicle_id, driver_id, deployment_id) rows to write
+    """
+    skip = skip or {}
+    bookings = {field: {k: dict(v) for k, v in booked.items()} for field, booked in context.bookings.items()}
+    resolved = [context.resolve(a) for a in assignments]
+
+    # Release what the batch moves off its deployments, so swaps don't clash with themselves
+    for index, (assignment, (deployment_id, error)) in enumerate(zip(assignments, resolved)):
+        if index in skip or error:
+            continue
+        current = context.deployments[deployment_id]
+        for field in ("vehicle_id", "driver_id"):
+            if field in assignment and current[field] is not None:
+                bookings[field].get(current[field], {}).pop(deployment_id, None)
+
+    results, updates, targeted = [], [], set()
+    for index, (assignment, (deployment_id, error)) in enumerate(zip(assignments, resolved)):
+        result = {"index": index, "deployment_id": deployment_id, "status": "rejected", "errors": []}
+        results.append(result)
+        if index in skip:
+            result["errors"] = skip[index]
+            continue
+        if error:
+            result["errors"].append(error)
+            continue
+        if deployment_id in targeted:
+            result["errors"].append(f"deployment {deployment_id!r} appears more than once")
+            continue
+        targeted.add(deployment_id)
+
+        current = context.deployments[deployment_id]
+        result["trip_id"] = current["trip_id"]
+        vehicle_id = assignment.get("vehicle_id", current["vehicle_id"])
+        driver_id = assignment.get("driver_id", current["driver_id"])
+
+        if "vehicle_id" in assignment and vehicle_id is not None:
+            if vehicle_id not in context.vehicles:
+                result["errors"].append(f"vehicle {vehicle_id!r} not found")
+            elif context.vehicles[vehicle_id] < current["capacity"]:
+                result["errors"].append(
+                    f"vehicle {vehicle_id!r} seats {context.vehicles[vehicle_id]}, "
+                    f"route capacity is {current['capacity']}"
+                )
+        if "driver_id" in assignment and driver_id is not None and driver_id not in context.drivers:
+            result["errors"].append(f"driver {driver_id!r} not found")
+
+        for field, resource in (("vehicle_id", vehicle_id), ("driver_id", driver_id)):
+            if field not in assignment or resource is None:
+                continue
+            for other, shift in bookings[field].get(resource, {}).items():
+                if other != deployment_id and _overlaps(shift, current["shift_time"]):
+                    result["errors"].append(
+                        f"{field[:-3]} {resource!r} is already on deployment {other!r} "
+                        f"(trip {context.deployments[other]['trip_id']}, shift {shift}) "
+                        f"overlapping shift {current['shift_time']}"
+                    )
+        if result["errors"]:
+            continue
+
+        for field, resource in (("vehicle_id", vehicle_id), ("driver_id", driver_id)):
+            if field in assignment and resource is not None:
+                bookings[field].setdefault(resource, {})[deployment_id] = current["shift_time"]
+        result.update(status="applied", vehicle_id=vehicle_id, driver_id=driver_id)
+        updates.append((vehicle_id, driver_id, deployment_id))
+    return results, updates
+
+
+def assign(conn: sqlite3.Connection, assignments: list, atomic: bool = True) -> dict:
+    """
+    Checks and applies a batch of assignments in one transaction.
+
+    Args:
+        conn: Read-write connection
+        assignments: As returned by parse_assignments()
+        atomic: Apply nothing if any assignment is rejected; otherwise apply
+            the ones that pass (rejected ones keep their current vehicle/driver,
+            and assignments that would clash with those are rejected too)
+
+    Returns:
+        Summary dict: applied, rejected, results (one per assignment, in order)
+    """
+    # IMMEDIATE: no other writer can book a vehicle between the checks and the update
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        context = _Context(conn, assignments)
+        results, updates = _check(context, assignments)
+        if not atomic:
+            # Rejected assignments keep their old bookings - recheck the rest with
+            # those in place until nothing new is rejected
+            skip = {}
+            while True:
+                rejected = {r["index"]: r["errors"] for r in results
+                            if r["status"] == "rejected" and r["index"] not in skip}
+                if not rejected:
+                    break
+                skip.update(rejected)
+                results, updates = _check(context, assignments, skip)
+        if updates and (not atomic or len(updates) == len(assignments)):
+            conn.executemany("UPDATE Deployments SET vehicle_id = ?, driver_id = ? WHERE deployment_id = ?",
+                             updates)
+            conn.commit()
+        else:
+            conn.rollback()
+            if atomic:
+                for result in results:
+                    if result["status"] == "applied":
+                        result["status"] = "valid"
+                updates = []
+    except Exception:
+        conn.rollback()
+        raise
+    return {
+        "applied": len(updates),
+        "rejected": sum(r["status"] == "rejected" for r in results),
+        "results": results,
+    }
@@ -0,0 +1,116 @@
+"""
+Audio decoding for speech recognition
+Turns a path, raw bytes or a file-like object into the 16 kHz mono
+float32 samples Whisper expects, without touching the disk:
+  - PCM WAV (what the chat widget uploads) is parsed in-process with the
+    wave module, down-mixed and resampled with numpy - no subprocess
+  - anything else is piped through ffmpeg's stdin/stdout
+"""
+import io
+import os
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_PCM_SCALE = {1: 128.0, 2: 32768.0, 3: 8388608.0, 4: 2147483648.0}
+
+
+def read_source(source) -> bytes:
+    """Bytes of a path, bytes-like or file-like source."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "read"):
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def _pcm_samples(frames: bytes, width: int) -> np.ndarray:
+    if width == 1:
+        # 8-bit WAV is unsigned
+        return np.frombuffer(frames, np.uint8).astype(np.float32) - 128.0
+    if width == 3:
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3).astype(np.int32)
+        value = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        return np.where(value & 0x800000, value - 0x1000000, value).astype(np.float32)
+    return np.frombuffer(frames, {2: "<i2", 4: "<i4"}[width]).astype(np.float32)
+
+
+def resample(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Resamples mono float32 samples from rate to SAMPLE_RATE."""
+    if rate == SAMPLE_RATE:
+        return samples
+    if rate % SAMPLE_RATE == 0:
+        # 48 kHz (the usual browser rate) and 32 kHz: average each group of samples
+        factor = rate // SAMPLE_RATE
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1)
+    duration = len(samples) / rate
+    target = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    return np.interp(target, np.arange(len(samples)) / rate, samples).astype(np.float32)
+
+
+def decode_wav(data: bytes):
+    """16 kHz mono float32 samples of a PCM WAV, or None if data is not one wave can read."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        # Float or compressed WAV - ffmpeg handles those
+        return None
+    if width not in _PCM_SCALE:
+        return None
+    samples = _pcm_samples(frames, width) / _PCM_SCALE[width]
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return resample(samples.astype(np.float32), rate)
+
+
+def _ffmpeg(args, data=None) -> np.ndarray:
+    # -nostdin unless the input is piped in
+    command = ["ffmpeg", "-hide_banner", *([] if data is not None else ["-nostdin"]), "-threads", "0", *args,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    result = subprocess.run(command, input=data, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(source) -> np.ndarray:
+    """
+    Decodes audio for Whisper.
+
+    Args:
+        source: Path, bytes or file-like object in any format ffmpeg reads
+            (already decoded samples are passed through)
+
+    Returns:
+        16 kHz mono float32 samples in [-1, 1]
+    """
+    if isinstance(source, np.ndarray):
+        return source.astype(np.float32, copy=False)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            head = f.read(12)
+        if head[:4] != b"RIFF":
+            return _ffmpeg(["-i", os.fspath(source)])
+    data = read_source(source)
+    samples = decode_wav(data)
+    if samples is not None:
+        return samples
+    try:
+        return _ffmpeg(["-i", "pipe:0"], data)
+    except subprocess.CalledProcessError:
+        # Containers that need a seekable input (e.g. MP4 with the index at the end)
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return _ffmpeg(["-i", path])
+        finally:
+            os.remove(path)
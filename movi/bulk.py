@@ -0,0 +1,432 @@
+"""
+Streaming bulk import and export
+Uploads are parsed record by record (CSV with a header row, or NDJSON),
+validated - types, required fields, duplicate keys, foreign keys - and
+inserted with executemany in batches. Bad rows are skipped and reported
+with their row number; the rest of the batch still goes in. Exports
+stream rows out of a single read transaction in the same two formats.
+
+Each batch is its own transaction unless atomic=True, in which case the
+whole upload is one transaction that is rolled back if any row fails.
+Import parents first: stops, paths, routes, vehicles, drivers, trips,
+deployments.
+"""
+import csv
+import io
+import json
+import os
+import sqlite3
+
+DEFAULT_BATCH_SIZE = int(os.getenv("MOVI_IMPORT_BATCH_SIZE", 5000))
+MAX_BATCH_SIZE = 50000
+# Row errors listed in the response (all are counted)
+MAX_REPORTED_ERRORS = int(os.getenv("MOVI_IMPORT_MAX_ERRORS", 1000))
+EXPORT_BATCH = 1000
+# SQLite host parameter limit is far higher; this keeps IN lists cheap to plan
+_IN_CHUNK = 500
+
+FORMATS = ("csv", "ndjson")
+CONFLICT_MODES = ("error", "ignore", "replace")
+
+
+class BulkError(ValueError):
+    """Invalid upload or parameters (reported to the client as 400)."""
+
+
+class RowError(ValueError):
+    """A single record failed validation."""
+
+
+def _text(value):
+    if isinstance(value, (dict, list, bool)):
+        raise ValueError("expected a string")
+    return str(value)
+
+
+def _integer(value):
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError("expected an integer")
+        return int(value)
+    return int(value) if isinstance(value, int) else int(str(value).strip())
+
+
+def _real(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    return float(value)
+
+
+def _id_list(value):
+    """A list of ids: JSON array (NDJSON or CSV) or "S001|S002" (CSV). Stored as JSON."""
+    if isinstance(value, str):
+        value = value.strip()
+        value = json.loads(value) if value.startswith("[") else [v.strip() for v in value.split("|") if v.strip()]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError("expected a list of ids")
+    return json.dumps(value)
+
+
+class Entity:
+    """
+    One importable / exportable table.
+
+    Args:
+        table: Table name
+        columns: Field name -> converter, in table column order; converters raise
+            ValueError for bad input
+        key: Primary key column
+        references: Column -> (table, column) it must exist in; list columns
+            (converted with _id_list) are checked element by element
+        optional: Columns that may be empty (stored as NULL, or the default)
+        defaults: Column -> value used when the field is empty
+    """
+
+    def __init__(self, table: str, columns: dict, key: str, references: dict = None,
+                 optional=(), defaults: dict = None):
+        self.table = table
+        self.columns = columns
+        self.key = key
+        self.references = references or {}
+        self.defaults = defaults or {}
+        self.optional = set(optional) | set(self.defaults)
+
+    def convert(self, record: dict) -> tuple:
+        """Validates one record. Returns the row as a tuple in column order."""
+        if not isinstance(record, dict):
+            raise RowError("expected an object")
+        unknown = [field for field in record if field not in self.columns]
+        if unknown:
+            raise RowError(f"unknown field(s): {', '.join(map(str, unknown))}")
+        row = []
+        for field, convert in self.columns.items():
+            value = record.get(field)
+            if value is None or value == "":
+                if field not in self.optional:
+                    raise RowError(f"missing {field}")
+                row.append(self.defaults.get(field))
+                continue
+            try:
+                row.append(convert(value))
+            except (ValueError, TypeError):
+                raise RowError(f"invalid {field}: {value!r}")
+        return tuple(row)
+
+    def referenced_ids(self, column: str, value) -> list:
+        if value is None:
+            return []
+        return json.loads(value) if self.columns[column] is _id_list else [value]
+
+
+ENTITIES = {
+    "stops": Entity(
+        "Stops",
+        {"stop_id": _text, "name": _text, "latitude": _real, "longitude": _real},
+        "stop_id",
+    ),
+    "paths": Entity(
+        "Paths",
+        {"path_id": _text, "path_name": _text, "ordered_list_of_stop_ids": _id_list},
+        "path_id",
+        references={"ordered_list_of_stop_ids": ("Stops", "stop_id")},
+    ),
+    "routes": Entity(
+        "Routes",
+        {"route_id": _text, "path_id": _text, "route_display_name": _text, "shift_time": _text,
+         "direction": _text, "start_point": _text, "end_point": _text, "capacity": _integer,
+         "allowed_waitlist": _integer, "status": _text},
+        "route_id",
+        references={"path_id": ("Paths", "path_id")},
+        defaults={"status": "active"},
+    ),
+    "vehicles": Entity(
+        "Vehicles",
+        {"vehicle_id": _text, "license_plate": _text, "type": _text, "capacity": _integer},
+        "vehicle_id",
+    ),
+    "drivers": Entity(
+        "Drivers",
+        {"driver_id": _text, "name": _text, "phone_number": _text},
+        "driver_id",
+    ),
+    "trips": Entity(
+        "DailyTrips",
+        {"trip_id": _text, "route_id": _text, "display_name": _text,
+         "booking_status_percentage": _integer, "live_status": _text},
+        "trip_id",
+        references={"route_id": ("Routes", "route_id")},
+    ),
+    "deployments": Entity(
+        "Deployments",
+        {"deployment_id": _text, "trip_id": _text, "vehicle_id": _text, "driver_id": _text},
+        "deployment_id",
+        references={"trip_id": ("DailyTrips", "trip_id"), "vehicle_id": ("Vehicles", "vehicle_id"),
+                    "driver_id": ("Drivers", "driver_id")},
+        optional=("vehicle_id", "driver_id"),
+    ),
+}
+
+
+def get_entity(name: str) -> Entity:
+    try:
+        return ENTITIES[name]
+    except KeyError:
+        raise BulkError(f"Unknown entity {name!r}. Available: {', '.join(ENTITIES)}")
+
+
+def detect_format(requested: str = None, filename: str = None, mimetype: str = None) -> str:
+    """Format from ?format=, else the upload's file extension, else its content type."""
+    if requested:
+        if requested.lower() not in FORMATS:
+            raise BulkError(f"Unknown format {requested!r}. Available: {', '.join(FORMATS)}")
+        return requested.lower()
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv" or mimetype == "text/csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl") or mimetype in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    raise BulkError("Cannot tell the upload format; pass ?format=csv or ?format=ndjson")
+
+
+def _unreadable(error: Exception) -> str:
+    if isinstance(error, UnicodeDecodeError):
+        return f"not valid UTF-8 (byte 0x{error.object[error.start]:02x})"
+    return f"malformed CSV ({error})"
+
+
+def read_records(stream, fmt: str, entity: Entity):
+    """
+    Parses a binary upload stream lazily.
+
+    Bytes that are not UTF-8, or CSV the csv module cannot split, end the upload:
+    they are reported as a RowError for the next record (a BulkError if the CSV
+    header itself is unreadable) and nothing after them is read.
+
+    Yields:
+        (row_number, record) - record is a dict, or a RowError for an unparseable line
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        try:
+            header = reader.fieldnames or []
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise BulkError(f"Cannot read the CSV header: {_unreadable(e)}")
+        unknown = [field for field in header if field not in entity.columns]
+        missing = [field for field in entity.columns if field not in header and field not in entity.optional]
+        if unknown or missing:
+            raise BulkError(f"CSV header mismatch for {entity.table} (unknown: {', '.join(unknown) or '-'}; "
+                            f"missing: {', '.join(missing) or '-'}). Expected: {', '.join(entity.columns)}")
+        lines = enumerate(reader, 1)
+    else:
+        lines = enumerate(text, 1)
+
+    number = 0
+    while True:
+        try:
+            number, line = next(lines)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as e:
+            yield number + 1, RowError(f"{_unreadable(e)}; the rest of the upload was not read")
+            return
+        if fmt == "csv":
+            if None in line:
+                yield number, RowError("more values than header columns")
+            else:
+                yield number, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, RowError("invalid JSON")
+
+
+def _existing(conn: sqlite3.Connection, table: str, column: str, values) -> set:
+    values = list(values)
+    found = set()
+    for i in range(0, len(values), _IN_CHUNK):
+        chunk = values[i:i + _IN_CHUNK]
+        found.update(row[0] for row in conn.execute(
+            f'SELECT {column} FROM {table} WHERE {column} IN ({", ".join("?" * len(chunk))})', chunk
+        ))
+    return found
+
+
+class _Import:
+    def __init__(self, conn, entity, on_conflict, atomic):
+        self.conn = conn
+        self.entity = entity
+        self.on_conflict = on_conflict
+        self.atomic = atomic
+        verb = {"error": "INSERT", "ignore": "INSERT OR IGNORE", "replace": "INSERT OR REPLACE"}[on_conflict]
+        columns = list(entity.columns)
+        self.sql = f'{verb} INTO {entity.table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        self.key_index = columns.index(entity.key)
+        self.ref_index = {column: columns.index(column) for column in entity.references}
+        self.summary = {"table": entity.table, "rows": 0, "inserted": 0, "error_count": 0, "errors": []}
+
+    def error(self, number, message):
+        self.summary["error_count"] += 1
+        if len(self.summary["errors"]) < MAX_REPORTED_ERRORS:
+            self.summary["errors"].append({"row": number, "message": message})
+
+    def _check_batch(self, batch):
+        """Drops rows with duplicate keys or dangling references from batch."""
+        entity = self.entity
+        if self.on_conflict == "error":
+            # Earlier batches are already in the table (same or committed transaction)
+            taken = _existing(self.conn, entity.table, entity.key, {row[self.key_index] for _, row in batch})
+            checked = []
+            for number, row in batch:
+                key = row[self.key_index]
+                if key in taken:
+                    self.error(number, f"duplicate {entity.key} {key!r}")
+                else:
+                    taken.add(key)
+                    checked.append((number, row))
+            batch = checked
+
+        for column, (table, ref_column) in entity.references.items():
+            index = self.ref_index[column]
+            wanted = {ref for _, row in batch for ref in entity.referenced_ids(column, row[index])}
+            found = _existing(self.conn, table, ref_column, wanted)
+            checked = []
+            for number, row in batch:
+                missing = [ref for ref in entity.referenced_ids(column, row[index]) if ref not in found]
+                if missing:
+                    self.error(number, f"{column}: {', '.join(map(repr, missing[:5]))} not found in {table}")
+                else:
+                    checked.append((number, row))
+            batch = checked
+        return batch
+
+    def _insert(self, batch):
+        batch = self._check_batch(batch)
+        start = 0
+        while start < len(batch):
+            position = start
+
+            def rows():
+                nonlocal position
+                for position in range(start, len(batch)):
+                    yield batch[position][1]
+
+            try:
+                self.summary["inserted"] += self.conn.executemany(self.sql, rows()).rowcount
+                return
+            except sqlite3.IntegrityError as e:
+                # Something the pre-checks don't cover (UNIQUE license_plate, ...). Each row is
+                # its own statement, so only the failing one was undone: record it and carry on
+                # after it. (A savepoint would do the same but makes every trigger statement
+                # write a statement journal - several times slower.)
+                self.summary["inserted"] += position - start
+                self.error(batch[position][0], str(e))
+                start = position + 1
+
+    def run(self, records, batch_size):
+        conn = self.conn
+        batch = []
+        try:
+            if self.atomic:
+                conn.execute("BEGIN IMMEDIATE")
+            for number, record in records:
+                self.summary["rows"] += 1
+                try:
+                    if isinstance(record, RowError):
+                        raise record
+                    batch.append((number, self.entity.convert(record)))
+                except RowError as e:
+                    self.error(number, str(e))
+                if len(batch) >= batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+            if self.atomic:
+                if self.summary["error_count"]:
+                    conn.rollback()
+                    self.summary["inserted"] = 0
+                else:
+                    conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        # Reference checks run per batch, after the parse errors of the same rows
+        self.summary["errors"].sort(key=lambda error: error["row"])
+        return self.summary
+
+    def _flush(self, batch):
+        if self.atomic:
+            self._insert(batch)
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._insert(batch)
+        self.conn.commit()
+
+
+def import_records(conn: sqlite3.Connection, entity: Entity, records, batch_size: int = DEFAULT_BATCH_SIZE,
+                   on_conflict: str = "error", atomic: bool = False) -> dict:
+    """
+    Validates and inserts records.
+
+    Args:
+        conn: Read-write connection
+        entity: Target entity
+        records: Iterable of (row_number, record) as produced by read_records()
+        batch_size: Rows per executemany (and per transaction unless atomic)
+        on_conflict: "error" reports existing keys as row errors; "ignore" / "replace"
+            use INSERT OR IGNORE / INSERT OR REPLACE
+        atomic: One transaction for the whole upload, rolled back on any row error
+
+    Returns:
+        Summary dict: table, rows, inserted, error_count, errors [{row, message}]
+    """
+    if on_conflict not in CONFLICT_MODES:
+        raise BulkError(f"Unknown on_conflict {on_conflict!r}. Available: {', '.join(CONFLICT_MODES)}")
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise BulkError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+    return _Import(conn, entity, on_conflict, atomic).run(records, batch_size)
+
+
+def export_rows(conn: sqlite3.Connection, entity: Entity, fmt: str, batch: int = EXPORT_BATCH):
+    """
+    Streams a table in key order as CSV (with header) or NDJSON.
+
+    The connection stays in one read transaction until the generator finishes;
+    the caller closes it.
+    """
+    columns = list(entity.columns)
+    conn.execute("BEGIN")
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    if fmt == "csv":
+        cursor.execute(f'SELECT {", ".join(columns)} FROM {entity.table} ORDER BY {entity.key}')
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(batch)
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            if len(rows) < batch:
+                break
+            buffer.seek(0)
+            buffer.truncate()
+        return
+
+    # SQLite serializes each row; list columns go out as JSON arrays
+    fields = ", ".join(
+        f"'{column}', " + (f"json({column})" if entity.columns[column] is _id_list else column)
+        for column in columns
+    )
+    cursor.execute(f'SELECT json_object({fields}) FROM {entity.table} ORDER BY {entity.key}')
+    while True:
+        rows = cursor.fetchmany(batch)
+        if not rows:
+            break
+        yield "\n".join(row[0] for row in rows) + "\n"
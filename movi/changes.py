@@ -0,0 +1,294 @@
+"""
+Live change feed for the daily trips view
+Triggers (migration 6) append the trip_id of every trip whose joined
+/api/daily-trips rows a write may have changed to ChangeFeed. One poller
+thread per process notices new entries (PRAGMA data_version on its own
+connection), joins the affected trips once and fans the deltas out to
+every subscriber, so the cost follows the rate of change, not the number
+of clients.
+
+A delta is {"seq", "trip_id", "op": "upsert" | "delete", "rows"}: rows
+replace everything the client holds for trip_id (same fields as
+/api/daily-trips). Changes to one trip are coalesced to its latest seq.
+Clients resume from a seq; if it has been trimmed away they get "reset"
+and reload the list.
+
+The feed keeps the newest RETENTION entries. trim_feed() runs after every
+write request (app.py) and from the poller, so it stays bounded whether
+or not anyone is subscribed.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from movi.db import database_path, get_db, get_read_db
+from movi.metrics import register_collector
+from movi.query_cache import bump_tables
+
+POLL_INTERVAL = int(os.getenv("MOVI_CHANGE_POLL_MS", 250)) / 1000
+# Entries kept for resuming clients
+RETENTION = int(os.getenv("MOVI_CHANGE_FEED_RETENTION", 100000))
+# Deltas buffered per subscriber; a client that falls further behind is disconnected
+# and catches up from the table when it reconnects
+QUEUE_SIZE = int(os.getenv("MOVI_CHANGE_QUEUE_SIZE", 1000))
+KEEPALIVE_SECONDS = 15
+TRIM_INTERVAL_SECONDS = 60
+# Entries allowed beyond RETENTION before a trim, so a busy feed is trimmed
+# in batches instead of one row per write
+TRIM_SLACK = max(RETENTION // 10, 1)
+READ_BATCH = 500
+
+
+def latest_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute('SELECT ifnull(MAX(seq), 0) FROM ChangeFeed').fetchone()[0]
+
+
+def oldest_seq(conn: sqlite3.Connection) -> int:
+    """Lowest retained seq (latest + 1 when the table is empty)."""
+    row = conn.execute('SELECT MIN(seq), MAX(seq) FROM ChangeFeed').fetchone()
+    return row[0] if row[0] is not None else latest_seq(conn) + 1
+
+
+_trim_lock = threading.Lock()
+
+
+def trim_feed() -> int:
+    """
+    Deletes all but the newest RETENTION entries once TRIM_SLACK more have
+    piled up. Checking costs two rowid lookups; concurrent callers skip.
+
+    Returns:
+        Number of entries deleted
+    """
+    if not _trim_lock.acquire(blocking=False):
+        return 0
+    try:
+        conn = get_db()
+        try:
+            oldest, latest = conn.execute('SELECT MIN(seq), MAX(seq) FROM ChangeFeed').fetchone()
+            if latest is None or latest - oldest + 1 <= RETENTION + TRIM_SLACK:
+                return 0
+            deleted = conn.execute('DELETE FROM ChangeFeed WHERE seq <= ?', (latest - RETENTION,)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+    finally:
+        _trim_lock.release()
+    bump_tables('ChangeFeed')
+    return deleted
+
+
+class _Subscriber:
+    def __init__(self, seq: int):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.seq = seq
+        self.dropped = False
+
+
+class ChangeHub:
+    """
+    Change feed over one list view.
+
+    Args:
+        spec: ListSpec of the view deltas are built from
+        key: SQL expression of the trip_id column in spec.source
+    """
+
+    def __init__(self, spec, key: str):
+        self.spec = spec
+        self.key = key
+        self.last_seq = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0, "polls": 0}
+
+    def read(self, conn: sqlite3.Connection, since: int, until: int = None, limit: int = READ_BATCH):
+        """
+        Deltas for feed entries after since (up to until), coalesced per trip.
+
+        Returns:
+            (deltas, last): deltas in seq order, and the last seq read (since if none)
+        """
+        sql = 'SELECT seq, trip_id FROM ChangeFeed WHERE seq > ?'
+        params = [since]
+        if until is not None:
+            sql += ' AND seq <= ?'
+            params.append(until)
+        entries = conn.execute(sql + ' ORDER BY seq LIMIT ?', params + [limit]).fetchall()
+        if not entries:
+            return [], since
+
+        latest = {}
+        for seq, trip_id in entries:
+            if trip_id is not None:
+                latest[trip_id] = seq
+        rows = {trip_id: [] for trip_id in latest}
+        fields = list(self.spec.columns)
+        select = ", ".join(f'{self.spec.columns[f]} AS "{f}"' for f in fields)
+        trip_ids = list(latest)
+        for i in range(0, len(trip_ids), READ_BATCH):
+            chunk = trip_ids[i:i + READ_BATCH]
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f'SELECT {select} FROM {self.spec.source} WHERE {self.key} IN ({", ".join("?" * len(chunk))}) '
+                f'ORDER BY {", ".join(self.spec.order_by)}', chunk
+            )
+            for row in cursor:
+                record = dict(zip(fields, row))
+                rows[record["trip_id"]].append(record)
+
+        deltas = [
+            {"seq": seq, "trip_id": trip_id, "op": "upsert" if rows[trip_id] else "delete", "rows": rows[trip_id]}
+            for trip_id, seq in sorted(latest.items(), key=lambda item: item[1])
+        ]
+        return deltas, entries[-1][0]
+
+    # Poller
+
+    def _ensure_started(self):
+        # Caller holds self._lock
+        if self._thread is not None and self._thread.is_alive():
+            return
+        conn = get_read_db()
+        try:
+            self.last_seq = latest_seq(conn)
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._run, name="movi-change-feed", daemon=True)
+        self._thread.start()
+
+    def _drop_subscribers(self):
+        # Entries this process had not published yet were trimmed: every client
+        # reconnects and gets "reset"
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.dropped = True
+            self._stats["dropped_subscribers"] += len(self._subscribers)
+            self._subscribers.clear()
+
+    def _publish(self, deltas, last):
+        with self._lock:
+            for delta in deltas:
+                for subscriber in list(self._subscribers):
+                    try:
+                        subscriber.queue.put_nowait(delta)
+                        self._stats["delivered"] += 1
+                    except queue.Full:
+                        subscriber.dropped = True
+                        self._subscribers.discard(subscriber)
+                        self._stats["dropped_subscribers"] += 1
+            self._stats["published"] += len(deltas)
+            self.last_seq = last
+
+    def _run(self):
+        # data_version is per connection, so the poller keeps its own
+        path = database_path()
+        watch = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        version = None
+        last_trim = time.monotonic()
+        print(f"[CHANGES] Change feed poller started at seq {self.last_seq}")
+        while True:
+            time.sleep(POLL_INTERVAL)
+            try:
+                current = watch.execute('PRAGMA data_version').fetchone()[0]
+                if current != version:
+                    version = current
+                    self._stats["polls"] += 1
+                    if oldest_seq(watch) - 1 > self.last_seq:
+                        self._drop_subscribers()
+                        self.last_seq = latest_seq(watch)
+                    while True:
+                        deltas, last = self.read(watch, self.last_seq)
+                        if last == self.last_seq:
+                            break
+                        self._publish(deltas, last)
+                if time.monotonic() - last_trim > TRIM_INTERVAL_SECONDS:
+                    last_trim = time.monotonic()
+                    trim_feed()
+            except sqlite3.Error as e:
+                print(f"[CHANGES] Poll failed: {e}")
+
+    # Subscribers
+
+    def subscribe(self) -> _Subscriber:
+        """Registers a subscriber; it receives every delta after its .seq."""
+        with self._lock:
+            self._ensure_started()
+            subscriber = _Subscriber(self.last_seq)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, since: int = None):
+        """
+        Events for one client: catch-up from since (if given), then live deltas.
+
+        Yields:
+            (event, data, seq) - "ready" once caught up, "change" per delta,
+            "reset" if since is no longer retained; None as a keepalive
+        """
+        subscriber = self.subscribe()
+        try:
+            head = subscriber.seq
+            if since is not None:
+                conn = get_read_db()
+                try:
+                    if since > head or since < oldest_seq(conn) - 1:
+                        yield "reset", {"seq": head}, head
+                    else:
+                        while since < head:
+                            deltas, since = self.read(conn, since, until=head)
+                            for delta in deltas:
+                                yield "change", delta, delta["seq"]
+                finally:
+                    conn.close()
+            yield "ready", {"seq": head}, head
+
+            while not subscriber.dropped or not subscriber.queue.empty():
+                try:
+                    delta = subscriber.queue.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield None
+                    continue
+                yield "change", delta, delta["seq"]
+            # Fell too far behind: the client reconnects and catches up from the table
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["subscribers"] = len(self._subscribers)
+        return stats
+
+
+_hubs = []
+
+
+def register_hub(hub: ChangeHub) -> ChangeHub:
+    _hubs.append(hub)
+    return hub
+
+
+def _collect_metrics():
+    totals = {"published": 0, "delivered": 0, "dropped_subscribers": 0, "subscribers": 0}
+    for hub in _hubs:
+        for name, value in hub.stats().items():
+            if name in totals:
+                totals[name] += value
+    return [
+        ("movi_change_feed_events_total", "Change feed deltas since start", ("event",),
+         {(event,): totals[event] for event in ("published", "delivered", "dropped_subscribers")}),
+        ("movi_change_feed_subscribers", "Connected change feed clients", (), {(): totals["subscribers"]}),
+    ]
+
+
+register_collector(_collect_metrics)
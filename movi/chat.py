@@ -1,39 +1,46 @@
-import sqlite3
 import json
-from typing import Annotated, Literal
+from typing import Annotated, Generator, Literal
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, Field
 from typing import Optional
-from asr import transcribe_audio
-from tts import text_to_speech
+from movi.asr import transcribe_audio
+from movi.asr_pool import ASRBusy
+from movi.tts import text_to_speech
+from movi.checkpoint import get_checkpointer
+from movi.db import get_db, get_read_db, database_path
+from movi.schema import get_schema_text
+from movi.query_cache import TRIGGER_MAINTAINED, query_cache, bump_for_access, track_tables
+from movi import fast_path
+from movi.tool_node import make_tool_node
+from movi.context import build_context
+from movi.llm_gate import ConcurrencyGate
+from movi.metrics import NODE_DURATION, LLM_DURATION, LLM_TOKENS, SQL_DURATION, SQL_ROWS
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
+import time
+import uuid
 
 load_dotenv()
 
 # Base directory (where your app.py is located)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Database path
-DATABASE = r"C:\Data\moveinsync.db"  # full path to existing database
-
-def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 # SQL Query Tool - LLM generates SQL queries
 @tool
 def execute_sql_query(sql_query: str) -> str:
     """
     Execute a SQL SELECT query on the moveinsync database and return results as JSON.
-    Use this tool to query information from tables: Stops, Paths, Routes, Vehicles, Drivers, DailyTrips, Deployments.
+    Use this tool to query information from tables: Stops, Paths, PathStops, Routes, Vehicles, Drivers, DailyTrips, Deployments.
     
     Args:
         sql_query: A valid SQL SELECT query
@@ -41,21 +48,32 @@ def execute_sql_query(sql_query: str) -> str:
     Returns:
         JSON string with query results
     """
+    start = time.perf_counter()
+    cached, token = query_cache.lookup(sql_query)
+    if cached is not None:
+        SQL_DURATION.observe(time.perf_counter() - start, tool="execute_sql_query", cache="hit")
+        return cached
+
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        results = cursor.fetchall()
+        conn = get_read_db()
+        with track_tables(conn) as access:
+            cursor = conn.cursor()
+            cursor.execute(sql_query)
+            results = cursor.fetchall()
         conn.close()
         
         if not results:
-            return json.dumps({"status": "success", "result": "No data found", "row_count": 0})
-        
-        return json.dumps({
-            "status": "success",
-            "result": [dict(row) for row in results],
-            "row_count": len(results)
-        }, indent=2)
+            output = json.dumps({"status": "success", "result": "No data found", "row_count": 0})
+        else:
+            output = json.dumps({
+                "status": "success",
+                "result": [dict(row) for row in results],
+                "row_count": len(results)
+            }, indent=2)
+        query_cache.store(token, access, output)
+        SQL_DURATION.observe(time.perf_counter() - start, tool="execute_sql_query", cache="miss")
+        SQL_ROWS.observe(len(results), tool="execute_sql_query")
+        return output
     except Exception as e:
         return json.dumps({"status": "error", "error": str(e)})
 
@@ -64,6 +82,7 @@ def execute_sql_write(sql_query: str) -> str:
     """
     Execute a SQL INSERT, UPDATE, or DELETE query on the moveinsync database.
     Use this for creating, updating, or deleting records. This will actually modify the database.
+    PathStops is maintained from Paths by triggers: change Paths.ordered_list_of_stop_ids instead.
     
     Args:
         sql_query: A valid SQL INSERT/UPDATE/DELETE query
@@ -71,14 +90,18 @@ def execute_sql_write(sql_query: str) -> str:
     Returns:
         JSON string with execution results
     """
+    start = time.perf_counter()
     try:
         conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute(sql_query)
+        with track_tables(conn, read_only=TRIGGER_MAINTAINED) as access:
+            cursor = conn.cursor()
+            cursor.execute(sql_query)
         conn.commit()
         affected_rows = cursor.rowcount
         conn.close()
+        bump_for_access(access)
+        SQL_DURATION.observe(time.perf_counter() - start, tool="execute_sql_write", cache="none")
+        SQL_ROWS.observe(max(affected_rows, 0), tool="execute_sql_write")
         
         return json.dumps({
             "status": "success",
@@ -88,60 +111,13 @@ def execute_sql_write(sql_query: str) -> str:
     except Exception as e:
         return json.dumps({"status": "error", "error": str(e)})
 
+# Tools that only read and may run concurrently within one tool node
+READ_ONLY_TOOLS = {execute_sql_query.name}
+
 # Get schema information for LLM awareness
 def get_schema_info() -> str:
-    """Returns database schema information for LLM context."""
-    return """
-DATABASE SCHEMA:
-================
-
-1. Stops Table:
-   - stop_id (TEXT, PRIMARY KEY) - Example: 's1', 's2'
-   - name (TEXT) - Stop name
-   - latitude (REAL) - Latitude coordinate
-   - longitude (REAL) - Longitude coordinate
-
-2. Paths Table:
-   - path_id (TEXT, PRIMARY KEY) - Example: 'p1', 'p2'
-   - path_name (TEXT) - Path name
-   - ordered_list_of_stop_ids (TEXT, JSON format) - Example: '["s1", "s2", "s3"]'
-
-3. Routes Table:
-   - route_id (TEXT, PRIMARY KEY) - Example: 'r1', 'r2'
-   - path_id (TEXT, FOREIGN KEY)
-   - route_display_name (TEXT)
-   - shift_time (TEXT)
-   - direction (TEXT)
-   - start_point (TEXT)
-   - end_point (TEXT)
-   - capacity (INTEGER)
-   - allowed_waitlist (INTEGER)
-   - status (TEXT, default 'active')
-
-4. Vehicles Table:
-   - vehicle_id (TEXT, PRIMARY KEY) - Example: 'v1', 'v2'
-   - license_plate (TEXT, UNIQUE)
-   - type (TEXT)
-   - capacity (INTEGER)
-
-5. Drivers Table:
-   - driver_id (TEXT, PRIMARY KEY) - Example: 'd1', 'd2'
-   - name (TEXT)
-   - phone_number (TEXT)
-
-6. DailyTrips Table:
-   - trip_id (TEXT, PRIMARY KEY) - Example: 't1', 't2'
-   - route_id (TEXT, FOREIGN KEY)
-   - display_name (TEXT) - Trip display name
-   - booking_status_percentage (INTEGER) - Percentage of bookings (0-100)
-   - live_status (TEXT) - Status like 'scheduled', 'ongoing', 'completed'
-
-7. Deployments Table:
-   - deployment_id (TEXT, PRIMARY KEY) - Example: 'dep1', 'dep2'
-   - trip_id (TEXT, FOREIGN KEY)
-   - vehicle_id (TEXT, FOREIGN KEY, can be NULL)
-   - driver_id (TEXT, FOREIGN KEY, can be NULL)
-"""
+    """Returns database schema information for LLM context (introspected and cached)."""
+    return get_schema_text(database_path())
 
 def get_shared_llm():
     """Returns a single LLM instance reused across all nodes."""
@@ -153,6 +129,66 @@ def get_shared_llm():
 
 shared_llm = get_shared_llm()
 
+# Cap on concurrent Gemini calls per process, shared by the sync and async paths
+LLM_CONCURRENCY = int(os.getenv("MOVI_LLM_CONCURRENCY", 16))
+_llm_gate = ConcurrencyGate(LLM_CONCURRENCY)
+
+# LLM nodes are generators: they yield (runnable, messages) for every LLM call,
+# receive the response back and return their state update. llm_node() drives
+# them with invoke() on the sync path and ainvoke() on the async path.
+LLMStep = Generator[tuple, BaseMessage, dict]
+
+def _record_llm_call(node_name: str, mode: str, start: float, response) -> None:
+    LLM_DURATION.observe(time.perf_counter() - start, node=node_name, mode=mode)
+    if isinstance(response, dict):
+        # with_structured_output(include_raw=True) -> {"raw", "parsed", "parsing_error"}
+        response = response.get("raw")
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        LLM_TOKENS.observe(usage.get("input_tokens", 0), node=node_name, direction="input")
+        LLM_TOKENS.observe(usage.get("output_tokens", 0), node=node_name, direction="output")
+
+def llm_node(step, name: str = None):
+    """Wraps an LLM step generator into a graph node with sync and async paths."""
+    node_name = name or step.__name__
+
+    def node(state):
+        with NODE_DURATION.time(node=node_name):
+            gen = step(state)
+            try:
+                runnable, messages = next(gen)
+                while True:
+                    with _llm_gate:
+                        start = time.perf_counter()
+                        response = runnable.invoke(messages)
+                    _record_llm_call(node_name, "sync", start, response)
+                    runnable, messages = gen.send(response)
+            except StopIteration as done:
+                return done.value
+
+    async def anode(state):
+        with NODE_DURATION.time(node=node_name):
+            gen = step(state)
+            try:
+                runnable, messages = next(gen)
+                while True:
+                    async with _llm_gate:
+                        start = time.perf_counter()
+                        response = await runnable.ainvoke(messages)
+                    _record_llm_call(node_name, "async", start, response)
+                    runnable, messages = gen.send(response)
+            except StopIteration as done:
+                return done.value
+
+    return RunnableLambda(node, afunc=anode, name=node_name)
+
+def timed_node(name: str, func):
+    """Records the wall time of a plain (non-LLM) graph node."""
+    def node(state):
+        with NODE_DURATION.time(node=name):
+            return func(state)
+    return node
+
 # State definition
 class AgentState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
@@ -161,9 +197,129 @@ class AgentState(TypedDict):
     awaiting_confirmation: bool
     current_page: str  # 👈 add this
     image_path: Optional[str]  # 👈 optional for multimodal input
+    context_summary: str  # Running summary of turns dropped from prompts (see movi/context.py)
+    context_summary_upto: int  # Number of messages covered by context_summary
+
+PAGE_GUIDANCE = """- If on `busDashboard`: prioritize live trip data, vehicle assignments, and driver status.
+- If on `manageRoute`: focus on creating, updating, or analyzing routes and paths.
+- If on `home`: provide summaries, daily overviews, or insights."""
+
+def _page_context(state: AgentState) -> str:
+    return f"""CURRENT PAGE CONTEXT:
+---------------------
+The user is currently on the **{state.get('current_page', 'home')}** page.
+
+Behave as a context-aware agent:
+{PAGE_GUIDANCE}
+Adapt your responses and SQL accordingly."""
+
+def _with_image(messages: list, state: AgentState) -> list:
+    """Appends the uploaded image (if any) for multimodal input."""
+    if state.get("image_path"):
+        messages = messages + [
+            HumanMessage(
+                content=[
+                    {"type": "text", "text": "Here is an image related to my query:"},
+                    {"type": "image_url", "image_url": f"file://{state['image_path']}"}
+                ]
+            )
+        ]
+    return messages
+
+# Set MOVI_CLASSIFY_ROUTING=0 to fall back to the agent_entry + analyze_write flow
+CLASSIFY_ROUTING = os.getenv("MOVI_CLASSIFY_ROUTING", "1") != "0"
+
+class RequestPlan(BaseModel):
+    """Classification of the user's latest message, returned as structured output."""
+    intent: Literal["read", "write", "chat"] = Field(
+        description="read: answered with SELECT queries; write: needs INSERT/UPDATE/DELETE; "
+                    "chat: greetings, help or anything that needs no database access"
+    )
+    sql_queries: list[str] = Field(
+        default_factory=list,
+        description="read only: the SELECT statement(s) that answer the question"
+    )
+    write_sql: str = Field(
+        default="",
+        description="write only: the single INSERT/UPDATE/DELETE statement to run; empty if details are missing"
+    )
+    has_consequences: bool = Field(
+        default=False,
+        description="write only: true if it affects vehicles/drivers assigned to trips, trips with bookings or active routes"
+    )
+    reply: str = Field(
+        default="",
+        description="chat: the answer; write with missing details: the clarifying question"
+    )
+    reasoning: str = Field(default="", description="One short sentence describing the request")
+
+def _tool_call(tool_obj, sql: str) -> dict:
+    return {"name": tool_obj.name, "args": {"sql_query": sql}, "id": f"call_{uuid.uuid4().hex[:12]}"}
+
+# Node: Classify Request - one structured-output call for intent, SQL and consequences
+def classify_request(state: AgentState) -> LLMStep:
+    """
+    Single LLM call that classifies the request and plans it.
+    For READ operations: emits execute_sql_query calls for the tools node
+    For WRITE operations: stores the SQL in pending_action and sets requires_confirmation
+    For CHAT: answers directly
+    """
+    context, context_update = build_context(state, "classify_request")
+
+    system_context = f"""You are Movi, an intelligent transport management assistant with access to a database.
+
+{get_schema_info()}
+
+{_page_context(state)}
+
+Classify the user's LATEST message and plan it in one step:
+
+1. read - questions about the data (How many, What's the status, List, Show):
+   - Put the SELECT statement(s) that answer it in sql_queries
+
+2. write - Create, Assign, Remove, Delete, Update, Modify:
+   - Put the exact SQL in write_sql (it runs only after any confirmation)
+   - has_consequences = true if it affects vehicles/drivers assigned to trips,
+     trips with bookings or active routes; false for simple inserts with no dependencies
+   - If the request is missing details, leave write_sql empty and ask for them in reply
+
+3. chat - anything else: answer in reply
+
+SQL Guidelines:
+   - Use proper JOINs when querying across tables
+   - For "not assigned": LEFT JOIN Deployments and WHERE vehicle_id IS NULL
+   - Use LIKE for partial text matching
+"""
+
+    messages = _with_image([HumanMessage(content=system_context)] + context, state)
+    result = yield shared_llm.with_structured_output(RequestPlan, include_raw=True), messages
+
+    update = {
+        "pending_action": "",
+        "requires_confirmation": False,
+        "awaiting_confirmation": False,
+        **context_update
+    }
+    plan = result.get("parsed")
+    if plan is None:
+        print(f"[CLASSIFY] Structured output failed: {result.get('parsing_error')}")
+        return {**update, "messages": [AIMessage(content="Sorry, I couldn't work out what to do. Could you rephrase that?")]}
+
+    print(f"[CLASSIFY] intent={plan.intent} has_consequences={plan.has_consequences}")
+    if plan.intent == "read" and plan.sql_queries:
+        calls = [_tool_call(execute_sql_query, sql) for sql in plan.sql_queries]
+        return {**update, "messages": [AIMessage(content="", tool_calls=calls)]}
+    if plan.intent == "write" and plan.write_sql:
+        return {
+            **update,
+            "messages": [AIMessage(content=f"I understand you want to make this change: {plan.reasoning or plan.write_sql}")],
+            "pending_action": plan.write_sql,
+            "requires_confirmation": plan.has_consequences
+        }
+    return {**update, "messages": [AIMessage(content=plan.reply or "How can I help with your transport operations?")]}
 
-# Node: Agent Entry - LLM analyzes intent and decides action
-def agent_entry(state: AgentState) -> AgentState:
+# Node: Agent Entry - legacy routing (MOVI_CLASSIFY_ROUTING=0)
+def agent_entry(state: AgentState) -> LLMStep:
     """
     Entry point where LLM analyzes user request and decides on action.
     For READ operations: Calls execute_sql_query directly
@@ -181,15 +337,7 @@ def agent_entry(state: AgentState) -> AgentState:
 
 {get_schema_info()}
 
-CURRENT PAGE CONTEXT:
----------------------
-The user is currently on the **{state.get('current_page', 'home')}** page.
-
-Behave as a context-aware agent:
-- If on `busDashboard`: prioritize live trip data, vehicle assignments, and driver status.
-- If on `manageRoute`: focus on creating, updating, or analyzing routes and paths.
-- If on `home`: provide summaries, daily overviews, or insights.
-Adapt your responses and SQL accordingly.
+{_page_context(state)}
 
 IMPORTANT INSTRUCTIONS:
 
@@ -207,23 +355,10 @@ IMPORTANT INSTRUCTIONS:
    - Use LIKE for partial text matching
 """
 
-    enriched_messages = [
-        HumanMessage(content=system_context)
-    ] + messages
-    
     # Optional multimodal input (if user uploads an image)
-    if state.get("image_path"):
-        enriched_messages.append(
-            HumanMessage(
-                content=[
-                    {"type": "text", "text": "Here is an image related to my query:"},
-                    {"type": "image_url", "image_url": f"file://{state['image_path']}"}
-                ]
-            )
-        )
-
+    enriched_messages = _with_image([HumanMessage(content=system_context)] + messages, state)
     
-    response = llm_with_tools.invoke(enriched_messages)
+    response = yield llm_with_tools, enriched_messages
     
     return {
         "messages": [response],
@@ -233,9 +368,10 @@ IMPORTANT INSTRUCTIONS:
     }
 
 # Node: Analyze for Write Operation
-def analyze_write_operation(state: AgentState) -> AgentState:
+def analyze_write_operation(state: AgentState) -> LLMStep:
     """LLM analyzes the operation and decides if consequence checking is needed."""
     messages = state["messages"]
+    context, context_update = build_context(state, "analyze_write")
     
     analysis_prompt = """Analyze the user's request and determine:
 
@@ -248,12 +384,12 @@ You MUST respond with ONLY a valid JSON object, no extra text:
 {
     "is_write_operation": true,
     "has_consequences": true,
-    "sql_query": "UPDATE Deployments SET vehicle_id = NULL WHERE vehicle_id = 'v7'",
+    "sql_query": "UPDATE Deployments SET vehicle_id = NULL WHERE vehicle_id = 'V007'",
     "reasoning": "Removing vehicle from trips with bookings"
 }"""
 
-    analysis_messages = messages + [HumanMessage(content=analysis_prompt)]
-    response = shared_llm.invoke(analysis_messages)
+    analysis_messages = context + [HumanMessage(content=analysis_prompt)]
+    response = yield shared_llm, analysis_messages
     
     try:
         content = response.content
@@ -270,7 +406,8 @@ You MUST respond with ONLY a valid JSON object, no extra text:
         return {
             "messages": [response],
             "pending_action": analysis.get("sql_query", ""),
-            "requires_confirmation": analysis.get("has_consequences", False)
+            "requires_confirmation": analysis.get("has_consequences", False),
+            **context_update
         }
     except Exception as e:
         print(f"[ERROR] Failed to parse analysis: {e}")
@@ -290,16 +427,17 @@ You MUST respond with ONLY a valid JSON object, no extra text:
         return {
             "messages": [response],
             "requires_confirmation": has_consequences,
-            "pending_action": ""
+            "pending_action": "",
+            **context_update
         }
 
 # 2. CHECK CONSEQUENCES - Simplified
-def check_consequences(state: AgentState) -> AgentState:
+def check_consequences(state: AgentState) -> LLMStep:
     """LLM queries the database to check consequences."""
     tools = [execute_sql_query]
     llm_with_tools = shared_llm.bind_tools(tools)
     
-    messages = state["messages"]
+    context, context_update = build_context(state, "check_consequences")
     pending_action = state.get("pending_action", "")
     
     consequence_prompt = f"""The user wants to perform this operation:
@@ -316,14 +454,14 @@ Check:
 
 Use execute_sql_query to gather information. Be specific about booking percentages and affected trips."""
 
-    consequence_messages = messages + [HumanMessage(content=consequence_prompt)]
-    response = llm_with_tools.invoke(consequence_messages)
+    consequence_messages = context + [HumanMessage(content=consequence_prompt)]
+    response = yield llm_with_tools, consequence_messages
     
-    return {"messages": [response]}
+    return {"messages": [response], **context_update}
 
 
 # Node: Get Confirmation
-def get_confirmation(state: AgentState) -> AgentState:
+def get_confirmation(state: AgentState) -> LLMStep:
     """LLM generates a clear confirmation message with consequences."""
     messages = state["messages"]
     # Extract consequence check results from tool messages
@@ -345,7 +483,7 @@ Be specific about:
 - What will happen (bookings cancelled, trip-sheet will fail, etc.)
 - Number of affected records"""
     confirmation_messages = [HumanMessage(content=confirmation_prompt)]
-    response = shared_llm.invoke(confirmation_messages)
+    response = yield shared_llm, confirmation_messages
     return {
         **state,
         "messages": [response],
@@ -392,14 +530,22 @@ def handle_confirmation_response(state: AgentState) -> AgentState:
 
 
 # 5. EXECUTE ACTION - Uses pending_action SQL
-def execute_action(state: AgentState) -> AgentState:
-    """LLM generates and executes the write SQL query."""
-    tools = [execute_sql_write]
-    llm_with_tools = shared_llm.bind_tools(tools)
-    
+def execute_action(state: AgentState) -> LLMStep:
+    """Executes pending_action directly; the LLM only writes the SQL when there is none."""
     messages = state["messages"]
     pending_action = state.get("pending_action", "")
     
+    if pending_action:
+        # The SQL was already produced (and validated) upstream - no need to ask the LLM to repeat it
+        print(f"[EXECUTE_ACTION] Pending SQL: {pending_action}")
+        return {
+            "messages": [AIMessage(content="", tool_calls=[_tool_call(execute_sql_write, pending_action)])],
+            "awaiting_confirmation": False
+        }
+    
+    tools = [execute_sql_write]
+    llm_with_tools = shared_llm.bind_tools(tools)
+    
     # Get original user request
     original_request = ""
     for msg in messages:
@@ -416,14 +562,12 @@ ORIGINAL REQUEST: {original_request}
 
 {get_schema_info()}
 
-{'IMPORTANT: Use this exact SQL: ' + pending_action if pending_action else 'Generate the appropriate SQL query.'}
+Generate the appropriate SQL query.
 
 Use execute_sql_write to modify the database. Confirm success with details."""
 
     context_messages = [HumanMessage(content=execution_prompt)]
-    response = llm_with_tools.invoke(context_messages)
-    
-    print(f"[EXECUTE_ACTION] Pending SQL: {pending_action}")
+    response = yield llm_with_tools, context_messages
     
     return {
         "messages": [response],
@@ -432,13 +576,13 @@ Use execute_sql_write to modify the database. Confirm success with details."""
 
 
 # Node: Generate Response
-def generate_response(state: AgentState) -> AgentState:
+def generate_response(state: AgentState) -> LLMStep:
     """
     LLM generates final response based on query results.
     """
     # llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, api_key=os.getenv("GOOGLE_API_KEY2"))
     
-    messages = state["messages"]
+    context, context_update = build_context(state, "generate_response")
     
     response_prompt = """Based on the query results, provide a clear, concise answer to the user's question.
 
@@ -449,11 +593,25 @@ If data was retrieved:
 
 Be direct and helpful."""
 
-    final_messages = messages + [HumanMessage(content=response_prompt)]
-    response = shared_llm.invoke(final_messages)
+    final_messages = context + [HumanMessage(content=response_prompt)]
+    response = yield shared_llm, final_messages
     
-    return {"messages": [response]}
+    return {"messages": [response], **context_update}
 # 6. ROUTING FUNCTIONS
+def route_after_classify(state: AgentState) -> Literal["tools", "check_consequences", "execute_action", "end"]:
+    """Route on the structured classification - no phrase matching."""
+    messages = state["messages"]
+    last_message = messages[-1] if messages else None
+    
+    if last_message and getattr(last_message, "tool_calls", None):
+        print("[ROUTE] → tools (read)")
+        return "tools"
+    if state.get("pending_action"):
+        return route_after_analyze(state)
+    print("[ROUTE] → end (answered directly)")
+    return "end"
+
+
 def route_after_entry(state: AgentState) -> Literal["tools", "analyze_write"]:
     """Route after agent entry based on tool calls."""
     messages = state["messages"]
@@ -527,37 +685,60 @@ def route_after_confirmation(state: AgentState) -> Literal["execute_action", "en
 
 
 # 7. BUILD GRAPH - With interrupt_before
-def build_graph():
+def build_graph(checkpointer=None, classify_routing: bool = None):
+    """
+    Builds and compiles the agent graph.
+
+    Args:
+        checkpointer: Checkpointer for thread state (defaults to an in-memory saver)
+        classify_routing: Route with the single classify_request call; False uses the
+            legacy agent_entry + analyze_write pair (default: MOVI_CLASSIFY_ROUTING)
+    """
+    if classify_routing is None:
+        classify_routing = CLASSIFY_ROUTING
     workflow = StateGraph(AgentState)
     
     # Add nodes
-    workflow.add_node("agent_entry", agent_entry)
-    workflow.add_node("tools", ToolNode([execute_sql_query, execute_sql_write]))
-    workflow.add_node("analyze_write", analyze_write_operation)
-    workflow.add_node("check_consequences", check_consequences)
-    workflow.add_node("tools_consequences", ToolNode([execute_sql_query]))
-    workflow.add_node("get_confirmation", get_confirmation)
-    workflow.add_node("execute_action", execute_action)
-    workflow.add_node("tools_for_execution", ToolNode([execute_sql_write]))
-    workflow.add_node("handle_confirmation", handle_confirmation_response)
-    workflow.add_node("generate_response", generate_response)
+    workflow.add_node("tools", make_tool_node([execute_sql_query, execute_sql_write], READ_ONLY_TOOLS, "tools"))
+    workflow.add_node("check_consequences", llm_node(check_consequences))
+    workflow.add_node("tools_consequences", make_tool_node([execute_sql_query], READ_ONLY_TOOLS, "tools_consequences"))
+    workflow.add_node("get_confirmation", llm_node(get_confirmation))
+    workflow.add_node("execute_action", llm_node(execute_action))
+    workflow.add_node("tools_for_execution", make_tool_node([execute_sql_write], READ_ONLY_TOOLS, "tools_for_execution"))
+    workflow.add_node("handle_confirmation", timed_node("handle_confirmation", handle_confirmation_response))
+    workflow.add_node("generate_response", llm_node(generate_response))
     
     # Define edges
-    workflow.add_edge(START, "agent_entry")
-    
-    workflow.add_conditional_edges(
-        "agent_entry",
-        route_after_entry,
-        {"tools": "tools", "analyze_write": "analyze_write"}
-    )
-    
-    workflow.add_edge("tools", "analyze_write")
-    
-    workflow.add_conditional_edges(
-        "analyze_write",
-        route_after_analyze,
-        {"check_consequences": "check_consequences", "execute_action": "execute_action"}
-    )
+    if classify_routing:
+        workflow.add_node("classify_request", llm_node(classify_request))
+        workflow.add_edge(START, "classify_request")
+        
+        workflow.add_conditional_edges(
+            "classify_request",
+            route_after_classify,
+            {"tools": "tools", "check_consequences": "check_consequences",
+             "execute_action": "execute_action", "end": END}
+        )
+        
+        workflow.add_edge("tools", "generate_response")
+    else:
+        workflow.add_node("agent_entry", llm_node(agent_entry))
+        workflow.add_node("analyze_write", llm_node(analyze_write_operation, "analyze_write"))
+        workflow.add_edge(START, "agent_entry")
+        
+        workflow.add_conditional_edges(
+            "agent_entry",
+            route_after_entry,
+            {"tools": "tools", "analyze_write": "analyze_write"}
+        )
+        
+        workflow.add_edge("tools", "analyze_write")
+        
+        workflow.add_conditional_edges(
+            "analyze_write",
+            route_after_analyze,
+            {"check_consequences": "check_consequences", "execute_action": "execute_action"}
+        )
     
     workflow.add_conditional_edges(
         "check_consequences",
@@ -580,36 +761,146 @@ def build_graph():
     
     # CRITICAL: Interrupt before handle_confirmation for human-in-the-loop
     return workflow.compile(
-        checkpointer=MemorySaver(),
+        checkpointer=checkpointer if checkpointer is not None else MemorySaver(),
         interrupt_before=["handle_confirmation"]
     )
 
 
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_graph():
+    """
+    Returns the process-wide compiled graph.
+    Compiled once on first use and backed by the persistent checkpointer,
+    so interrupted threads can be resumed by any later request.
+    """
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph(checkpointer=get_checkpointer())
+    return _graph
+
+
 # 8. RUN AGENT - FIXED VERSION with proper interrupt handling
-def run_movi_agent(
+# Nodes whose LLM output is shown to the user, streamed token by token
+STREAMED_NODES = {"get_confirmation", "generate_response"}
+
+
+def _initial_state(content: str, image_path: str, current_page: str) -> AgentState:
+    return {
+        "messages": [HumanMessage(content=content)],
+        "image_path": image_path or None,
+        "pending_action": "",
+        "requires_confirmation": False,
+        "awaiting_confirmation": False,
+        "current_page": current_page,
+    }
+
+
+def _message_text(content) -> str:
+    if isinstance(content, list):
+        content = " ".join(
+            [str(item.get("text", "")) if isinstance(item, dict) else str(item)
+             for item in content]
+        )
+    return str(content) if content else ""
+
+
+def _graph_events(mode: str, chunk):
+    """Translates one graph.stream chunk into ("node", ...) / ("token", ...) events."""
+    if mode == "updates":
+        for node in chunk:
+            if not node.startswith("__"):
+                yield "node", {"node": node}
+    elif mode == "messages":
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        text = _message_text(getattr(message, "content", ""))
+        if node in STREAMED_NODES and text:
+            yield "token", {"node": node, "text": text}
+
+
+def _stream_modes(stream_tokens: bool) -> list:
+    return ["updates", "values"] + (["messages"] if stream_tokens else [])
+
+
+def _stream_graph(graph, graph_input, config, stream_tokens: bool):
+    """
+    Runs the graph, yielding ("node", ...) and ("token", ...) events.
+    Returns the final state values.
+    """
+    result = None
+    for mode, chunk in graph.stream(graph_input, config, stream_mode=_stream_modes(stream_tokens)):
+        if mode == "values":
+            result = chunk
+        else:
+            yield from _graph_events(mode, chunk)
+    return result
+
+
+def _new_thread_id(user_id: str) -> str:
+    import uuid
+    return f"thread_{user_id}_{uuid.uuid4().hex[:8]}"
+
+
+def _is_awaiting_confirmation(graph_state) -> bool:
+    """True if the thread is interrupted before handle_confirmation."""
+    return bool(graph_state and graph_state.next and "handle_confirmation" in graph_state.next)
+
+
+def _response_text(result) -> str:
+    """Last AI message of the final state."""
+    if result:
+        for msg in reversed(result.get("messages", [])):
+            if isinstance(msg, AIMessage):
+                return _message_text(msg.content)
+    return ""
+
+
+def _fast_path_turn(content: str, fast: dict) -> list:
+    return [HumanMessage(content=content), AIMessage(content=fast["response"])]
+
+
+def stream_movi_agent(
     user_id: str,
     message_type: str,
     content: str = "",
     audio_path: str = None,
     image_path: str = None,
     current_page: str = "",
-    thread_id: str = None
+    thread_id: str = None,
+    stream_tokens: bool = True,
+    audio_data: bytes = None
 ):
-    """Runs the LangGraph workflow with human-in-the-loop support."""
+    """
+    Runs the LangGraph workflow with human-in-the-loop support, yielding
+    (event, data) pairs as it goes:
+    thread, transcript, node, token, confirmation_required, response, audio.
+    Graph errors propagate to the caller, which turns them into an error
+    event; the graph is never re-run after events have been yielded.
+    """
     
-    graph = build_graph()
+    graph = get_graph()
     
     # Transcribe audio if needed
-    if message_type == "audio" and audio_path:
+    if message_type == "audio" and (audio_data or audio_path):
         try:
-            content = transcribe_audio(audio_path)
+            content = transcribe_audio(audio_data or audio_path)
+        except ASRBusy:
+            raise
         except Exception as e:
+            print(f"[ASR] Failed: {e}")
             content = "(Unable to transcribe audio)"
     
     # Generate thread_id
     if not thread_id:
-        import uuid
-        thread_id = f"thread_{user_id}_{uuid.uuid4().hex[:8]}"
+        thread_id = _new_thread_id(user_id)
+    
+    yield "thread", {"thread_id": thread_id}
+    if message_type == "audio":
+        yield "transcript", {"text": content}
     
     config = {"configurable": {"thread_id": thread_id}}
     
@@ -618,7 +909,7 @@ def run_movi_agent(
         current_state = graph.get_state(config)
         
         # Check if graph is interrupted (waiting at handle_confirmation)
-        if current_state and current_state.next and "handle_confirmation" in current_state.next:
+        if _is_awaiting_confirmation(current_state):
             print("[HUMAN-IN-LOOP] Resuming from confirmation interrupt")
             print(f"[DEBUG] Current state keys: {current_state.values.keys() if current_state.values else 'None'}")
             print(f"[DEBUG] Pending action: {current_state.values.get('pending_action', 'None') if current_state.values else 'None'}")
@@ -635,66 +926,46 @@ def run_movi_agent(
             )
             
             # Resume from the interrupt - this will pick up from handle_confirmation
-            result = None
-            for state in graph.stream(None, config, stream_mode="values"):
-                result = state
-                print(f"[STREAM] Current node: {state}")
+            result = yield from _stream_graph(graph, None, config, stream_tokens)
                 
         else:
-            # New request
-            print("[NEW REQUEST] Starting new conversation flow")
-            state = {
-                "messages": [HumanMessage(content=content)],
-                "image_path": image_path or None,
-                "pending_action": "",
-                "requires_confirmation": False,
-                "awaiting_confirmation": False,
-                "current_page": current_page,
-            }
-            
-            result = None
-            for state in graph.stream(state, config, stream_mode="values"):
-                result = state
+            # Fast path: common read-only questions skip the LLM entirely
+            fast = None if image_path else fast_path.answer(content, get_read_db)
+            if fast is not None:
+                messages = _fast_path_turn(content, fast)
+                try:
+                    # Keep the turn in the thread so follow-ups have context
+                    graph.update_state(config, {"messages": messages}, as_node="generate_response")
+                except Exception as e:
+                    print(f"[FAST_PATH] Could not record turn in thread: {e}")
+                yield "node", {"node": "fast_path", "intent": fast["intent"]}
+                result = {"messages": messages}
+            else:
+                # New request
+                print("[NEW REQUEST] Starting new conversation flow")
+                state = _initial_state(content, image_path, current_page)
+                result = yield from _stream_graph(graph, state, config, stream_tokens)
             
     except Exception as e:
+        # Events are already out and the turn may be checkpointed: running the
+        # graph again would answer twice. The caller reports the error.
         print(f"[ERROR] {e}")
-        import traceback
-        traceback.print_exc()
-        
-        state = {
-            "messages": [HumanMessage(content=content)],
-            "image_path": image_path or None,
-            "pending_action": "",
-            "requires_confirmation": False,
-            "awaiting_confirmation": False,
-            "current_page": current_page,
-        }
-        
-        result = None
-        for state in graph.stream(state, config, stream_mode="values"):
-            result = state
+        raise
     
     # Extract response
-    response_text = ""
-    if result:
-        for msg in reversed(result.get("messages", [])):
-            if isinstance(msg, AIMessage):
-                response_text = msg.content
-                break
-    
-    if isinstance(response_text, list):
-        response_text = " ".join(
-            [str(item.get("text", "")) if isinstance(item, dict) else str(item)
-             for item in response_text]
-        )
-
+    response_text = _response_text(result)
     print(f"[AGENT RESPONSE] {response_text}")
     
     # Check if waiting for confirmation
-    final_state = graph.get_state(config)
-    needs_confirmation = (
-        final_state.next and "handle_confirmation" in final_state.next
-    ) if final_state else False
+    needs_confirmation = _is_awaiting_confirmation(graph.get_state(config))
+    
+    if needs_confirmation:
+        yield "confirmation_required", {"message": response_text, "thread_id": thread_id}
+    yield "response", {
+        "response": response_text or "I received your request.",
+        "needs_confirmation": needs_confirmation,
+        "thread_id": thread_id
+    }
     
     # TTS
     audio_output_path = None
@@ -704,14 +975,153 @@ def run_movi_agent(
     except Exception as e:
         print(f"[TTS] Failed: {e}")
     
-    return {
+    yield "audio", {"audio_path": audio_output_path}
+
+
+def run_movi_agent(
+    user_id: str,
+    message_type: str,
+    content: str = "",
+    audio_path: str = None,
+    image_path: str = None,
+    current_page: str = "",
+    thread_id: str = None,
+    audio_data: bytes = None
+):
+    """Runs the LangGraph workflow with human-in-the-loop support."""
+    result = {"audio_path": None}
+    for event, data in stream_movi_agent(
+        user_id, message_type, content, audio_path, image_path, current_page, thread_id,
+        stream_tokens=False, audio_data=audio_data
+    ):
+        if event == "response":
+            result.update(data)
+        elif event == "audio":
+            result["audio_path"] = data["audio_path"]
+    return result
+
+# 9. ASYNC AGENT - ainvoke/astream path for ASGI servers
+async def _astream_graph(graph, graph_input, config, stream_tokens: bool, out: dict):
+    """Async twin of _stream_graph; the final state is stored in out["result"]."""
+    async for mode, chunk in graph.astream(graph_input, config, stream_mode=_stream_modes(stream_tokens)):
+        if mode == "values":
+            out["result"] = chunk
+        else:
+            for event in _graph_events(mode, chunk):
+                yield event
+
+
+async def astream_movi_agent(
+    user_id: str,
+    message_type: str,
+    content: str = "",
+    audio_path: str = None,
+    image_path: str = None,
+    current_page: str = "",
+    thread_id: str = None,
+    stream_tokens: bool = True,
+    audio_data: bytes = None
+):
+    """
+    Async version of stream_movi_agent, with the same error handling. LLM
+    calls use ainvoke behind the shared concurrency cap, so a request only
+    holds an event-loop task while it waits on Gemini. Cancelling the
+    consuming task (e.g. on client disconnect) cancels the in-flight LLM call.
+    """
+    graph = get_graph()
+    
+    # Transcription, fast path and TTS are blocking work - keep them off the loop
+    if message_type == "audio" and (audio_data or audio_path):
+        try:
+            content = await asyncio.to_thread(transcribe_audio, audio_data or audio_path)
+        except ASRBusy:
+            raise
+        except Exception as e:
+            print(f"[ASR] Failed: {e}")
+            content = "(Unable to transcribe audio)"
+    
+    if not thread_id:
+        thread_id = _new_thread_id(user_id)
+    
+    yield "thread", {"thread_id": thread_id}
+    if message_type == "audio":
+        yield "transcript", {"text": content}
+    
+    config = {"configurable": {"thread_id": thread_id}}
+    out = {}
+    
+    if _is_awaiting_confirmation(await graph.aget_state(config)):
+        print("[HUMAN-IN-LOOP] Resuming from confirmation interrupt")
+        await graph.aupdate_state(
+            config,
+            {"messages": [HumanMessage(content=content)]},
+            as_node="get_confirmation"
+        )
+        graph_input = None
+    else:
+        fast = None if image_path else await asyncio.to_thread(fast_path.answer, content, get_read_db)
+        if fast is not None:
+            messages = _fast_path_turn(content, fast)
+            try:
+                await graph.aupdate_state(config, {"messages": messages}, as_node="generate_response")
+            except Exception as e:
+                print(f"[FAST_PATH] Could not record turn in thread: {e}")
+            yield "node", {"node": "fast_path", "intent": fast["intent"]}
+            out["result"] = {"messages": messages}
+        else:
+            print("[NEW REQUEST] Starting new conversation flow")
+            graph_input = _initial_state(content, image_path, current_page)
+    
+    if "result" not in out:
+        async for event in _astream_graph(graph, graph_input, config, stream_tokens, out):
+            yield event
+    
+    response_text = _response_text(out.get("result"))
+    print(f"[AGENT RESPONSE] {response_text}")
+    
+    needs_confirmation = _is_awaiting_confirmation(await graph.aget_state(config))
+    if needs_confirmation:
+        yield "confirmation_required", {"message": response_text, "thread_id": thread_id}
+    yield "response", {
         "response": response_text or "I received your request.",
-        "audio_path": audio_output_path,
         "needs_confirmation": needs_confirmation,
         "thread_id": thread_id
     }
+    
+    audio_output_path = None
+    try:
+        if response_text:
+            audio_output_path = await asyncio.to_thread(text_to_speech, response_text)
+    except Exception as e:
+        print(f"[TTS] Failed: {e}")
+    
+    yield "audio", {"audio_path": audio_output_path}
+
+
+async def arun_movi_agent(
+    user_id: str,
+    message_type: str,
+    content: str = "",
+    audio_path: str = None,
+    image_path: str = None,
+    current_page: str = "",
+    thread_id: str = None,
+    audio_data: bytes = None
+):
+    """Async version of run_movi_agent."""
+    result = {"audio_path": None}
+    async for event, data in astream_movi_agent(
+        user_id, message_type, content, audio_path, image_path, current_page, thread_id,
+        stream_tokens=False, audio_data=audio_data
+    ):
+        if event == "response":
+            result.update(data)
+        elif event == "audio":
+            result["audio_path"] = data["audio_path"]
+    return result
 
 if __name__ == "__main__":
+    # Run from the project root: python -m movi.chat
     # Build/compile your graph
     app = build_graph()   # assuming your function returns a compiled graph
 
@@ -719,6 +1129,6 @@ if __name__ == "__main__":
     graph = app.get_graph()
 
     # Draw as PNG bytes
-    png_bytes = graph.draw_mermaid_png(output_file_path="movi_graph.png")
+    png_bytes = graph.draw_mermaid_png(output_file_path=os.path.join(BASE_DIR, "movi_graph.png"))
     
     print("✅ Graph image saved to 'movi_graph.png'")
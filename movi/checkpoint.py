@@ -0,0 +1,151 @@
+"""
+Persistent LangGraph checkpointer for Movi
+Keeps conversation threads in SQLite (WAL) so human-in-the-loop resumes
+survive across requests and worker restarts, and expires idle threads
+by TTL/LRU so storage stays bounded.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINT_DB = os.getenv(
+    "MOVI_CHECKPOINT_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "movi_checkpoints.db")
+)
+THREAD_TTL_SECONDS = int(os.getenv("MOVI_THREAD_TTL_SECONDS", 6 * 60 * 60))
+MAX_THREADS = int(os.getenv("MOVI_MAX_THREADS", 10000))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("MOVI_CHECKPOINT_SWEEP_SECONDS", 60))
+
+# Tables written by SqliteSaver plus our own activity table
+_THREAD_TABLES = ("checkpoints", "writes", "thread_activity")
+
+
+class EvictingSqliteSaver(SqliteSaver):
+    """SqliteSaver that tracks per-thread activity and evicts idle threads."""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        ttl_seconds: int = THREAD_TTL_SECONDS,
+        max_threads: int = MAX_THREADS,
+        sweep_interval: int = SWEEP_INTERVAL_SECONDS,
+    ):
+        super().__init__(conn)
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+
+    def setup(self) -> None:
+        # Called by SqliteSaver.cursor() while self.lock is held - don't re-acquire it
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            )
+        ''')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_thread_activity_last_seen ON thread_activity(last_seen)'
+        )
+        self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        self._maybe_sweep()
+        return result
+
+    # SqliteSaver is sync-only; the async agent path runs its (short, local)
+    # SQLite work on worker threads so the event loop never blocks on disk.
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def _touch(self, thread_id: str) -> None:
+        with self.cursor() as cur:
+            cur.execute('''
+                INSERT INTO thread_activity (thread_id, last_seen) VALUES (?, ?)
+                ON CONFLICT(thread_id) DO UPDATE SET last_seen = excluded.last_seen
+            ''', (str(thread_id), time.time()))
+
+    def _maybe_sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        try:
+            self.sweep()
+        except Exception as e:
+            print(f"[CHECKPOINT] Sweep failed: {e}")
+
+    def sweep(self) -> int:
+        """
+        Delete threads idle for longer than the TTL, then the least recently
+        used threads beyond max_threads.
+
+        Returns:
+            Number of threads evicted
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with self.cursor() as cur:
+            cur.execute('SELECT thread_id FROM thread_activity WHERE last_seen < ?', (cutoff,))
+            expired = [row[0] for row in cur.fetchall()]
+
+            cur.execute('SELECT COUNT(*) FROM thread_activity WHERE last_seen >= ?', (cutoff,))
+            overflow = cur.fetchone()[0] - self.max_threads
+            if overflow > 0:
+                cur.execute('''
+                    SELECT thread_id FROM thread_activity
+                    WHERE last_seen >= ?
+                    ORDER BY last_seen
+                    LIMIT ?
+                ''', (cutoff, overflow))
+                expired.extend(row[0] for row in cur.fetchall())
+
+            if expired:
+                params = [(thread_id,) for thread_id in expired]
+                for table in _THREAD_TABLES:
+                    cur.executemany(f'DELETE FROM {table} WHERE thread_id = ?', params)
+
+        if expired:
+            print(f"[CHECKPOINT] Evicted {len(expired)} idle thread(s)")
+        return len(expired)
+
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> EvictingSqliteSaver:
+    """Returns the process-wide checkpointer (opened on first use)."""
+    global _checkpointer
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                conn = sqlite3.connect(CHECKPOINT_DB, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                saver = EvictingSqliteSaver(conn)
+                saver.setup()
+                print(f"[CHECKPOINT] Using SQLite checkpointer at {CHECKPOINT_DB}")
+                _checkpointer = saver
+    return _checkpointer
@@ -0,0 +1,172 @@
+"""
+Token-budgeted conversation windowing for Movi prompts
+Keeps the most recent turns verbatim, compresses tool results of older
+turns and rolls turns that no longer fit into a running summary. The
+summary is stored in the agent state (and therefore the checkpoint) and
+only extended with newly dropped messages, never rebuilt.
+"""
+import json
+import os
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from movi.metrics import register_collector
+from movi.schema import estimate_tokens
+
+# Per-node prompt budgets (tokens of history, excluding the node's own instructions)
+NODE_BUDGETS = {
+    "classify_request": int(os.getenv("MOVI_CONTEXT_BUDGET_CLASSIFY_REQUEST", 3000)),
+    "analyze_write": int(os.getenv("MOVI_CONTEXT_BUDGET_ANALYZE_WRITE", 3000)),
+    "check_consequences": int(os.getenv("MOVI_CONTEXT_BUDGET_CHECK_CONSEQUENCES", 4000)),
+    "generate_response": int(os.getenv("MOVI_CONTEXT_BUDGET_GENERATE_RESPONSE", 6000)),
+}
+DEFAULT_BUDGET = int(os.getenv("MOVI_CONTEXT_BUDGET", 4000))
+# Rows kept when compressing an old tool result
+COMPRESSED_ROWS = 3
+# Characters kept per message in the running summary
+SUMMARY_SNIPPET_CHARS = 200
+# The summary itself is capped; oldest lines go first
+SUMMARY_MAX_CHARS = int(os.getenv("MOVI_CONTEXT_SUMMARY_CHARS", 2000))
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(str(item.get("text", "")) if isinstance(item, dict) else str(item) for item in content)
+    return str(content or "")
+
+
+def message_tokens(message) -> int:
+    tokens = estimate_tokens(_text(message.content))
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(json.dumps(call.get("args", {})))
+    return tokens
+
+
+def _compress_tool_result(message: ToolMessage) -> ToolMessage:
+    """Keep the status, row count and first few rows of an old tool result."""
+    try:
+        payload = json.loads(message.content)
+    except (TypeError, ValueError):
+        payload = None
+    if isinstance(payload, dict) and isinstance(payload.get("result"), list):
+        rows = payload["result"]
+        if len(rows) <= COMPRESSED_ROWS:
+            return message
+        payload["result"] = rows[:COMPRESSED_ROWS]
+        payload["truncated"] = f"{len(rows) - COMPRESSED_ROWS} more row(s) omitted"
+        content = json.dumps(payload, separators=(",", ":"))
+    else:
+        text = _text(message.content)
+        if len(text) <= 400:
+            return message
+        content = text[:400] + " ...[truncated]"
+    return ToolMessage(content=content, tool_call_id=message.tool_call_id, name=message.name, id=message.id)
+
+
+def _split_turns(messages: list) -> list:
+    """Split history into turns, each starting at a HumanMessage."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _summarize(messages: list) -> list:
+    """One line per user request / assistant answer (tool traffic is dropped)."""
+    lines = []
+    for message in messages:
+        text = " ".join(_text(message.content).split())
+        if not text:
+            continue
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {text[:SUMMARY_SNIPPET_CHARS]}")
+        elif isinstance(message, AIMessage) and not message.tool_calls:
+            lines.append(f"Movi: {text[:SUMMARY_SNIPPET_CHARS]}")
+    return lines
+
+
+def _record(node: str, full_tokens: int, sent_tokens: int):
+    with _stats_lock:
+        stats = _stats.setdefault(node, {"calls": 0, "full_tokens": 0, "sent_tokens": 0})
+        stats["calls"] += 1
+        stats["full_tokens"] += full_tokens
+        stats["sent_tokens"] += sent_tokens
+
+
+def build_context(state: dict, node: str):
+    """
+    Window the conversation for one node's prompt.
+
+    Args:
+        state: Agent state (messages, context_summary, context_summary_upto)
+        node: Node name, selects the token budget
+
+    Returns:
+        (messages, state_update): messages to send, and the summary fields
+        to write back to the state ({} if unchanged)
+    """
+    messages = state["messages"]
+    budget = NODE_BUDGETS.get(node, DEFAULT_BUDGET)
+    summary = state.get("context_summary") or ""
+    summary_upto = state.get("context_summary_upto") or 0
+    full_tokens = sum(message_tokens(m) for m in messages)
+
+    turns = _split_turns(messages)
+    # The current turn is always sent verbatim
+    kept = [turns[-1]] if turns else []
+    used = sum(message_tokens(m) for m in kept[0]) if kept else 0
+    first_kept = len(messages) - len(kept[0]) if kept else 0
+
+    for turn in reversed(turns[:-1]):
+        start = first_kept - len(turn)
+        if start < summary_upto:
+            break
+        compressed = [_compress_tool_result(m) if isinstance(m, ToolMessage) else m for m in turn]
+        cost = sum(message_tokens(m) for m in compressed)
+        if used + cost > budget:
+            break
+        kept.insert(0, compressed)
+        used += cost
+        first_kept = start
+
+    update = {}
+    if first_kept > summary_upto:
+        # Roll newly dropped messages into the running summary
+        lines = ([summary] if summary else []) + _summarize(messages[summary_upto:first_kept])
+        summary = "\n".join(lines)[-SUMMARY_MAX_CHARS:]
+        summary_upto = first_kept
+        update = {"context_summary": summary, "context_summary_upto": summary_upto}
+
+    windowed = [m for turn in kept for m in turn]
+    if summary:
+        windowed.insert(0, HumanMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+
+    sent_tokens = sum(message_tokens(m) for m in windowed)
+    _record(node, full_tokens, sent_tokens)
+    return windowed, update
+
+
+def get_context_stats() -> dict:
+    """Per-node prompt history tokens before and after windowing."""
+    with _stats_lock:
+        stats = {node: dict(values) for node, values in _stats.items()}
+    for values in stats.values():
+        values["tokens_saved"] = values["full_tokens"] - values["sent_tokens"]
+    return stats
+
+
+def _collect_metrics():
+    stats = get_context_stats()
+    return [
+        ("movi_context_history_tokens_total", "Conversation history tokens per node before/after windowing", ("node", "kind"),
+         {(node, kind): values[f"{kind}_tokens"] for node, values in stats.items() for kind in ("full", "sent")}),
+    ]
+
+
+register_collector(_collect_metrics)
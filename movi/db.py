@@ -0,0 +1,184 @@
+"""
+Shared SQLite connection layer for app.py and the Movi agent
+One configured database location (MOVI_DATABASE) and pooled connections
+tuned for concurrent dashboard polling plus agent traffic: WAL journal,
+busy_timeout instead of immediate "database is locked" errors, a larger
+page cache and memory-mapped reads. Agent SELECTs get their own pool of
+read-only connections.
+
+Connections are checked out by one thread at a time. close() hands them
+back to the pool (rolling back anything left uncommitted) instead of
+closing them, so existing get_db() ... conn.close() call sites keep working.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+
+from movi.metrics import register_collector
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATABASE = os.getenv("MOVI_DATABASE", os.path.join(PROJECT_ROOT, "moveinsync.db"))
+# Idle connections kept per pool (extra ones are closed when returned)
+POOL_SIZE = int(os.getenv("MOVI_DB_POOL_SIZE", 8))
+BUSY_TIMEOUT_MS = int(os.getenv("MOVI_DB_BUSY_TIMEOUT_MS", 5000))
+# Page cache per connection, in KiB
+CACHE_SIZE_KB = int(os.getenv("MOVI_DB_CACHE_SIZE_KB", 16384))
+MMAP_SIZE = int(os.getenv("MOVI_DB_MMAP_SIZE", 256 * 1024 * 1024))
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its pool."""
+
+    pool = None
+    checked_out = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def discard(self):
+        """Really close the connection."""
+        super().close()
+
+
+class ConnectionPool:
+    """Pool of tuned connections to one database file."""
+
+    def __init__(self, path: str, read_only: bool = False, size: int = POOL_SIZE):
+        self.path = path
+        self.read_only = read_only
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._closed = False
+        self.stats = {"opened": 0, "reused": 0}
+
+    def _open(self) -> PooledConnection:
+        if self.read_only:
+            conn = sqlite3.connect(
+                f"{Path(self.path).resolve().as_uri()}?mode=ro", uri=True,
+                factory=PooledConnection, check_same_thread=False,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+            )
+        else:
+            conn = sqlite3.connect(
+                self.path, factory=PooledConnection, check_same_thread=False,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+            )
+            # WAL lets readers run alongside the single writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # INSERT OR REPLACE must fire delete triggers too, or derived tables drift
+        conn.execute("PRAGMA recursive_triggers=ON")
+        if self.read_only:
+            conn.execute("PRAGMA query_only=1")
+        conn.pool = self
+        self.stats["opened"] += 1
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        try:
+            conn = self._idle.get_nowait()
+            self.stats["reused"] += 1
+        except queue.Empty:
+            conn = self._open()
+        conn.row_factory = sqlite3.Row
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn: PooledConnection):
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                raise queue.Full
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.discard()
+
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(path: str, read_only: bool) -> ConnectionPool:
+    key = (os.path.abspath(path), read_only)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(key[0], read_only)
+    return pool
+
+
+def database_path() -> str:
+    """Returns the configured database file."""
+    return DATABASE
+
+
+def get_db(path: str = None) -> sqlite3.Connection:
+    """
+    Checks out a read-write connection (Row factory). close() returns it to the pool.
+
+    Args:
+        path: Database file, defaults to the configured DATABASE
+    """
+    return _get_pool(path or DATABASE, read_only=False).acquire()
+
+
+def get_read_db(path: str = None) -> sqlite3.Connection:
+    """Checks out a read-only connection (writes fail instead of landing)."""
+    return _get_pool(path or DATABASE, read_only=True).acquire()
+
+
+def close_all():
+    """Closes every idle pooled connection; checked-out ones are closed when returned."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def set_database(path: str):
+    """Points the app and the agent at another database file."""
+    global DATABASE
+    close_all()
+    DATABASE = path
+
+
+def _collect_metrics():
+    with _pools_lock:
+        pools = list(_pools.values())
+    labels = lambda pool: (os.path.basename(pool.path), "ro" if pool.read_only else "rw")
+    return [
+        ("movi_db_connections_total", "Pooled SQLite connections opened vs reused", ("db", "mode", "event"),
+         {labels(pool) + (event,): count for pool in pools for event, count in pool.stats.items()}),
+        ("movi_db_pool_idle_connections", "Idle connections per pool", ("db", "mode"),
+         {labels(pool): pool.idle() for pool in pools}),
+    ]
+
+
+register_collector(_collect_metrics)
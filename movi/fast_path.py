@@ -0,0 +1,212 @@
+"""
+Deterministic fast path for common dashboard questions
+Matches a small set of read-only intents (trip counts, unassigned trips,
+a trip's status, active routes) against parameterized templates, runs the
+SQL directly and formats the answer locally - no LLM round trips.
+Anything that doesn't match falls through to the LangGraph agent.
+"""
+import os
+import re
+import threading
+import time
+
+from movi.metrics import register_collector
+
+ENABLED = os.getenv("MOVI_FAST_PATH", "1") != "0"
+
+# Anything that sounds like a write goes through the agent (and its confirmation flow)
+_WRITE_WORDS = re.compile(
+    r"\b(assign|unassign|remove|delete|update|create|add|change|set|cancel|deactivate|"
+    r"activate|move|replace|insert|rename|allocate)\b"
+)
+
+_stats = {"hits": 0, "misses": 0, "by_intent": {}}
+_stats_lock = threading.Lock()
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().strip().rstrip("?.!").split())
+
+
+def _trip_count(conn, match) -> str:
+    count = conn.execute('SELECT COUNT(*) FROM DailyTrips').fetchone()[0]
+    return f"There {'is' if count == 1 else 'are'} {count} trip{'' if count == 1 else 's'} in total."
+
+
+def _unassigned_trips(conn, match) -> str:
+    rows = conn.execute('''
+        SELECT dt.trip_id, dt.display_name, dt.booking_status_percentage
+        FROM DailyTrips dt
+        LEFT JOIN Deployments d ON dt.trip_id = d.trip_id
+        WHERE d.vehicle_id IS NULL
+        ORDER BY dt.display_name
+    ''').fetchall()
+    if not rows:
+        return "All trips have a vehicle assigned."
+    lines = [f"{len(rows)} trip{' has' if len(rows) == 1 else 's have'} no vehicle assigned:"]
+    lines.extend(
+        f"- {row['trip_id']}: {row['display_name']} ({row['booking_status_percentage']}% booked)"
+        for row in rows
+    )
+    return "\n".join(lines)
+
+
+def _trip_status(conn, match):
+    ref = match.group("trip").strip().strip("'\"")
+    row = conn.execute('''
+        SELECT dt.trip_id, dt.display_name, dt.booking_status_percentage, dt.live_status,
+               v.license_plate, dr.name AS driver_name
+        FROM DailyTrips dt
+        LEFT JOIN Deployments d ON dt.trip_id = d.trip_id
+        LEFT JOIN Vehicles v ON d.vehicle_id = v.vehicle_id
+        LEFT JOIN Drivers dr ON d.driver_id = dr.driver_id
+        WHERE dt.trip_id = ? COLLATE NOCASE OR dt.display_name = ? COLLATE NOCASE
+        LIMIT 1
+    ''', (ref, ref)).fetchone()
+    if row is None:
+        # Unknown reference - let the agent interpret it
+        return None
+    return (
+        f"Trip {row['trip_id']} ({row['display_name']}) is currently '{row['live_status']}' "
+        f"with {row['booking_status_percentage']}% bookings. "
+        f"Vehicle: {row['license_plate'] or 'not assigned'}, "
+        f"Driver: {row['driver_name'] or 'not assigned'}."
+    )
+
+
+def _active_routes(conn, match) -> str:
+    rows = conn.execute('''
+        SELECT route_id, route_display_name, shift_time, direction
+        FROM Routes
+        WHERE status = 'active'
+        ORDER BY route_id
+    ''').fetchall()
+    if not rows:
+        return "There are no active routes."
+    lines = [f"There {'is' if len(rows) == 1 else 'are'} {len(rows)} active route{'' if len(rows) == 1 else 's'}:"]
+    lines.extend(
+        f"- {row['route_id']}: {row['route_display_name']} ({row['shift_time']}, {row['direction']})"
+        for row in rows
+    )
+    return "\n".join(lines)
+
+
+# Whole-question patterns, checked in order. A question that adds anything else - another
+# entity, an ID, a filter ("on active routes", "assigned to driver D001") - matches none
+# of them and goes to the agent.
+_ASK = r"(?:(?:can|could) you |please )?"
+_LIST = r"(?:which|what|list|show|show me|give me|find)(?: all)?(?: the)?"
+INTENTS = [
+    ("unassigned_trips", [
+        rf"{_ASK}{_LIST} unassigned trips",
+        rf"{_ASK}{_LIST} trips (?:that |which )?(?:are not|aren't|have not been|haven't been|are not yet|not yet|not) "
+        r"(?:assigned|allocated)(?: yet)?",
+        rf"{_ASK}{_LIST} trips (?:that |which )?(?:have no|don't have a|do not have a|are without a|without a|without|with no"
+        r"|missing a) vehicle(?: assigned)?",
+        r"(?:are there|do we have|how many) (?:any )?unassigned trips(?: are there| do we have)?",
+        r"unassigned trips",
+    ], _unassigned_trips),
+    ("trip_status", [
+        rf"{_ASK}(?:what is |what's |show |show me )?(?:the )?(?:live )?status of (?:the )?(?:trip )?"
+        r"(?P<trip>t\d{3,}|'[^']+'|\"[^\"]+\")",
+        r"(?:what is |what's )?(?:the )?(?:live )?status of (?:the )?trip (?P<trip>.+)",
+        r"(?:what is |what's )?(?:trip )?(?P<trip>t\d{3,})(?:'s)? (?:live )?status",
+    ], _trip_status),
+    ("trip_count", [
+        r"how many (?:daily )?trips(?: are there| do we have| (?:are )?scheduled)?(?: today)?",
+        r"(?:total|count of|number of) (?:daily )?trips",
+    ], _trip_count),
+    ("active_routes", [
+        rf"{_ASK}{_LIST} (?:currently )?active routes(?: are there)?",
+        rf"{_ASK}(?:which|what) routes are (?:currently )?active(?: right now| now)?",
+        rf"{_ASK}(?:list|show|show me)(?: all)?(?: the)? routes (?:that are|which are) (?:currently )?active",
+        r"how many (?:currently )?active routes(?: are there| do we have)?",
+    ], _active_routes),
+]
+_COMPILED = [(name, [re.compile(p) for p in patterns], handler) for name, patterns, handler in INTENTS]
+
+
+def match_intent(text: str):
+    """
+    Match text against the fast-path intents.
+
+    Returns:
+        (intent_name, match, handler) or None
+    """
+    text = _normalize(text)
+    if not text or _WRITE_WORDS.search(text):
+        return None
+    for name, patterns, handler in _COMPILED:
+        for pattern in patterns:
+            match = pattern.fullmatch(text)
+            if match:
+                return name, match, handler
+    return None
+
+
+def _record(intent):
+    with _stats_lock:
+        if intent is None:
+            _stats["misses"] += 1
+        else:
+            _stats["hits"] += 1
+            _stats["by_intent"][intent] = _stats["by_intent"].get(intent, 0) + 1
+
+
+def answer(text: str, get_db):
+    """
+    Try to answer text without the LLM.
+
+    Args:
+        text: User message
+        get_db: Callable returning a sqlite3 connection with Row factory
+
+    Returns:
+        Dict with intent, response and elapsed_ms, or None to fall through
+    """
+    if not ENABLED:
+        return None
+    start = time.perf_counter()
+    matched = match_intent(text)
+    if matched is None:
+        _record(None)
+        return None
+
+    name, match, handler = matched
+    conn = get_db()
+    try:
+        response = handler(conn, match)
+    except Exception as e:
+        print(f"[FAST_PATH] {name} failed, falling back to agent: {e}")
+        response = None
+    finally:
+        conn.close()
+
+    if response is None:
+        _record(None)
+        return None
+    _record(name)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"[FAST_PATH] {name} answered in {elapsed_ms:.1f}ms")
+    return {"intent": name, "response": response, "elapsed_ms": elapsed_ms}
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        stats = {"hits": _stats["hits"], "misses": _stats["misses"], "by_intent": dict(_stats["by_intent"])}
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+    return stats
+
+
+def _collect_metrics():
+    stats = get_stats()
+    return [
+        ("movi_fast_path_requests_total", "Messages answered by the fast path vs passed to the agent", ("outcome",),
+         {("hit",): stats["hits"], ("miss",): stats["misses"]}),
+        ("movi_fast_path_intent_hits_total", "Fast-path answers per intent", ("intent",),
+         {(intent,): count for intent, count in stats["by_intent"].items()}),
+    ]
+
+
+register_collector(_collect_metrics)
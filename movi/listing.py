@@ -0,0 +1,161 @@
+"""
+Keyset pagination, filtering and field projection for the REST list endpoints
+A ListSpec describes one endpoint: its FROM clause, the fields it can
+return, its sort order and its filters. page() turns request arguments
+into a query whose rows are streamed out as a JSON array, plus the cursor
+for the next page.
+
+Cursors encode the sort key of the last row on the page, so every page is
+an index range scan from where the previous one stopped, however deep the
+client pages. The next cursor is computed before the body is streamed
+(it is returned in headers), with a key-only lookahead query in the same
+read transaction.
+"""
+import base64
+import json
+import os
+
+MAX_PAGE_SIZE = int(os.getenv("MOVI_MAX_PAGE_SIZE", 1000))
+# Rows serialized per chunk of the streamed body
+STREAM_BATCH = 200
+
+_TRUE = ("1", "true", "yes")
+
+
+class ListError(ValueError):
+    """Invalid list parameters (reported to the client as 400)."""
+
+
+def encode_cursor(keys) -> str:
+    raw = json.dumps(list(keys), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        keys = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ListError("Invalid cursor")
+    if not isinstance(keys, list) or len(keys) != size:
+        raise ListError("Invalid cursor")
+    return keys
+
+
+class ListSpec:
+    """
+    One list endpoint.
+
+    Args:
+        source: FROM clause, including joins
+        columns: Field name -> SQL expression, in output order
+        order_by: SQL expressions of the sort key; together they must be unique
+            and never NULL
+        filters: Query parameter -> (SQL condition, converter). Conditions take one
+            "?" parameter converted with converter; a converter of None marks a flag
+            (condition applied when the parameter is 1/true/yes)
+    """
+
+    def __init__(self, source: str, columns: dict, order_by: list, filters: dict = None):
+        self.source = source
+        self.columns = columns
+        self.order_by = order_by
+        self.filters = filters or {}
+
+    def _fields(self, args) -> list:
+        requested = args.get("fields")
+        if not requested:
+            return list(self.columns)
+        fields = [f.strip() for f in requested.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in self.columns]
+        if unknown or not fields:
+            raise ListError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.columns)}")
+        return list(dict.fromkeys(fields))
+
+    def _where(self, args):
+        conditions, params = [], []
+        for name, (condition, convert) in self.filters.items():
+            value = args.get(name)
+            if value is None or value == "":
+                continue
+            if convert is None:
+                if value.lower() in _TRUE:
+                    conditions.append(condition)
+                continue
+            try:
+                params.append(convert(value))
+            except ValueError:
+                raise ListError(f"Invalid value for {name}: {value!r}")
+            conditions.append(condition)
+        return conditions, params
+
+    def _limit(self, args):
+        value = args.get("limit")
+        if not value:
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ListError(f"Invalid limit: {value!r}")
+        if limit < 1:
+            raise ListError("limit must be positive")
+        return min(limit, MAX_PAGE_SIZE)
+
+    def page(self, conn, args):
+        """
+        Run the list query for request arguments.
+
+        Args:
+            conn: Connection (a read transaction is opened on it)
+            args: Mapping of query parameters (fields, limit, cursor, filters)
+
+        Returns:
+            (cursor, fields, next_cursor): a sqlite3 cursor over the rows (select
+            list = fields), and the cursor of the next page or None
+        """
+        fields = self._fields(args)
+        limit = self._limit(args)
+        conditions, params = self._where(args)
+
+        key = ", ".join(self.order_by)
+        if args.get("cursor"):
+            after = decode_cursor(args["cursor"], len(self.order_by))
+            conditions.append(f"({key}) > ({', '.join('?' * len(after))})")
+            params += after
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # Both queries see the same snapshot
+        conn.execute("BEGIN")
+        next_cursor = None
+        if limit:
+            # Sort keys of the last row of this page and the first of the next
+            keys = conn.execute(
+                f"SELECT {key} FROM {self.source} {where} ORDER BY {key} LIMIT 2 OFFSET ?",
+                params + [limit - 1]
+            ).fetchall()
+            if len(keys) == 2:
+                next_cursor = encode_cursor(keys[0])
+
+        select = ", ".join(f'{self.columns[f]} AS "{f}"' for f in fields)
+        sql = f"SELECT {select} FROM {self.source} {where} ORDER BY {key}"
+        if limit:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        return cursor, fields, next_cursor
+
+
+def iter_json_array(cursor, fields: list, batch: int = STREAM_BATCH):
+    """Serialize rows from a cursor as a JSON array of objects, in chunks."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    yield "["
+    first = True
+    while True:
+        rows = cursor.fetchmany(batch)
+        if not rows:
+            break
+        chunk = ",".join(dumps(dict(zip(fields, row))) for row in rows)
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]"
@@ -0,0 +1,48 @@
+"""
+Process-wide cap on concurrent LLM calls
+One BoundedSemaphore serves both agent paths: sync nodes take a slot
+directly, async nodes wait for one on a small thread pool so the event
+loop never blocks. graph.stream and graph.astream running side by side
+(Flask threads plus the ASGI loop) therefore share a single limit.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ConcurrencyGate:
+    """
+    Usable as a context manager on threads (with gate:) and in coroutines (async with gate:).
+
+    Args:
+        limit: Maximum holders at once, across threads and event loops
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        # Blocked acquires of async callers; more waiters than threads just queue here
+        self._waiters = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="movi-llm-gate")
+
+    def __enter__(self):
+        self._slots.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    async def __aenter__(self):
+        if self._slots.acquire(blocking=False):
+            return self
+        waiter = self._waiters.submit(self._slots.acquire)
+        try:
+            await asyncio.wrap_future(waiter)
+        except asyncio.CancelledError:
+            # Too late to withdraw: the slot is (or is about to be) taken - hand it back
+            if not waiter.cancel():
+                waiter.add_done_callback(lambda _: self._slots.release())
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
@@ -0,0 +1,118 @@
+"""
+In-process metrics for Movi
+Histograms (plus gauges sampled at scrape time) rendered in the Prometheus text exposition format
+(served at /api/metrics). Observations are a bisect plus a few additions
+under a lock, cheap enough to leave on in production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+_metrics = []
+# Gauge collectors, see register_collector()
+_collectors = []
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help_text, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect) -> None:
+    """
+    Register a callable sampled at scrape time. It returns a list of
+    (name, help, labelnames, {label_values_tuple: value}) series; names
+    ending in _total are exposed as counters, everything else as gauges.
+    """
+    _collectors.append(collect)
+
+
+def render() -> str:
+    """All metrics in Prometheus text format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            gauges = collect()
+        except Exception as e:
+            print(f"[METRICS] Collector failed: {e}")
+            continue
+        for name, help_text, labelnames, values in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labelnames, key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Metrics shared across modules
+NODE_DURATION = histogram("movi_node_duration_seconds", "Wall time of each agent graph node", ["node"])
+LLM_DURATION = histogram("movi_llm_duration_seconds", "Latency of each Gemini call", ["node", "mode"])
+LLM_TOKENS = histogram("movi_llm_tokens", "Tokens per Gemini call", ["node", "direction"], TOKEN_BUCKETS)
+SQL_DURATION = histogram("movi_sql_duration_seconds", "Agent SQL tool execution time", ["tool", "cache"])
+SQL_ROWS = histogram("movi_sql_rows", "Rows returned or affected per agent SQL tool call", ["tool"], ROW_BUCKETS)
+ASR_DURATION = histogram("movi_asr_duration_seconds", "Speech-to-text duration")
+TTS_DURATION = histogram("movi_tts_duration_seconds", "Text-to-speech duration")
+REQUEST_DURATION = histogram("movi_request_duration_seconds", "End-to-end chat request latency", ["endpoint"])
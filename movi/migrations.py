@@ -0,0 +1,529 @@
+"""
+Versioned schema migrations for the Movi database
+Each migration runs once, in its own transaction, and bumps
+PRAGMA user_version, so existing databases are upgraded in place.
+Migration 1 matches the schema the original init_db() created; tables
+that already exist are left as they are.
+
+Run from the project root:
+    python -m movi.migrations            # upgrade the configured database
+    python -m movi.migrations --check    # also EXPLAIN QUERY PLAN the hot queries
+"""
+import sqlite3
+
+from movi.stats import rebuild_stats
+
+
+def _coverage_delta(table: str, key: str, via: str, old, new) -> str:
+    """
+    SQL expression for the change in the number of table rows referenced by a
+    Deployments row (matched on key, counted when via is not NULL) when
+    Deployments row OLD becomes NEW ("OLD"/"NEW", or None for insert/delete).
+    Used in AFTER triggers, so Deployments already holds NEW.
+    """
+    def refs(row, target):
+        if row is None:
+            return "0"
+        return f"({row}.{key} IS {target} AND {row}.{via} IS NOT NULL)"
+
+    exclude = " AND rowid IS NOT NEW.rowid" if new else ""
+    terms = []
+    for row in (old, new):
+        if row is None:
+            continue
+        target = f"{row}.{key}"
+        others = f"EXISTS (SELECT 1 FROM Deployments WHERE {key} = {target} AND {via} IS NOT NULL{exclude})"
+        term = (f"EXISTS (SELECT 1 FROM {table} WHERE {key} = {target})"
+                f" * (({others} OR {refs(new, target)}) - ({others} OR {refs(old, target)}))")
+        if row == new and old:
+            # Same key on both sides - counted once
+            term += f" * (OLD.{key} IS NOT NEW.{key})"
+        terms.append(f"({term})")
+    return " + ".join(terms)
+
+
+def _deployment_stats_trigger(event: str, old, new) -> str:
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS trg_deployments_stats_{event.split()[0].lower()}
+        AFTER {event} ON Deployments
+        BEGIN
+            UPDATE DashboardStats SET
+                assigned_trips = assigned_trips + {_coverage_delta("DailyTrips", "trip_id", "vehicle_id", old, new)},
+                deployed_vehicles = deployed_vehicles + {_coverage_delta("Vehicles", "vehicle_id", "vehicle_id", old, new)},
+                deployed_drivers = deployed_drivers + {_coverage_delta("Drivers", "driver_id", "driver_id", old, new)}
+            WHERE id = 1;
+        END
+    '''
+
+
+def _fleet_stats_triggers(table: str, key: str, prefix: str) -> list:
+    # A vehicle/driver counts as deployed if any deployment references it
+    used = "EXISTS (SELECT 1 FROM Deployments WHERE {key} = {row}.{key})"
+    old_used, new_used = used.format(key=key, row="OLD"), used.format(key=key, row="NEW")
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_stats_insert AFTER INSERT ON {table}
+        BEGIN
+            UPDATE DashboardStats SET total_{prefix} = total_{prefix} + 1,
+                deployed_{prefix} = deployed_{prefix} + {new_used}
+            WHERE id = 1;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_stats_delete AFTER DELETE ON {table}
+        BEGIN
+            UPDATE DashboardStats SET total_{prefix} = total_{prefix} - 1,
+                deployed_{prefix} = deployed_{prefix} - {old_used}
+            WHERE id = 1;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_stats_update AFTER UPDATE OF {key} ON {table}
+        BEGIN
+            UPDATE DashboardStats SET deployed_{prefix} = deployed_{prefix} - {old_used} + {new_used}
+            WHERE id = 1;
+        END
+        ''',
+    ]
+
+
+def _change_feed_triggers(table: str, trips: str, columns=()) -> list:
+    """
+    Triggers recording the trips whose /api/daily-trips rows a write to table changes.
+
+    Args:
+        table: Table to watch
+        trips: SELECT of (trip_id, source) with {row} for OLD/NEW and {source} for table
+        columns: Columns whose updates matter (default: all)
+    """
+    of = f" OF {', '.join(columns)}" if columns else ""
+    old, new = trips.format(row="OLD", source=table), trips.format(row="NEW", source=table)
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_feed_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO ChangeFeed (trip_id, source) {new};
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_feed_update AFTER UPDATE{of} ON {table}
+        BEGIN
+            INSERT INTO ChangeFeed (trip_id, source) {old} UNION {new};
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_feed_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO ChangeFeed (trip_id, source) {old};
+        END
+        ''',
+    ]
+
+
+# Tables whose writes move their TableVersions counter (the REST ETags read these)
+VERSIONED_TABLES = (
+    "Stops", "Paths", "PathStops", "Routes", "Vehicles", "Drivers", "DailyTrips", "Deployments",
+    "DashboardStats", "RouteStats",
+)
+
+
+def _version_triggers(table: str) -> list:
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_version_{event.lower()} AFTER {event} ON {table}
+        BEGIN
+            UPDATE TableVersions SET version = version + 1 WHERE name = '{table}';
+        END
+        '''
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+# (version, description, steps) - a step is an SQL statement or a callable taking the connection
+MIGRATIONS = [
+    (1, "initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS Stops (
+            stop_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        )
+        ''',
+        # Stores the ordered list as JSON
+        '''
+        CREATE TABLE IF NOT EXISTS Paths (
+            path_id TEXT PRIMARY KEY,
+            path_name TEXT NOT NULL,
+            ordered_list_of_stop_ids TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS Routes (
+            route_id TEXT PRIMARY KEY,
+            path_id TEXT NOT NULL,
+            route_display_name TEXT NOT NULL,
+            shift_time TEXT NOT NULL,
+            direction TEXT NOT NULL,
+            start_point TEXT NOT NULL,
+            end_point TEXT NOT NULL,
+            capacity INTEGER NOT NULL,
+            allowed_waitlist INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'active',
+            FOREIGN KEY (path_id) REFERENCES Paths(path_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS Vehicles (
+            vehicle_id TEXT PRIMARY KEY,
+            license_plate TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL,
+            capacity INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS Drivers (
+            driver_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            phone_number TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS DailyTrips (
+            trip_id TEXT PRIMARY KEY,
+            route_id TEXT NOT NULL,
+            display_name TEXT NOT NULL,
+            booking_status_percentage INTEGER NOT NULL,
+            live_status TEXT NOT NULL,
+            FOREIGN KEY (route_id) REFERENCES Routes(route_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS Deployments (
+            deployment_id TEXT PRIMARY KEY,
+            trip_id TEXT NOT NULL,
+            vehicle_id TEXT,
+            driver_id TEXT,
+            FOREIGN KEY (trip_id) REFERENCES DailyTrips(trip_id),
+            FOREIGN KEY (vehicle_id) REFERENCES Vehicles(vehicle_id),
+            FOREIGN KEY (driver_id) REFERENCES Drivers(driver_id)
+        )
+        ''',
+    ]),
+    (2, "indexes for joins and filters", [
+        # /api/daily-trips and the agent's "unassigned" queries join on trip_id and test
+        # vehicle_id/driver_id - covering, so the join never touches the table
+        'CREATE INDEX IF NOT EXISTS idx_deployments_trip ON Deployments(trip_id, vehicle_id, driver_id)',
+        'CREATE INDEX IF NOT EXISTS idx_deployments_vehicle ON Deployments(vehicle_id)',
+        'CREATE INDEX IF NOT EXISTS idx_deployments_driver ON Deployments(driver_id)',
+        # /api/daily-trips sorts by display_name
+        'CREATE INDEX IF NOT EXISTS idx_dailytrips_display_name ON DailyTrips(display_name)',
+        'CREATE INDEX IF NOT EXISTS idx_dailytrips_route ON DailyTrips(route_id)',
+        'CREATE INDEX IF NOT EXISTS idx_dailytrips_booking ON DailyTrips(booking_status_percentage)',
+        # /api/routes?status=
+        'CREATE INDEX IF NOT EXISTS idx_routes_status ON Routes(status)',
+        'CREATE INDEX IF NOT EXISTS idx_routes_path ON Routes(path_id)',
+    ]),
+    (3, "PathStops: one row per stop of a path", [
+        # seq is the 0-based position in Paths.ordered_list_of_stop_ids
+        '''
+        CREATE TABLE IF NOT EXISTS PathStops (
+            path_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            stop_id TEXT NOT NULL,
+            PRIMARY KEY (path_id, seq),
+            FOREIGN KEY (path_id) REFERENCES Paths(path_id),
+            FOREIGN KEY (stop_id) REFERENCES Stops(stop_id)
+        ) WITHOUT ROWID
+        ''',
+        # stop -> paths; covering since the primary key columns ride along
+        'CREATE INDEX IF NOT EXISTS idx_pathstops_stop ON PathStops(stop_id, path_id)',
+        'CREATE INDEX IF NOT EXISTS idx_stops_name ON Stops(name COLLATE NOCASE)',
+        '''
+        INSERT OR IGNORE INTO PathStops (path_id, seq, stop_id)
+        SELECT p.path_id, j.key, j.value
+        FROM Paths p, json_each(p.ordered_list_of_stop_ids) j
+        WHERE json_valid(p.ordered_list_of_stop_ids)
+        ''',
+        # The JSON column stays the write format (single-statement writes from the agent
+        # and existing clients); these triggers keep PathStops in step with it
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_paths_stops_insert AFTER INSERT ON Paths
+        WHEN json_valid(NEW.ordered_list_of_stop_ids)
+        BEGIN
+            INSERT INTO PathStops (path_id, seq, stop_id)
+            SELECT NEW.path_id, key, value FROM json_each(NEW.ordered_list_of_stop_ids);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_paths_stops_update
+        AFTER UPDATE OF path_id, ordered_list_of_stop_ids ON Paths
+        BEGIN
+            DELETE FROM PathStops WHERE path_id = OLD.path_id;
+            INSERT INTO PathStops (path_id, seq, stop_id)
+            SELECT NEW.path_id, key, value FROM json_each(NEW.ordered_list_of_stop_ids)
+            WHERE json_valid(NEW.ordered_list_of_stop_ids);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_paths_stops_delete AFTER DELETE ON Paths
+        BEGIN
+            DELETE FROM PathStops WHERE path_id = OLD.path_id;
+        END
+        ''',
+    ]),
+    (4, "keyset order for daily trips", [
+        # /api/daily-trips pages on (display_name, trip_id)
+        'DROP INDEX IF EXISTS idx_dailytrips_display_name',
+        'CREATE INDEX IF NOT EXISTS idx_dailytrips_display_name_trip ON DailyTrips(display_name, trip_id)',
+    ]),
+    (5, "trigger-maintained dashboard statistics", [
+        # Single row; idle = total - deployed, unassigned = total - assigned
+        '''
+        CREATE TABLE IF NOT EXISTS DashboardStats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_trips INTEGER NOT NULL DEFAULT 0,
+            assigned_trips INTEGER NOT NULL DEFAULT 0,
+            total_vehicles INTEGER NOT NULL DEFAULT 0,
+            deployed_vehicles INTEGER NOT NULL DEFAULT 0,
+            total_drivers INTEGER NOT NULL DEFAULT 0,
+            deployed_drivers INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        # Rows exist only for routes with trips; average = booking_total / trips
+        '''
+        CREATE TABLE IF NOT EXISTS RouteStats (
+            route_id TEXT PRIMARY KEY,
+            trips INTEGER NOT NULL,
+            booking_total INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        rebuild_stats,
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_dailytrips_stats_insert AFTER INSERT ON DailyTrips
+        BEGIN
+            UPDATE DashboardStats SET total_trips = total_trips + 1,
+                assigned_trips = assigned_trips + EXISTS (
+                    SELECT 1 FROM Deployments WHERE trip_id = NEW.trip_id AND vehicle_id IS NOT NULL)
+            WHERE id = 1;
+            INSERT INTO RouteStats (route_id, trips, booking_total)
+            VALUES (NEW.route_id, 1, NEW.booking_status_percentage)
+            ON CONFLICT (route_id) DO UPDATE SET
+                trips = trips + 1, booking_total = booking_total + excluded.booking_total;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_dailytrips_stats_delete AFTER DELETE ON DailyTrips
+        BEGIN
+            UPDATE DashboardStats SET total_trips = total_trips - 1,
+                assigned_trips = assigned_trips - EXISTS (
+                    SELECT 1 FROM Deployments WHERE trip_id = OLD.trip_id AND vehicle_id IS NOT NULL)
+            WHERE id = 1;
+            UPDATE RouteStats SET trips = trips - 1, booking_total = booking_total - OLD.booking_status_percentage
+            WHERE route_id = OLD.route_id;
+            DELETE FROM RouteStats WHERE route_id = OLD.route_id AND trips = 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_dailytrips_stats_update
+        AFTER UPDATE OF trip_id, route_id, booking_status_percentage ON DailyTrips
+        BEGIN
+            UPDATE DashboardStats SET assigned_trips = assigned_trips
+                - EXISTS (SELECT 1 FROM Deployments WHERE trip_id = OLD.trip_id AND vehicle_id IS NOT NULL)
+                + EXISTS (SELECT 1 FROM Deployments WHERE trip_id = NEW.trip_id AND vehicle_id IS NOT NULL)
+            WHERE id = 1;
+            UPDATE RouteStats SET trips = trips - 1, booking_total = booking_total - OLD.booking_status_percentage
+            WHERE route_id = OLD.route_id;
+            DELETE FROM RouteStats WHERE route_id = OLD.route_id AND trips = 0;
+            INSERT INTO RouteStats (route_id, trips, booking_total)
+            VALUES (NEW.route_id, 1, NEW.booking_status_percentage)
+            ON CONFLICT (route_id) DO UPDATE SET
+                trips = trips + 1, booking_total = booking_total + excluded.booking_total;
+        END
+        ''',
+        _deployment_stats_trigger("INSERT", None, "NEW"),
+        _deployment_stats_trigger("UPDATE OF trip_id, vehicle_id, driver_id", "OLD", "NEW"),
+        _deployment_stats_trigger("DELETE", "OLD", None),
+        *_fleet_stats_triggers("Vehicles", "vehicle_id", "vehicles"),
+        *_fleet_stats_triggers("Drivers", "driver_id", "drivers"),
+    ]),
+    (6, "change feed for live trip updates", [
+        # One row per trip whose joined /api/daily-trips rows may have changed;
+        # AUTOINCREMENT so sequence numbers are never reused after trimming
+        '''
+        CREATE TABLE IF NOT EXISTS ChangeFeed (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            trip_id TEXT,
+            source TEXT NOT NULL
+        )
+        ''',
+        *_change_feed_triggers("DailyTrips", "SELECT {row}.trip_id, '{source}'"),
+        *_change_feed_triggers("Deployments", "SELECT {row}.trip_id, '{source}'"),
+        *_change_feed_triggers(
+            "Routes", "SELECT trip_id, '{source}' FROM DailyTrips WHERE route_id = {row}.route_id",
+            ("route_id", "route_display_name"),
+        ),
+        *_change_feed_triggers(
+            "Vehicles", "SELECT trip_id, '{source}' FROM Deployments WHERE vehicle_id = {row}.vehicle_id",
+            ("vehicle_id", "license_plate", "type"),
+        ),
+        *_change_feed_triggers(
+            "Drivers", "SELECT trip_id, '{source}' FROM Deployments WHERE driver_id = {row}.driver_id",
+        ),
+    ]),
+    (7, "table versions for REST ETags", [
+        # One write counter per table, moved by triggers whichever connection or process writes
+        '''
+        CREATE TABLE IF NOT EXISTS TableVersions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        # Random starting points, so a database swapped for another never repeats an ETag
+        "INSERT OR IGNORE INTO TableVersions (name, version) SELECT column1, abs(random() % 1000000000000) "
+        "FROM (VALUES " + ", ".join(f"('{table}')" for table in VERSIONED_TABLES) + ")",
+        *[trigger for table in VERSIONED_TABLES for trigger in _version_triggers(table)],
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# (name, sql, params, indexes the plan must use, steps it must not contain) for the
+# REST and agent hot paths
+HOT_QUERIES = [
+    ("daily_trips_page", '''
+        SELECT dt.trip_id, dt.display_name, d.vehicle_id, v.license_plate, dr.name
+        FROM DailyTrips dt
+        LEFT JOIN Routes r ON dt.route_id = r.route_id
+        LEFT JOIN Deployments d ON dt.trip_id = d.trip_id
+        LEFT JOIN Vehicles v ON d.vehicle_id = v.vehicle_id
+        LEFT JOIN Drivers dr ON d.driver_id = dr.driver_id
+        WHERE (dt.display_name, dt.trip_id, ifnull(d.deployment_id, '')) > (?, ?, ?)
+        ORDER BY dt.display_name, dt.trip_id, ifnull(d.deployment_id, '')
+        LIMIT 100
+    ''', ("", "", ""), ["idx_dailytrips_display_name_trip", "idx_deployments_trip"], ["USE TEMP B-TREE FOR ORDER BY"]),
+    ("unassigned_vehicles", '''
+        SELECT v.vehicle_id FROM Vehicles v
+        WHERE NOT EXISTS (SELECT 1 FROM Deployments d WHERE d.vehicle_id = v.vehicle_id)
+        ORDER BY v.vehicle_id
+    ''', (), ["idx_deployments_vehicle"], ["USE TEMP B-TREE FOR ORDER BY"]),
+    ("routes_by_status", 'SELECT * FROM Routes WHERE status = ?', ("active",), ["idx_routes_status"], []),
+    ("trips_by_route", 'SELECT * FROM DailyTrips WHERE route_id = ?', ("R001",), ["idx_dailytrips_route"], []),
+    ("deployments_by_vehicle", 'SELECT * FROM Deployments WHERE vehicle_id = ?', ("V001",),
+     ["idx_deployments_vehicle"], []),
+    ("trips_with_bookings", 'SELECT trip_id FROM DailyTrips WHERE booking_status_percentage > ?', (0,),
+     ["idx_dailytrips_booking"], []),
+    ("unassigned_trips", '''
+        SELECT dt.trip_id FROM DailyTrips dt
+        LEFT JOIN Deployments d ON dt.trip_id = d.trip_id
+        WHERE d.vehicle_id IS NULL
+    ''', (), ["idx_deployments_trip"], []),
+    ("paths_through_stop", '''
+        SELECT ps.path_id, p.path_name, ps.seq
+        FROM PathStops ps JOIN Paths p ON p.path_id = ps.path_id
+        WHERE ps.stop_id = ?
+    ''', ("S001",), ["idx_pathstops_stop"], []),
+    ("routes_through_stop", '''
+        SELECT r.* FROM Routes r
+        WHERE r.path_id IN (SELECT path_id FROM PathStops WHERE stop_id = ?)
+        ORDER BY r.route_id
+    ''', ("S001",), ["idx_pathstops_stop"], []),
+]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> int:
+    """
+    Applies pending migrations up to target.
+
+    Args:
+        conn: Read-write connection
+        target: Schema version to stop at
+
+    Returns:
+        The schema version after migrating
+    """
+    for version, description, steps in MIGRATIONS:
+        if version > target:
+            break
+        # IMMEDIATE takes the write lock up front, so concurrent workers migrate one at a time
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"[MIGRATE] Applied {version}: {description}")
+    return get_version(conn)
+
+
+def drop_all(conn: sqlite3.Connection):
+    """Drops every table (and with them, indexes and triggers) and resets the version."""
+    tables = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+    ]
+    for table in tables:
+        conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    """EXPLAIN QUERY PLAN details, one string per plan step."""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def check_query_plans(conn: sqlite3.Connection) -> list:
+    """
+    Runs EXPLAIN QUERY PLAN on HOT_QUERIES.
+
+    Returns:
+        List of (name, plan_lines, problems); a query passes when problems is empty
+    """
+    results = []
+    for name, sql, params, indexes, forbidden in HOT_QUERIES:
+        plan = explain(conn, sql, params)
+        text = "\n".join(plan)
+        problems = [f"does not use {index}" for index in indexes if index not in text]
+        problems += [f"plan has {step}" for step in forbidden if step in text]
+        results.append((name, plan, problems))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from movi.db import database_path, get_db
+
+    parser = argparse.ArgumentParser(description="Upgrade the Movi database schema")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN QUERY PLAN the hot queries")
+    args = parser.parse_args()
+
+    conn = get_db()
+    print(f"{database_path()}: schema version {get_version(conn)} -> {migrate(conn)}")
+    if args.check:
+        failed = 0
+        for name, plan, problems in check_query_plans(conn):
+            print(f"\n{'OK  ' if not problems else 'FAIL'} {name}")
+            for line in plan:
+                print(f"       {line}")
+            if problems:
+                failed += 1
+                print(f"       {'; '.join(problems)}")
+        conn.close()
+        raise SystemExit(1 if failed else 0)
+    conn.close()
@@ -0,0 +1,244 @@
+"""
+Table-versioned result cache for agent SELECT queries
+Entries are keyed on normalized SQL and remember the version of every
+table they read. The versions are the database-wide ones kept by
+triggers in TableVersions (movi/table_versions.py), so a write from any
+connection - another worker, the sqlite3 CLI, a migration - invalidates
+dependent entries on their next lookup. PRAGMA schema_version is part of
+every snapshot, so schema changes made elsewhere invalidate everything.
+
+The tables a statement reads come from SQLite itself: an authorizer
+callback (track_tables) records them while the statement is prepared, so
+comma joins, schema-qualified names, views and trigger writes are all
+seen. Results that read a table without a TableVersions row are not
+cached. Statements whose tables cannot be known (schema changes,
+ATTACH, ...) clear the cache in this process right away.
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from movi import table_versions
+from movi.metrics import register_collector
+
+MAX_ENTRIES = int(os.getenv("MOVI_QUERY_CACHE_ENTRIES", 512))
+# Results larger than this (in characters) are not cached
+MAX_RESULT_CHARS = int(os.getenv("MOVI_QUERY_CACHE_MAX_RESULT", 256 * 1024))
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+# Tables that triggers write when the key table changes
+DERIVED_TABLES = {
+    "paths": {"pathstops"},
+    "dailytrips": {"dashboardstats", "routestats", "changefeed"},
+    "deployments": {"dashboardstats", "changefeed"},
+    "vehicles": {"dashboardstats", "changefeed"},
+    "drivers": {"dashboardstats", "changefeed"},
+    "routes": {"changefeed"},
+}
+# Written only by triggers; direct writes through track_tables(read_only=...) are refused
+TRIGGER_MAINTAINED = frozenset().union(*DERIVED_TABLES.values(), {"tableversions"})
+# Results of these depend on more than table contents
+_VOLATILE_FUNCTIONS = {
+    "random", "randomblob", "datetime", "date", "time", "julianday", "unixepoch", "strftime",
+    "changes", "total_changes", "last_insert_rowid",
+}
+_WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+# Actions that neither read nor write table rows
+_NEUTRAL_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT,
+                    sqlite3.SQLITE_RECURSIVE}
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and case outside string literals and drop a trailing ';'."""
+    parts = _STRING_LITERAL.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = " ".join(parts[i].split()).lower()
+    return "".join(parts)
+
+
+class TableAccess:
+    """
+    sqlite3 authorizer callback recording what a statement touches as it is prepared.
+
+    Attributes:
+        reads: Tables read, including those behind views (lower-cased)
+        writes: Tables inserted into, updated or deleted from, including by triggers
+        volatile: The statement calls a function whose result changes between runs
+        uncertain: The statement does something else (schema change, ATTACH, PRAGMA, ...)
+        denied: Tables in read_only the statement tried to write directly
+    """
+
+    def __init__(self, read_only=()):
+        self.read_only = read_only
+        self.denied = set()
+        self.reads = set()
+        self.writes = set()
+        self.volatile = False
+        self.uncertain = False
+
+    def __call__(self, action, arg1, arg2, db_name, source):
+        if action == sqlite3.SQLITE_READ:
+            self.reads.add(arg1.lower())
+        elif action in _WRITE_ACTIONS:
+            table = arg1.lower()
+            # source names the trigger for writes made by one
+            if source is None and table in self.read_only:
+                self.denied.add(table)
+                return sqlite3.SQLITE_DENY
+            self.writes.add(table)
+        elif action == sqlite3.SQLITE_FUNCTION:
+            if arg2.lower() in _VOLATILE_FUNCTIONS:
+                self.volatile = True
+        elif action not in _NEUTRAL_ACTIONS:
+            self.uncertain = True
+        return sqlite3.SQLITE_OK
+
+
+@contextmanager
+def track_tables(conn: sqlite3.Connection, read_only=()):
+    """
+    Records the tables of the statements prepared on conn inside the block.
+    Statements writing directly to a table in read_only (lower-cased) fail
+    with "not authorized".
+
+    Setting an authorizer expires the connection's prepared statements, so
+    statements from sqlite3's statement cache are prepared again and seen too.
+
+    Yields:
+        TableAccess
+    """
+    access = TableAccess(read_only)
+    conn.set_authorizer(access)
+    try:
+        yield access
+    finally:
+        conn.set_authorizer(None)
+
+
+class QueryCache:
+    """LRU cache of query results invalidated by database table versions."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_result_chars: int = MAX_RESULT_CHARS):
+        self.max_entries = max_entries
+        self.max_result_chars = max_result_chars
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0, "uncacheable": 0}
+
+    @staticmethod
+    def _snapshot(tables, versions: dict, schema: int, generation: int) -> tuple:
+        return (generation, schema) + tuple(sorted((t, versions.get(t)) for t in tables))
+
+    def lookup(self, sql: str):
+        """
+        Look up a query.
+
+        Returns:
+            (result, token): result is the cached value or None on a miss.
+            On a miss, run the query under track_tables() and pass token to
+            store(); token is None if the query is not cacheable.
+        """
+        key = normalize_sql(sql)
+        if not key.startswith(("select", "with")):
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return None, None
+
+        # Taken before the query runs: a write landing while it runs moves
+        # the versions past the stored snapshot, so the entry is never served
+        versions = table_versions.current()
+        schema = table_versions.schema_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                tables, snapshot, result = entry
+                if self._snapshot(tables, versions, schema, self._generation) == snapshot:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return result, None
+                del self._entries[key]
+                self._stats["invalidations"] += 1
+            self._stats["misses"] += 1
+            return None, (key, versions, schema, self._generation)
+
+    def store(self, token: tuple, access: TableAccess, result: str) -> None:
+        """Cache a result computed after lookup() returned token, with the tables access recorded."""
+        if token is None:
+            return
+        key, versions, schema, generation = token
+        if (access.volatile or access.uncertain or access.writes or not access.reads
+                or not access.reads <= versions.keys() or len(result) > self.max_result_chars):
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return
+        tables = frozenset(access.reads)
+        with self._lock:
+            # The cache was cleared while the query ran
+            if self._generation != generation:
+                return
+            self._entries[key] = (tables, self._snapshot(tables, versions, schema, generation), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def bump(self, *tables: str) -> None:
+        """
+        Drop entries depending on tables now. With no tables, drop everything.
+
+        Not needed for correctness - lookups check the database versions -
+        but frees the memory of entries this process knows are stale.
+        """
+        with self._lock:
+            if not tables:
+                self._generation += 1
+                self._stats["invalidations"] += len(self._entries)
+                self._entries.clear()
+                return
+            tables = {table.lower() for table in tables}
+            for table in list(tables):
+                tables |= DERIVED_TABLES.get(table, set())
+            for key in [key for key, entry in self._entries.items() if entry[0] & tables]:
+                del self._entries[key]
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+query_cache = QueryCache()
+
+
+def _collect_metrics():
+    stats = query_cache.stats()
+    return [
+        ("movi_query_cache_events_total", "Agent query cache events since start", ("event",),
+         {(event,): stats[event] for event in ("hits", "misses", "invalidations", "evictions", "uncacheable")}),
+        ("movi_query_cache_entries", "Agent query cache entries", (), {(): stats["entries"]}),
+    ]
+
+
+register_collector(_collect_metrics)
+
+
+def bump_tables(*tables: str) -> None:
+    """Record a write to tables (all tables if none given)."""
+    query_cache.bump(*tables)
+
+
+def bump_for_access(access: TableAccess) -> None:
+    """Record the writes of a statement run under track_tables()."""
+    # Schema changes, or a write whose targets were not seen, invalidate everything
+    if access.uncertain or not access.writes:
+        query_cache.bump()
+    else:
+        query_cache.bump(*access.writes)
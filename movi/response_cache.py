@@ -0,0 +1,122 @@
+"""
+ETags and an in-process cache of serialized REST responses
+An endpoint's ETag is derived from the versions of the tables it reads,
+which triggers keep in the database (movi/table_versions.py), so it
+changes exactly when one of them is written - by the Flask write
+endpoints, agent writes, another worker or an external tool. Bodies are
+cached per URL against that ETag; a matching If-None-Match gets a 304
+without running the endpoint's queries.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from movi.metrics import register_collector
+from movi import table_versions
+
+MAX_ENTRIES = int(os.getenv("MOVI_RESPONSE_CACHE_ENTRIES", 256))
+# Bodies larger than this are served but not cached
+MAX_BODY_BYTES = int(os.getenv("MOVI_RESPONSE_CACHE_MAX_BODY", 4 * 1024 * 1024))
+MAX_TOTAL_BYTES = int(os.getenv("MOVI_RESPONSE_CACHE_BYTES", 64 * 1024 * 1024))
+
+# Bump when a response body changes for the same data, so old ETags stop matching
+ETAG_VERSION = 1
+
+
+class ResponseCache:
+    """LRU cache of response bodies keyed on URL and validated by ETag."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_body: int = MAX_BODY_BYTES,
+                 max_total: int = MAX_TOTAL_BYTES):
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self.max_total = max_total
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "not_modified": 0, "misses": 0, "evictions": 0, "uncacheable": 0}
+
+    def etag(self, key: str, tables) -> str:
+        """Strong ETag (unquoted) for key given the current versions of tables."""
+        versions = table_versions.current()
+        snapshot = tuple((table, versions.get(table.lower())) for table in tables)
+        if any(version is None for _, version in snapshot):
+            # Unversioned table: an ETag that never matches, so nothing is cached or revalidated
+            return uuid.uuid4().hex
+        schema = table_versions.user_version()
+        return hashlib.sha1(f"{ETAG_VERSION}|{schema}|{key}|{snapshot}".encode()).hexdigest()[:32]
+
+    def lookup(self, key: str, tables):
+        """
+        Returns:
+            (etag, body): the current ETag, and the cached body for it or None
+        """
+        etag = self.etag(key, tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                return etag, entry[1]
+            return etag, None
+
+    def record(self, event: str):
+        with self._lock:
+            self._stats[event] += 1
+
+    def store(self, key: str, tables, etag: str, body: bytes) -> None:
+        """Cache body under etag, unless a write landed since etag was computed."""
+        if len(body) > self.max_body:
+            self.record("uncacheable")
+            return
+        if self.etag(key, tables) != etag:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (etag, body)
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_total):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def capture(self, key: str, tables, etag: str, chunks):
+        """Pass a streamed body through, caching it once it completes."""
+        parts, size = [], 0
+        for chunk in chunks:
+            if parts is not None:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                size += len(data)
+                if size > self.max_body:
+                    parts = None
+                    self.record("uncacheable")
+                else:
+                    parts.append(data)
+            yield chunk
+        if parts is not None:
+            self.store(key, tables, etag, b"".join(parts))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def _collect_metrics():
+    stats = response_cache.stats()
+    return [
+        ("movi_response_cache_events_total", "REST response cache events since start", ("event",),
+         {(event,): stats[event] for event in ("hits", "not_modified", "misses", "evictions", "uncacheable")}),
+        ("movi_response_cache_bytes", "Bytes of cached REST response bodies", (), {(): stats["bytes"]}),
+    ]
+
+
+register_collector(_collect_metrics)
@@ -0,0 +1,161 @@
+"""
+Live schema introspection for Movi prompts
+Builds a compact schema description from PRAGMA table_info/foreign_key_list
+plus a few sample values, caches it per database file and rebuilds it
+whenever the schema changes (PRAGMA schema_version).
+Only PROMPT_TABLES are described; internal tables (dashboard statistics,
+the change feed) cost prompt tokens and are not the agent's to query or write.
+"""
+import os
+import sqlite3
+import threading
+
+from movi.db import get_read_db
+from movi.metrics import register_collector
+
+# Sample values shown for primary keys
+PK_SAMPLES = 2
+# Text columns with at most this many distinct values are listed as enums
+ENUM_MAX_DISTINCT = 6
+# Rows inspected when deciding if a column is enum-like
+ENUM_SCAN_ROWS = 1000
+
+# Tables described to the LLM, in prompt order
+PROMPT_TABLES = ("Stops", "Paths", "PathStops", "Routes", "Vehicles", "Drivers", "DailyTrips", "Deployments")
+
+# Semantic hints that can't be derived from the schema itself
+COLUMN_NOTES = {
+    ("Paths", "ordered_list_of_stop_ids"): "JSON array of stop_ids; query PathStops instead of LIKE",
+    ("PathStops", "seq"): "0-based position; read-only, maintained from Paths by triggers",
+    ("DailyTrips", "booking_status_percentage"): "0-100",
+    ("Deployments", "vehicle_id"): "NULL = no vehicle assigned",
+    ("Deployments", "driver_id"): "NULL = no driver assigned",
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+_stats = {"builds": 0, "prompt_uses": 0, "prompt_tokens_sent": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt accounting (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    return get_read_db(db_path)
+
+
+def _quote(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def _describe_table(conn: sqlite3.Connection, table: str) -> str:
+    columns = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    foreign_keys = {
+        row[3]: f"{row[2]}.{row[4]}"
+        for row in conn.execute(f'PRAGMA foreign_key_list("{table}")').fetchall()
+    }
+
+    parts = []
+    for _, name, col_type, notnull, _, pk in columns:
+        desc = f"{name} {col_type or 'ANY'}"
+        if pk:
+            desc += " PK"
+            samples = conn.execute(
+                f'SELECT "{name}" FROM "{table}" ORDER BY "{name}" LIMIT ?', (PK_SAMPLES,)
+            ).fetchall()
+            if samples:
+                desc += " e.g. " + ",".join(_quote(row[0]) for row in samples)
+        elif name in foreign_keys:
+            desc += f" -> {foreign_keys[name]}"
+            if not notnull:
+                desc += " nullable"
+        elif (col_type or "").upper() == "TEXT":
+            values = conn.execute(
+                f'SELECT DISTINCT "{name}" FROM (SELECT "{name}" FROM "{table}" LIMIT ?) '
+                f'WHERE "{name}" IS NOT NULL LIMIT ?',
+                (ENUM_SCAN_ROWS, ENUM_MAX_DISTINCT + 1)
+            ).fetchall()
+            if 0 < len(values) <= ENUM_MAX_DISTINCT and name not in ("name", "display_name"):
+                desc += " in (" + ",".join(_quote(row[0]) for row in values) + ")"
+
+        note = COLUMN_NOTES.get((table, name))
+        if note:
+            desc += f" [{note}]"
+        parts.append(desc)
+
+    return f"{table}({', '.join(parts)})"
+
+
+def _build(conn: sqlite3.Connection) -> str:
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    tables = [table for table in PROMPT_TABLES if table in existing]
+    lines = ["DATABASE SCHEMA (SQLite):"]
+    lines.extend(_describe_table(conn, table) for table in tables)
+    return "\n".join(lines)
+
+
+def _get_entry(db_path: str) -> dict:
+    key = os.path.abspath(db_path)
+    conn = _connect(key)
+    try:
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        entry = _cache.get(key)
+        if entry and entry["schema_version"] == version:
+            return entry
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry and entry["schema_version"] == version:
+                return entry
+            text = _build(conn)
+            entry = {
+                "schema_version": version,
+                "text": text,
+                "tokens": estimate_tokens(text),
+            }
+            _cache[key] = entry
+            _stats["builds"] += 1
+            print(f"[SCHEMA] Built schema for {key} (~{entry['tokens']} tokens)")
+            return entry
+    finally:
+        conn.close()
+
+
+def get_schema_text(db_path: str) -> str:
+    """
+    Returns the compact schema description for a database file.
+    Counts as one prompt use for token accounting.
+    """
+    entry = _get_entry(db_path)
+    _stats["prompt_uses"] += 1
+    _stats["prompt_tokens_sent"] += entry["tokens"]
+    return entry["text"]
+
+
+def get_schema_stats(db_path: str = None) -> dict:
+    """
+    Returns schema prompt accounting.
+
+    Args:
+        db_path: If given, also reports the current schema's token count
+
+    Returns:
+        Dict with build/use counters and, optionally, schema_tokens
+    """
+    stats = dict(_stats)
+    if db_path:
+        stats["schema_tokens"] = _get_entry(db_path)["tokens"]
+    return stats
+
+
+def _collect_metrics():
+    return [
+        ("movi_schema_prompt_total", "Schema prompt builds, uses and estimated tokens sent", ("counter",),
+         {(key,): value for key, value in _stats.items()}),
+    ]
+
+
+register_collector(_collect_metrics)
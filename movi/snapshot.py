@@ -0,0 +1,184 @@
+"""
+Point-in-time database snapshots for /api/export/db
+A snapshot is taken with SQLite's online backup API in one step, which
+reads a single consistent WAL snapshot without blocking writers, then
+gzip-compressed to a file that send_file() can serve with Range and
+conditional-request support.
+
+Snapshots are reused until the database changes. A dedicated read-only
+connection watches PRAGMA data_version, which moves whenever any other
+connection - in this process or not - commits a write. A change starts a
+rebuild on a background thread; requests keep getting the previous
+snapshot until it is ready, so none of them waits on the copy or gzip.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from movi.db import database_path
+from movi.metrics import register_collector
+
+SNAPSHOT_DIR = os.getenv("MOVI_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "movi-snapshots"))
+GZIP_LEVEL = int(os.getenv("MOVI_SNAPSHOT_GZIP_LEVEL", 6))
+_COPY_CHUNK = 1024 * 1024
+
+
+class Snapshot:
+    """One exported snapshot: the raw copy, its gzip and a strong ETag of the gzip."""
+
+    def __init__(self, db_path: str, version: int, raw_path: str, gzip_path: str, etag: str):
+        self.db_path = db_path
+        self.version = version
+        self.raw_path = raw_path
+        self.gzip_path = gzip_path
+        self.etag = etag
+        self.created = time.time()
+
+    def remove(self):
+        for path in (self.raw_path, self.gzip_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_lock = threading.Lock()
+_watch = None
+_watch_path = None
+_current = None
+# Kept one generation longer: a request may still be about to open it
+_previous = None
+# Thread building the next snapshot, if any
+_builder = None
+_stats = {"built": 0, "reused": 0, "stale": 0, "failed": 0, "build_seconds": 0.0, "gzip_bytes": 0,
+          "raw_bytes": 0}
+
+
+def _data_version(db_path: str) -> int:
+    global _watch, _watch_path
+    if _watch is None or _watch_path != db_path:
+        if _watch is not None:
+            _watch.close()
+        _watch = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                 check_same_thread=False)
+        _watch_path = db_path
+    return _watch.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _build(db_path: str, version: int) -> Snapshot:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    base = os.path.join(SNAPSHOT_DIR, f"{Path(db_path).stem}-{uuid.uuid4().hex[:12]}")
+    raw_path, gzip_path = base + ".db", base + ".db.gz"
+
+    # Its own connection: the watch connection keeps answering requests meanwhile
+    src = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    dest = sqlite3.connect(raw_path)
+    try:
+        # pages=-1 copies everything inside one read transaction - a consistent snapshot
+        # that never restarts, however busy the writers are
+        src.backup(dest, pages=-1)
+        # Snapshot files are standalone: no WAL to ship alongside
+        dest.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dest.close()
+        src.close()
+
+    digest = hashlib.sha1()
+    with open(raw_path, "rb") as src, open(gzip_path, "wb") as out:
+        # mtime=0 keeps identical snapshots byte-identical
+        with gzip.GzipFile(filename="moveinsync.db", mode="wb", fileobj=out,
+                           compresslevel=GZIP_LEVEL, mtime=0) as gz:
+            shutil.copyfileobj(src, gz, _COPY_CHUNK)
+    with open(gzip_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_COPY_CHUNK), b""):
+            digest.update(chunk)
+    return Snapshot(db_path, version, raw_path, gzip_path, digest.hexdigest())
+
+
+def _rebuild(db_path: str, version: int) -> None:
+    """Builds the next snapshot and makes it current (runs on _builder)."""
+    global _current, _previous, _builder
+    start = time.perf_counter()
+    try:
+        snapshot = _build(db_path, version)
+    except Exception as e:
+        print(f"[SNAPSHOT] Build failed: {e}")
+        with _lock:
+            _stats["failed"] += 1
+            _builder = None
+        return
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _stats["built"] += 1
+        _stats["build_seconds"] += elapsed
+        _stats["raw_bytes"] = os.path.getsize(snapshot.raw_path)
+        _stats["gzip_bytes"] = os.path.getsize(snapshot.gzip_path)
+        stale, _previous, _current = _previous, _current, snapshot
+        _builder = None
+    print(f"[SNAPSHOT] {db_path}: {_stats['raw_bytes'] / 1e6:.1f} MB -> "
+          f"{_stats['gzip_bytes'] / 1e6:.1f} MB gzip in {elapsed:.2f}s")
+
+    # Downloads still streaming it keep their open handles (POSIX)
+    if stale is not None:
+        stale.remove()
+
+
+def get_snapshot(db_path: str = None) -> Optional[Snapshot]:
+    """
+    Returns the latest snapshot of the database. If the database changed
+    since, a rebuild starts in the background and the previous snapshot is
+    returned until it is ready.
+
+    Args:
+        db_path: Database to snapshot (default: the configured one)
+
+    Returns:
+        The snapshot, or None while the first one is being built
+    """
+    global _builder
+    db_path = db_path or database_path()
+    with _lock:
+        # Read before copying: a write landing mid-build makes the next call rebuild
+        version = _data_version(db_path)
+        current = _current
+        if current is not None and (current.db_path != db_path or not os.path.exists(current.gzip_path)):
+            current = None
+        if current is not None and current.version == version:
+            _stats["reused"] += 1
+            return current
+
+        if _builder is None:
+            _builder = threading.Thread(target=_rebuild, args=(db_path, version), name="movi-snapshot",
+                                        daemon=True)
+            _builder.start()
+        if current is not None:
+            _stats["stale"] += 1
+        return current
+
+
+def snapshot_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+def _collect_metrics():
+    stats = snapshot_stats()
+    return [
+        ("movi_snapshot_builds_total", "Database export snapshots since start", ("event",),
+         {(event,): stats[event] for event in ("built", "reused", "stale", "failed")}),
+        ("movi_snapshot_build_seconds_total", "Time spent building export snapshots", (),
+         {(): stats["build_seconds"]}),
+        ("movi_snapshot_bytes", "Size of the current export snapshot", ("encoding",),
+         {("identity",): stats["raw_bytes"], ("gzip",): stats["gzip_bytes"]}),
+    ]
+
+
+register_collector(_collect_metrics)
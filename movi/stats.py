@@ -0,0 +1,144 @@
+"""
+Materialized dashboard statistics
+DashboardStats (one row, id = 1) and RouteStats (one row per route with
+trips) are kept up to date by triggers on DailyTrips, Deployments,
+Vehicles and Drivers (migration 5), so /api/stats is a primary-key read
+instead of a scan per counter.
+
+Definitions, as recompute() evaluates them from the base tables:
+  - a trip is assigned when a deployment for it has a vehicle
+  - a vehicle / driver is deployed when any deployment references it
+  - a route's average booking is over its DailyTrips rows
+
+Check or repair from the project root:
+    python -m movi.stats            # compare against a full recompute
+    python -m movi.stats --repair   # rebuild from the base tables
+"""
+import sqlite3
+
+TOTAL_COLUMNS = (
+    "total_trips", "assigned_trips",
+    "total_vehicles", "deployed_vehicles",
+    "total_drivers", "deployed_drivers",
+)
+
+_RECOMPUTE_TOTALS = '''
+    SELECT
+        (SELECT COUNT(*) FROM DailyTrips),
+        (SELECT COUNT(*) FROM DailyTrips t WHERE EXISTS (
+            SELECT 1 FROM Deployments d WHERE d.trip_id = t.trip_id AND d.vehicle_id IS NOT NULL)),
+        (SELECT COUNT(*) FROM Vehicles),
+        (SELECT COUNT(*) FROM Vehicles v WHERE EXISTS (
+            SELECT 1 FROM Deployments d WHERE d.vehicle_id = v.vehicle_id)),
+        (SELECT COUNT(*) FROM Drivers),
+        (SELECT COUNT(*) FROM Drivers dr WHERE EXISTS (
+            SELECT 1 FROM Deployments d WHERE d.driver_id = dr.driver_id))
+'''
+
+_RECOMPUTE_ROUTES = '''
+    SELECT route_id, COUNT(*), SUM(booking_status_percentage)
+    FROM DailyTrips
+    GROUP BY route_id
+    ORDER BY route_id
+'''
+
+
+def _format(totals: dict, routes) -> dict:
+    return {
+        "total_trips": totals["total_trips"],
+        "assigned_trips": totals["assigned_trips"],
+        "unassigned_trips": totals["total_trips"] - totals["assigned_trips"],
+        "total_vehicles": totals["total_vehicles"],
+        "deployed_vehicles": totals["deployed_vehicles"],
+        "idle_vehicles": totals["total_vehicles"] - totals["deployed_vehicles"],
+        "total_drivers": totals["total_drivers"],
+        "deployed_drivers": totals["deployed_drivers"],
+        "idle_drivers": totals["total_drivers"] - totals["deployed_drivers"],
+        "routes": [
+            {
+                "route_id": route_id,
+                "trips": trips,
+                "avg_booking_percentage": round(booking_total / trips, 1) if trips else None,
+            }
+            for route_id, trips, booking_total in routes
+        ],
+    }
+
+
+def read_stats(conn: sqlite3.Connection) -> dict:
+    """Dashboard statistics from the materialized tables."""
+    row = conn.execute(
+        f'SELECT {", ".join(TOTAL_COLUMNS)} FROM DashboardStats WHERE id = 1'
+    ).fetchone()
+    totals = dict(zip(TOTAL_COLUMNS, row)) if row else dict.fromkeys(TOTAL_COLUMNS, 0)
+    routes = conn.execute(
+        'SELECT route_id, trips, booking_total FROM RouteStats ORDER BY route_id'
+    ).fetchall()
+    return _format(totals, [tuple(r) for r in routes])
+
+
+def recompute(conn: sqlite3.Connection) -> dict:
+    """Dashboard statistics computed from the base tables (full scans)."""
+    totals = dict(zip(TOTAL_COLUMNS, conn.execute(_RECOMPUTE_TOTALS).fetchone()))
+    routes = [tuple(r) for r in conn.execute(_RECOMPUTE_ROUTES).fetchall()]
+    return _format(totals, routes)
+
+
+def check_stats(conn: sqlite3.Connection) -> list:
+    """
+    Compares the materialized statistics against a full recompute.
+
+    Returns:
+        List of human-readable mismatches; empty when consistent
+    """
+    conn.execute('BEGIN')
+    try:
+        stored, actual = read_stats(conn), recompute(conn)
+    finally:
+        conn.rollback()
+
+    problems = [
+        f"{key}: stored {stored[key]}, actual {actual[key]}"
+        for key in stored if key != "routes" and stored[key] != actual[key]
+    ]
+    stored_routes = {r["route_id"]: r for r in stored["routes"]}
+    actual_routes = {r["route_id"]: r for r in actual["routes"]}
+    for route_id in sorted(stored_routes.keys() | actual_routes.keys(), key=str):
+        if stored_routes.get(route_id) != actual_routes.get(route_id):
+            problems.append(f"route {route_id}: stored {stored_routes.get(route_id)}, "
+                            f"actual {actual_routes.get(route_id)}")
+    return problems
+
+
+def rebuild_stats(conn: sqlite3.Connection) -> None:
+    """Refills DashboardStats and RouteStats from the base tables (caller commits)."""
+    conn.execute('DELETE FROM DashboardStats')
+    conn.execute(
+        f'INSERT INTO DashboardStats (id, {", ".join(TOTAL_COLUMNS)}) SELECT 1, * FROM ({_RECOMPUTE_TOTALS})'
+    )
+    conn.execute('DELETE FROM RouteStats')
+    conn.execute(f'INSERT INTO RouteStats (route_id, trips, booking_total) {_RECOMPUTE_ROUTES}')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from movi.db import database_path, get_db
+
+    parser = argparse.ArgumentParser(description="Check the materialized dashboard statistics")
+    parser.add_argument("--repair", action="store_true", help="Rebuild them from the base tables")
+    args = parser.parse_args()
+
+    conn = get_db()
+    problems = check_stats(conn)
+    print(f"{database_path()}: {'consistent' if not problems else f'{len(problems)} mismatch(es)'}")
+    for problem in problems:
+        print(f"  {problem}")
+    if problems and args.repair:
+        conn.execute('BEGIN IMMEDIATE')
+        rebuild_stats(conn)
+        conn.commit()
+        print("Rebuilt from the base tables")
+        problems = []
+    conn.close()
+    raise SystemExit(1 if problems else 0)
@@ -0,0 +1,90 @@
+"""
+Database-wide table versions
+TableVersions (migration 7) holds one counter per table, moved by
+triggers on every insert, update and delete - whichever connection,
+worker process or external tool makes the write.
+
+current() reads it through a dedicated read-only connection and only
+re-reads it when that connection's PRAGMA data_version shows another
+connection has committed since, so an unchanged database costs one PRAGMA.
+schema_version() and user_version() are read on the same refresh, for
+callers that also need to notice schema changes or migrations made
+elsewhere (another worker, the sqlite3 CLI).
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from movi.db import database_path
+
+_lock = threading.Lock()
+_watch = None
+_watch_path = None
+_data_version = None
+_versions = {}
+_schema_version = None
+_user_version = None
+
+
+def _refresh(db_path: str) -> None:
+    """Re-read the versions if another connection committed. Call with _lock held."""
+    global _watch, _watch_path, _data_version, _versions, _schema_version, _user_version
+    path = os.path.abspath(db_path or database_path())
+    if _watch is None or _watch_path != path:
+        if _watch is not None:
+            _watch.close()
+        _watch = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True,
+                                 check_same_thread=False)
+        _watch_path, _data_version, _versions, _schema_version, _user_version = path, None, {}, None, None
+    data_version = _watch.execute("PRAGMA data_version").fetchone()[0]
+    if data_version != _data_version:
+        _schema_version = _watch.execute("PRAGMA schema_version").fetchone()[0]
+        _user_version = _watch.execute("PRAGMA user_version").fetchone()[0]
+        try:
+            rows = _watch.execute("SELECT name, version FROM TableVersions").fetchall()
+        except sqlite3.OperationalError:
+            # Not migrated yet
+            _versions = {}
+            return
+        _versions = {name.lower(): version for name, version in rows}
+        _data_version = data_version
+
+
+def current(db_path: str = None) -> dict:
+    """
+    Current table versions.
+
+    Args:
+        db_path: Database file, defaults to the configured one
+
+    Returns:
+        Lower-cased table name -> version ({} before migration 7)
+    """
+    with _lock:
+        _refresh(db_path)
+        return _versions
+
+
+def schema_version(db_path: str = None) -> int:
+    """
+    Current PRAGMA schema_version, bumped by SQLite on every schema change.
+
+    Args:
+        db_path: Database file, defaults to the configured one
+    """
+    with _lock:
+        _refresh(db_path)
+        return _schema_version
+
+
+def user_version(db_path: str = None) -> int:
+    """
+    Current PRAGMA user_version, the migration the database is at.
+
+    Args:
+        db_path: Database file, defaults to the configured one
+    """
+    with _lock:
+        _refresh(db_path)
+        return _user_version
@@ -0,0 +1,87 @@
+"""
+Concurrent tool execution for the agent's tool nodes
+Runs the tool calls of one AIMessage on a shared thread pool when they are
+all read-only, so a multi-query consequence check takes about as long as
+its slowest query. Results come back in the original call order, each
+with its execution time in response_metadata["elapsed_ms"].
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import ToolMessage
+
+from movi.metrics import NODE_DURATION
+
+TOOL_PARALLELISM = int(os.getenv("MOVI_TOOL_PARALLELISM", 4))
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TOOL_PARALLELISM, thread_name_prefix="movi-tool")
+    return _executor
+
+
+def _run_call(tools_by_name: dict, call: dict) -> ToolMessage:
+    start = time.perf_counter()
+    name = call["name"]
+    tool = tools_by_name.get(name)
+    if tool is None:
+        content = f"Error: {name} is not a valid tool, try one of {list(tools_by_name)}."
+        status = "error"
+    else:
+        try:
+            content = tool.invoke(call["args"])
+            status = "success"
+        except Exception as e:
+            content = f"Error: {e}"
+            status = "error"
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"[TOOLS] {name} finished in {elapsed_ms:.1f}ms")
+    return ToolMessage(
+        content=content if isinstance(content, str) else str(content),
+        name=name,
+        tool_call_id=call["id"],
+        status=status,
+        response_metadata={"elapsed_ms": round(elapsed_ms, 2)},
+    )
+
+
+def make_tool_node(tools: list, read_only: set, name: str = "tools"):
+    """
+    Build a graph node that executes the tool calls of the last AIMessage.
+
+    Args:
+        tools: Tools the node may call
+        read_only: Names of tools that are safe to run concurrently
+        name: Node name used for metrics
+
+    Returns:
+        Node function returning {"messages": [ToolMessage, ...]}
+    """
+    tools_by_name = {t.name: t for t in tools}
+
+    def tool_node(state) -> dict:
+        with NODE_DURATION.time(node=name):
+            return _run_tool_calls(state)
+
+    def _run_tool_calls(state) -> dict:
+        message = state["messages"][-1]
+        calls = getattr(message, "tool_calls", None) or []
+        if not calls:
+            return {"messages": []}
+
+        # Writes keep their sequential, in-order semantics
+        if len(calls) == 1 or any(call["name"] not in read_only for call in calls):
+            results = [_run_call(tools_by_name, call) for call in calls]
+        else:
+            start = time.perf_counter()
+            results = list(_get_executor().map(lambda call: _run_call(tools_by_name, call), calls))
+            print(f"[TOOLS] {len(calls)} calls ran concurrently in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        return {"messages": results}
+
+    return tool_node
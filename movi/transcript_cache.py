@@ -0,0 +1,223 @@
+"""
+Transcription cache
+Transcripts are keyed on a hash of the decoded 16 kHz samples plus the
+model and decode options, so a retried upload or a replayed clip skips
+Whisper entirely - even when the container bytes differ.
+
+Two tiers:
+  - memory: LRU of MOVI_ASR_CACHE_ENTRIES transcripts
+  - disk (optional, MOVI_ASR_CACHE_DIR): one small file per transcript,
+    shared by every process on the host and kept under
+    MOVI_ASR_CACHE_DISK_MB by evicting the least recently used files
+Concurrent requests for the same clip share one transcription.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from movi.metrics import register_collector
+
+MAX_ENTRIES = int(os.getenv("MOVI_ASR_CACHE_ENTRIES", 1024))
+DISK_DIR = os.getenv("MOVI_ASR_CACHE_DIR", "")
+DISK_MAX_BYTES = int(float(os.getenv("MOVI_ASR_CACHE_DISK_MB", 64)) * 1024 * 1024)
+# Eviction trims the disk tier to this share of its limit, so it does not run on every write
+_DISK_LOW_WATER = 0.9
+
+
+def cache_key(samples, model: str, options: dict = None) -> str:
+    """Key for decoded float32 samples transcribed by model with options."""
+    digest = hashlib.sha256(samples.tobytes())
+    digest.update(f"|{model}|{json.dumps(options or {}, sort_keys=True)}".encode())
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Args:
+        max_entries: Transcripts kept in memory (0 disables the memory tier)
+        disk_dir: Directory of the disk tier ("" disables it)
+        disk_max_bytes: Size limit of the disk tier
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, disk_dir: str = DISK_DIR,
+                 disk_max_bytes: int = DISK_MAX_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"hit_memory": 0, "hit_disk": 0, "miss": 0, "shared": 0, "evicted_disk": 0}
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(disk_dir)
+                                   if entry.name.endswith(".txt"))
+
+    # Memory tier
+
+    def _remember(self, key, text):
+        # Caller holds self._lock
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.txt")
+
+    def _disk_get(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            # mtime is the recency the eviction goes by
+            os.utime(path)
+            return text
+        except OSError:
+            return None
+
+    def _disk_put(self, key, text):
+        data = text.encode("utf-8")
+        path = self._disk_path(key)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Rewriting a key (another process got there first) replaces a file already counted
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[ASR-CACHE] Could not write {key[:12]}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - replaced
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".txt"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * _DISK_LOW_WATER
+        evicted = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["evicted_disk"] += evicted
+
+    # Lookups
+
+    def get(self, key: str):
+        """Cached transcript for key, or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hit_memory"] += 1
+                return self._entries[key]
+        if self.disk_dir:
+            text = self._disk_get(key)
+            if text is not None:
+                with self._lock:
+                    self._stats["hit_disk"] += 1
+                    self._remember(key, text)
+                return text
+        return None
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._remember(key, text)
+        if self.disk_dir:
+            self._disk_put(key, text)
+
+    def get_or_compute(self, key: str, compute) -> str:
+        """
+        Cached transcript for key; on a miss, compute() is run once and its
+        result stored, with concurrent callers for the same key waiting for it.
+        Exceptions from compute() propagate to every waiting caller and nothing is stored.
+        """
+        text = self.get(key)
+        if text is not None:
+            return text
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self._stats["miss"] += 1
+            else:
+                self._stats["shared"] += 1
+        if not owner:
+            return future.result()
+        try:
+            text = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, text)
+            future.set_result(text)
+            return text
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["hit_memory"] + stats["hit_disk"] + stats["shared"] + stats["miss"]
+        stats["hit_rate"] = round((lookups - stats["miss"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+transcript_cache = TranscriptCache()
+
+
+def _collect_metrics():
+    stats = transcript_cache.stats()
+    return [
+        ("movi_asr_cache_lookups_total", "Transcription cache lookups by outcome", ("result",),
+         {(result,): stats[result] for result in ("hit_memory", "hit_disk", "shared", "miss")}),
+        ("movi_asr_cache_evictions_total", "Transcripts evicted from the disk tier", (),
+         {(): stats["evicted_disk"]}),
+        ("movi_asr_cache_entries", "Transcripts in the memory tier", (), {(): stats["entries"]}),
+        ("movi_asr_cache_disk_bytes", "Size of the disk tier", (), {(): stats["disk_bytes"]}),
+        ("movi_asr_cache_hit_rate", "Share of lookups answered without running Whisper", (),
+         {(): stats["hit_rate"]}),
+    ]
+
+
+register_collector(_collect_metrics)
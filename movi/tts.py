@@ -5,6 +5,8 @@ Generates audio from text for Movi's responses
 import os
 import tempfile
 
+from movi.metrics import TTS_DURATION
+
 try:
     import pyttsx3
     PYTTSX3_AVAILABLE = True
@@ -80,8 +82,9 @@ def text_to_speech(text: str, output_path: str = None) -> str:
                 fd, output_path = tempfile.mkstemp(suffix='.wav')
                 os.close(fd)
             
-            engine.save_to_file(text, output_path)
-            engine.runAndWait()
+            with TTS_DURATION.time():
+                engine.save_to_file(text, output_path)
+                engine.runAndWait()
             
             print(f"[TTS] Generated audio file: {output_path}")
             return output_path
@@ -92,8 +95,9 @@ def text_to_speech(text: str, output_path: str = None) -> str:
                 fd, output_path = tempfile.mkstemp(suffix='.mp3')
                 os.close(fd)
             
-            tts = gTTS(text=text, lang='en', slow=False)
-            tts.save(output_path)
+            with TTS_DURATION.time():
+                tts = gTTS(text=text, lang='en', slow=False)
+                tts.save(output_path)
             
             print(f"[TTS] Generated audio file: {output_path}")
             return output_path
@@ -0,0 +1,116 @@
+"""
+Startup warm-up and readiness
+Loads what the first voice/chat request would otherwise wait for - the
+agent graph (langgraph, langchain_google_genai), Whisper and the TTS
+engine - in background threads when the server starts, and runs one
+dummy transcription and synthesis. /api/health/ready reports each
+component and answers 503 until the required ones are warm, so a load
+balancer only sends traffic to warm instances.
+
+Set MOVI_WARMUP=0 to skip it; components then load on first use and
+report "skipped".
+"""
+import os
+import threading
+import time
+
+from movi.metrics import register_collector
+
+ENABLED = os.getenv("MOVI_WARMUP", "1") != "0"
+# Components that must be warm before the instance reports ready; TTS is optional
+REQUIRED = {c.strip() for c in os.getenv("MOVI_WARMUP_REQUIRED", "chat,asr").split(",") if c.strip()}
+# "unavailable": the dependency is not installed, so there is nothing to wait for
+_DONE = ("ready", "unavailable", "skipped")
+
+
+class _Unavailable(Exception):
+    pass
+
+
+def _warm_chat():
+    from movi.chat import get_graph
+    get_graph()
+
+
+def _warm_asr():
+    try:
+        from movi.asr import warm_up
+    except ImportError as e:
+        raise _Unavailable(e)
+    warm_up()
+
+
+def _warm_tts():
+    from movi.tts import get_tts_engine, text_to_speech
+    if get_tts_engine() is None:
+        raise _Unavailable("no TTS engine installed")
+    path = text_to_speech("Ready.")
+    if path is None:
+        raise RuntimeError("dummy synthesis produced no audio")
+    os.remove(path)
+
+
+COMPONENTS = {"chat": _warm_chat, "asr": _warm_asr, "tts": _warm_tts}
+
+_state = {name: {"status": "pending", "seconds": None, "error": None} for name in COMPONENTS}
+_lock = threading.Lock()
+_started = False
+
+
+def _run(name, warm):
+    with _lock:
+        _state[name]["status"] = "loading"
+    start = time.perf_counter()
+    status, error = "ready", None
+    try:
+        warm()
+    except _Unavailable as e:
+        status, error = "unavailable", str(e)
+    except Exception as e:
+        status, error = "failed", str(e)
+    seconds = round(time.perf_counter() - start, 3)
+    with _lock:
+        _state[name].update(status=status, seconds=seconds, error=error)
+    print(f"[WARMUP] {name}: {status} in {seconds:.1f}s" + (f" ({error})" if error else ""))
+
+
+def start_warmup():
+    """Starts warming every component in the background (once per process)."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+        if not ENABLED:
+            for state in _state.values():
+                state["status"] = "skipped"
+            return
+    print(f"[WARMUP] Warming up {', '.join(COMPONENTS)} in the background")
+    for name, warm in COMPONENTS.items():
+        threading.Thread(target=_run, args=(name, warm), name=f"movi-warmup-{name}", daemon=True).start()
+
+
+def readiness() -> dict:
+    """
+    Returns:
+        {"ready": bool, "components": {name: {"status", "seconds", "error", "required"}}}
+        status is pending, loading, ready, failed, unavailable or skipped
+    """
+    with _lock:
+        components = {name: dict(state, required=name in REQUIRED) for name, state in _state.items()}
+    ready = _started and all(
+        state["status"] in _DONE for state in components.values() if state["required"]
+    )
+    return {"ready": ready, "components": components}
+
+
+def _collect_metrics():
+    with _lock:
+        loaded = {(name,): state["seconds"] for name, state in _state.items() if state["seconds"] is not None}
+    return [
+        ("movi_warmup_seconds", "Time to warm each component at startup", ("component",), loaded),
+        ("movi_ready", "1 once the required components are warm", (), {(): int(readiness()["ready"])}),
+    ]
+
+
+register_collector(_collect_metrics)
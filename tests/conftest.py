@@ -0,0 +1,106 @@
+"""
+Shared fixtures
+Each test gets its own database file, upgraded to the latest schema and
+selected with movi.db.set_database(), so the app, the agent tools and
+the helpers under test all go through the same pooled connections.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movi import db  # noqa: E402
+from movi.migrations import migrate  # noqa: E402
+
+STOPS = [
+    ('S001', 'Tech Park Gate 1', 12.9352, 77.6245),
+    ('S002', 'Whitefield Main', 12.9698, 77.7499),
+    ('S003', 'Electronic City Phase 1', 12.8456, 77.6603),
+    ('S004', 'Marathahalli Junction', 12.9591, 77.6974),
+    ('S005', 'Silk Board', 12.9165, 77.6229),
+    ('S006', 'Koramangala', 12.9352, 77.6245),
+]
+PATHS = [
+    ('P001', 'North Corridor Route', '["S001", "S002", "S004", "S003"]'),
+    ('P002', 'South Corridor Route', '["S005", "S006"]'),
+]
+ROUTES = [
+    ('R001', 'P001', 'North Corridor - Morning Shift', '08:00 AM', 'Inbound', 'Tech Park Gate 1',
+     'Electronic City Phase 1', 45, 5, 'active'),
+    ('R002', 'P002', 'South Corridor - Evening Shift', '06:00 PM', 'Outbound', 'Silk Board', 'Koramangala',
+     40, 5, 'active'),
+    ('R003', 'P001', 'North Corridor - Night Shift', '10:00 PM', 'Inbound', 'Tech Park Gate 1',
+     'Electronic City Phase 1', 30, 3, 'deactivated'),
+]
+VEHICLES = [
+    ('V001', 'KA-01-AB-1234', 'Bus', 45),
+    ('V002', 'KA-02-CD-5678', 'Bus', 45),
+    ('V003', 'KA-03-EF-9012', 'Bus', 40),
+    ('V004', 'KA-05-IJ-7890', 'Cab', 4),
+]
+DRIVERS = [
+    ('D001', 'Rajesh Kumar', '+91-9876543210'),
+    ('D002', 'Amit Singh', '+91-9876543211'),
+    ('D003', 'Priya Sharma', '+91-9876543212'),
+    ('D004', 'Vijay Reddy', '+91-9876543213'),
+]
+DAILY_TRIPS = [
+    ('T001', 'R001', 'North Corridor - Morning Shift - Trip 1', 85, '00:15 IN'),
+    ('T002', 'R002', 'South Corridor - Evening Shift - Trip 1', 92, 'Scheduled'),
+    ('T003', 'R001', 'North Corridor - Morning Shift - Trip 2', 78, '00:45 IN'),
+    ('T004', 'R002', 'South Corridor - Evening Shift - Trip 2', 30, 'Scheduled'),
+]
+DEPLOYMENTS = [
+    ('DP001', 'T001', 'V001', 'D001'),
+    ('DP002', 'T002', 'V002', 'D002'),
+    ('DP003', 'T003', None, None),
+    ('DP004', 'T004', None, None),
+]
+
+
+def seed(conn):
+    """Inserts the fixture rows above."""
+    conn.executemany('INSERT INTO Stops VALUES (?, ?, ?, ?)', STOPS)
+    conn.executemany('INSERT INTO Paths VALUES (?, ?, ?)', PATHS)
+    conn.executemany('INSERT INTO Routes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', ROUTES)
+    conn.executemany('INSERT INTO Vehicles VALUES (?, ?, ?, ?)', VEHICLES)
+    conn.executemany('INSERT INTO Drivers VALUES (?, ?, ?)', DRIVERS)
+    conn.executemany('INSERT INTO DailyTrips VALUES (?, ?, ?, ?, ?)', DAILY_TRIPS)
+    conn.executemany('INSERT INTO Deployments VALUES (?, ?, ?, ?)', DEPLOYMENTS)
+    conn.commit()
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Path of an empty database at the latest schema version, selected for the test."""
+    previous = db.database_path()
+    path = str(tmp_path / "movi.db")
+    db.set_database(path)
+    conn = db.get_db()
+    migrate(conn)
+    conn.close()
+    yield path
+    db.set_database(previous)
+
+
+@pytest.fixture
+def seeded(database):
+    """Like database, with the fixture rows inserted."""
+    conn = db.get_db()
+    seed(conn)
+    conn.close()
+    return database
+
+
+@pytest.fixture
+def client(seeded):
+    """Flask test client for app.py, serving the seeded database."""
+    pytest.importorskip("flask")
+    import app
+    from movi.query_cache import bump_tables
+
+    # Caches are per process and keyed on table versions, not on the database file
+    bump_tables()
+    return app.app.test_client()
@@ -0,0 +1,64 @@
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from movi.asr_pool import ASRBusy, ASRPool
+
+
+class _Process:
+    exitcode = -9
+
+    def __init__(self, alive):
+        self.alive = alive
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.alive = False
+
+
+@pytest.fixture
+def pool():
+    # No worker processes: jobs stay queued, and the tests play the worker's part
+    pool = ASRPool(workers=0, queue_size=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_timeout_fails_the_job_and_frees_its_slot(pool):
+    with pytest.raises(TimeoutError):
+        pool.transcribe(b"audio", timeout=0.05)
+    assert pool.stats()["pending"] == 0 and pool.stats()["failed"] == 1
+    # The single queue slot is free again
+    future = pool.submit(b"audio", timeout=0)
+    with pytest.raises(ASRBusy):
+        pool.submit(b"audio", timeout=0)
+    pool._finish(future.job_id, "hello", None)
+    assert future.result() == "hello"
+
+
+def test_jobs_held_by_a_dead_worker_are_failed(pool, monkeypatch):
+    respawned = []
+
+    def spawn(index):
+        respawned.append(index)
+        pool._processes[index] = _Process(alive=True)
+
+    monkeypatch.setattr(pool, "_spawn", spawn)
+    future = pool.submit(b"audio", timeout=0)
+    # A worker dequeued the job and died before reporting anything
+    pool._current[0] = pool._context.Array("q", 4, lock=False)
+    pool._current[0][0] = future.job_id
+    pool._spawned[0] = 0
+    pool._ready[0] = 1.0
+    pool._processes[0] = _Process(alive=False)
+    pool._check_workers()
+
+    with pytest.raises(RuntimeError, match="crashed"):
+        future.result(timeout=1)
+    assert respawned == [0]
+    pool.submit(b"audio", timeout=0)
@@ -0,0 +1,141 @@
+import pytest
+
+from movi.assignments import AssignmentError, _overlaps, assign, parse_assignments, shift_minutes
+from movi.db import get_db, get_read_db
+
+
+def run(*assignments, atomic=True):
+    conn = get_db()
+    try:
+        return assign(conn, parse_assignments({"assignments": list(assignments)}), atomic=atomic)
+    finally:
+        conn.close()
+
+
+def deployment(deployment_id):
+    conn = get_read_db()
+    try:
+        row = conn.execute("SELECT vehicle_id, driver_id FROM Deployments WHERE deployment_id = ?",
+                           (deployment_id,)).fetchone()
+        return tuple(row)
+    finally:
+        conn.close()
+
+
+def statuses(summary):
+    return [result["status"] for result in summary["results"]]
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("08:00 AM", 480), ("12:15 AM", 15), ("12:00 PM", 720), ("06:00 PM", 1080), ("18:30", 1110),
+    ("13:00 PM", None), ("25:00", None), ("soon", None), (None, None),
+])
+def test_shift_minutes(text, minutes):
+    assert shift_minutes(text) == minutes
+
+
+def test_overlap_wraps_midnight_and_falls_back_to_equality():
+    assert _overlaps("08:00 AM", "09:00 AM")
+    assert not _overlaps("08:00 AM", "10:00 AM")
+    assert _overlaps("11:30 PM", "12:30 AM")
+    assert _overlaps("after lunch", "after lunch") and not _overlaps("after lunch", "08:00 AM")
+
+
+def test_vehicle_on_overlapping_shift_is_rejected(seeded):
+    # DP001 (T001) already has V001 on the 08:00 AM shift T003 runs too
+    summary = run({"deployment_id": "DP003", "vehicle_id": "V001"})
+    assert summary["applied"] == 0 and statuses(summary) == ["rejected"]
+    assert "'DP001'" in summary["results"][0]["errors"][0]
+    assert deployment("DP003") == (None, None)
+
+
+def test_same_vehicle_on_separate_shifts_is_applied(seeded):
+    summary = run({"trip_id": "T004", "vehicle_id": "V001", "driver_id": "D001"})
+    assert summary["applied"] == 1 and summary["results"][0]["deployment_id"] == "DP004"
+    assert deployment("DP004") == ("V001", "D001")
+
+
+def test_swap_between_overlapping_trips(seeded):
+    assert run({"deployment_id": "DP003", "vehicle_id": "V002", "driver_id": "D003"})["applied"] == 1
+    summary = run(
+        {"deployment_id": "DP001", "vehicle_id": "V002", "driver_id": "D003"},
+        {"deployment_id": "DP003", "vehicle_id": "V001", "driver_id": "D001"},
+    )
+    assert statuses(summary) == ["applied", "applied"]
+    assert deployment("DP001") == ("V002", "D003") and deployment("DP003") == ("V001", "D001")
+
+
+def test_double_booking_within_a_batch(seeded):
+    summary = run(
+        {"deployment_id": "DP001", "driver_id": "D004"},
+        {"deployment_id": "DP003", "driver_id": "D004"},
+        atomic=False,
+    )
+    assert statuses(summary) == ["applied", "rejected"]
+    assert deployment("DP001") == ("V001", "D004") and deployment("DP003") == (None, None)
+
+
+def test_capacity_and_unknown_ids(seeded):
+    summary = run(
+        {"deployment_id": "DP003", "vehicle_id": "V003"},
+        {"deployment_id": "DP004", "vehicle_id": "V004"},
+        {"deployment_id": "DP002", "driver_id": "D999"},
+        {"deployment_id": "DP999", "vehicle_id": "V001"},
+        {"trip_id": "T999", "vehicle_id": "V001"},
+        atomic=False,
+    )
+    messages = [" ".join(result["errors"]) for result in summary["results"]]
+    assert summary["applied"] == 0
+    assert "seats 40" in messages[0] and "seats 4" in messages[1]
+    assert "'D999' not found" in messages[2] and "'DP999' not found" in messages[3]
+    assert "no deployment" in messages[4]
+
+
+def test_atomic_batch_applies_nothing_on_any_rejection(seeded):
+    summary = run(
+        {"deployment_id": "DP004", "vehicle_id": "V003"},
+        {"deployment_id": "DP003", "vehicle_id": "V004"},
+    )
+    assert statuses(summary) == ["valid", "rejected"] and summary["applied"] == 0
+    assert deployment("DP004") == (None, None)
+
+
+def test_rejected_move_keeps_its_booking_in_non_atomic_mode(seeded):
+    # V001 is only free for DP003 if it leaves DP001; the move off DP001 fails on capacity
+    batch = (
+        {"deployment_id": "DP001", "vehicle_id": "V003"},
+        {"deployment_id": "DP003", "vehicle_id": "V001"},
+    )
+    assert statuses(run(*batch, atomic=False)) == ["rejected", "rejected"]
+    assert deployment("DP001") == ("V001", "D001") and deployment("DP003") == (None, None)
+
+
+def test_duplicate_deployment_in_batch(seeded):
+    summary = run(
+        {"deployment_id": "DP004", "vehicle_id": "V003"},
+        {"trip_id": "T004", "driver_id": "D004"},
+        atomic=False,
+    )
+    assert statuses(summary) == ["applied", "rejected"]
+    assert "more than once" in summary["results"][1]["errors"][0]
+
+
+@pytest.mark.parametrize("payload", [
+    None, {}, {"assignments": []}, {"assignments": ["DP001"]},
+    {"assignments": [{"vehicle_id": "V001"}]},
+    {"assignments": [{"deployment_id": "DP001"}]},
+    {"assignments": [{"deployment_id": "DP001", "vehicle_id": 7}]},
+])
+def test_parse_rejects_malformed_bodies(payload):
+    with pytest.raises(AssignmentError):
+        parse_assignments(payload)
+
+
+def test_endpoint_conflict_status(client):
+    conflict = {"assignments": [{"deployment_id": "DP003", "vehicle_id": "V001"}]}
+    assert client.post("/api/deployments/assign", json=conflict).status_code == 409
+    assert client.post("/api/deployments/assign?atomic=0", json=conflict).status_code == 200
+    ok = {"assignments": [{"deployment_id": "DP004", "vehicle_id": "V003"}]}
+    response = client.post("/api/deployments/assign", json=ok)
+    assert response.status_code == 200 and response.get_json()["applied"] == 1
+    assert client.post("/api/deployments/assign", json={}).status_code == 400
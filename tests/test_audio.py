@@ -0,0 +1,57 @@
+import io
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from movi.audio import SAMPLE_RATE, decode_wav  # noqa: E402
+
+
+def wav(frames: bytes, width: int, rate: int = SAMPLE_RATE, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(width)
+        out.setframerate(rate)
+        out.writeframes(frames)
+    return buffer.getvalue()
+
+
+def test_24_bit_samples_are_sign_extended():
+    # -1.0, -0.5, 0, +0.5 and just under +1.0, little-endian 3-byte samples
+    values = [-0x800000, -0x400000, 0, 0x400000, 0x7FFFFF]
+    frames = b"".join((value & 0xFFFFFF).to_bytes(3, "little") for value in values)
+    samples = decode_wav(wav(frames, 3))
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, [-1.0, -0.5, 0.0, 0.5, 1.0], atol=1e-6)
+
+
+def test_8_bit_samples_are_unsigned():
+    samples = decode_wav(wav(bytes([0, 64, 128, 192, 255]), 1))
+    np.testing.assert_allclose(samples, [-1.0, -0.5, 0.0, 0.5, 127 / 128])
+
+
+def test_stereo_is_down_mixed():
+    left, right = np.full(4, 16384, "<i2"), np.full(4, -8192, "<i2")
+    frames = np.column_stack([left, right]).tobytes()
+    samples = decode_wav(wav(frames, 2, channels=2))
+    assert len(samples) == 4
+    np.testing.assert_allclose(samples, 0.125)
+
+
+@pytest.mark.parametrize("rate", [48000, 44100])
+def test_resampled_to_16_khz(rate):
+    # One second of a 440 Hz tone
+    t = np.arange(rate) / rate
+    frames = (np.sin(2 * np.pi * 440 * t) * 16384).astype("<i2").tobytes()
+    samples = decode_wav(wav(frames, 2, rate=rate))
+    assert samples.dtype == np.float32 and len(samples) == SAMPLE_RATE
+    # Still a 440 Hz tone at half scale (1 Hz FFT bins over one second)
+    assert np.argmax(np.abs(np.fft.rfft(samples))) == 440
+    assert np.sqrt(np.mean(samples ** 2)) == pytest.approx(0.5 / np.sqrt(2), rel=0.02)
+
+
+def test_non_pcm_data_is_left_to_ffmpeg():
+    assert decode_wav(b"ID3\x03 not a wav") is None
+    assert decode_wav(b"RIFF\x00\x00\x00\x00WAVEjunk") is None
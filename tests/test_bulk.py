@@ -0,0 +1,133 @@
+import csv
+import io
+
+import pytest
+
+from movi import bulk
+from movi.bulk import BulkError, get_entity, import_records, read_records
+from movi.db import get_db, get_read_db
+
+STOPS_HEADER = "stop_id,name,latitude,longitude\n"
+
+
+def load(entity, body, fmt="csv", **kwargs):
+    spec = get_entity(entity)
+    conn = get_db()
+    try:
+        return import_records(conn, spec, read_records(io.BytesIO(body), fmt, spec), **kwargs)
+    finally:
+        conn.close()
+
+
+def count(table):
+    conn = get_read_db()
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_bad_rows_are_reported_and_skipped(seeded):
+    body = (
+        STOPS_HEADER
+        + "S100,Good,1.0,2.0\n"
+        + "S101,Bad latitude,north,2.0\n"
+        + "S001,Existing key,1.0,2.0\n"
+        + "S100,Repeated key,1.0,2.0\n"
+        + "S102,Too many,1.0,2.0,extra\n"
+        + ",Missing key,1.0,2.0\n"
+        + "S103,Also good,3.0,4.0\n"
+    ).encode()
+    summary = load("stops", body, batch_size=2)
+    assert summary["rows"] == 7 and summary["inserted"] == 2
+    assert [(e["row"], e["message"].split()[0]) for e in summary["errors"]] == [
+        (2, "invalid"), (3, "duplicate"), (4, "duplicate"), (5, "more"), (6, "missing"),
+    ]
+    assert count("Stops") == 8
+
+
+def test_dangling_references_and_unique_columns(seeded):
+    body = "\n".join([
+        '{"deployment_id":"DP100","trip_id":"T003","vehicle_id":"V003","driver_id":"D003"}',
+        '{"deployment_id":"DP101","trip_id":"T999","vehicle_id":null,"driver_id":null}',
+        '{"deployment_id":"DP102","trip_id":"T004","vehicle_id":"V404","driver_id":"D004"}',
+        'not json',
+    ]).encode()
+    summary = load("deployments", body, fmt="ndjson")
+    assert summary["inserted"] == 1
+    assert [e["row"] for e in summary["errors"]] == [2, 3, 4]
+    assert "T999" in summary["errors"][0]["message"] and "V404" in summary["errors"][1]["message"]
+
+    plates = ("vehicle_id,license_plate,type,capacity\n"
+              "V100,KA-01-AB-1234,Bus,40\nV101,KA-09-ZZ-0001,Bus,40\n").encode()
+    summary = load("vehicles", plates)
+    assert summary["inserted"] == 1
+    assert summary["errors"][0]["row"] == 1 and "UNIQUE" in summary["errors"][0]["message"]
+
+
+def test_atomic_import_rolls_back_on_any_error(seeded):
+    body = (STOPS_HEADER + "S100,Good,1.0,2.0\nS101,Bad,x,2.0\n").encode()
+    summary = load("stops", body, atomic=True)
+    assert summary["inserted"] == 0 and summary["error_count"] == 1
+    assert count("Stops") == 6
+
+
+def test_invalid_utf8_ends_the_upload_with_a_row_error(seeded):
+    good = "".join(f"S{i:04d},Stop {i},1.0,2.0\n" for i in range(1000)).encode()
+    body = STOPS_HEADER.encode() + good + "S9999,Caf\xe9,1.0,2.0\n".encode("latin-1")
+    summary = load("stops", body, batch_size=100)
+    error = summary["errors"][-1]
+    assert "UTF-8" in error["message"] and error["row"] == summary["rows"]
+    # Rows decoded before the bad chunk were inserted, nothing after it was read
+    assert summary["inserted"] == summary["rows"] - 1 == count("Stops") - 6
+
+
+def test_unreadable_csv_header_is_a_bulk_error(seeded):
+    spec = get_entity("stops")
+    with pytest.raises(BulkError, match="UTF-8"):
+        list(read_records(io.BytesIO(b"stop_id,n\xffme\n"), "csv", spec))
+
+
+def test_malformed_csv_is_a_row_error(seeded):
+    body = (STOPS_HEADER + "S100,Good,1.0,2.0\n" + f"S101,{'x' * 200},1.0,2.0\n").encode()
+    limit = csv.field_size_limit(100)
+    try:
+        summary = load("stops", body)
+    finally:
+        csv.field_size_limit(limit)
+    assert summary["inserted"] == 1
+    assert summary["errors"] == [{"row": 2, "message": summary["errors"][0]["message"]}]
+    assert "malformed CSV" in summary["errors"][0]["message"]
+
+
+def test_endpoint_reports_bad_encoding_as_400(client):
+    response = client.post("/api/import/stops?format=csv", data=b"stop_id,n\xffme\n")
+    assert response.status_code == 400 and "UTF-8" in response.get_json()["message"]
+
+
+def test_endpoint_bumps_after_a_partial_failure(client, monkeypatch):
+    from movi import query_cache as qc
+
+    flush = bulk._Import._flush
+    calls = []
+
+    def failing_flush(self, batch):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        flush(self, batch)
+
+    monkeypatch.setattr(bulk._Import, "_flush", failing_flush)
+    _, token = qc.query_cache.lookup("SELECT COUNT(*) FROM Stops")
+    conn = get_read_db()
+    with qc.track_tables(conn) as access:
+        result = repr(conn.execute("SELECT COUNT(*) FROM Stops").fetchone()[0])
+    conn.close()
+    qc.query_cache.store(token, access, result)
+    assert qc.query_cache.stats()["entries"] == 1
+    body = STOPS_HEADER + "S100,A,1.0,2.0\nS101,B,1.0,2.0\n"
+    response = client.post("/api/import/stops?format=csv&batch_size=1", data=body)
+    assert response.status_code == 500
+    # The first batch was committed before the failure
+    assert count("Stops") == 7
+    assert qc.query_cache.stats()["entries"] == 0
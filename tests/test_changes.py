@@ -0,0 +1,59 @@
+from movi import changes
+from movi.db import get_db, get_read_db
+
+
+def feed():
+    conn = get_read_db()
+    try:
+        return conn.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM ChangeFeed").fetchone()
+    finally:
+        conn.close()
+
+
+def test_writes_keep_the_feed_at_its_retention_without_subscribers(client, monkeypatch):
+    monkeypatch.setattr(changes, "RETENTION", 10)
+    monkeypatch.setattr(changes, "TRIM_SLACK", 5)
+    for i in range(200):
+        vehicle = "V003" if i % 2 else "V004"
+        assert client.put("/api/deployments/DP004", json={"vehicle_id": vehicle, "driver_id": "D004"}).status_code == 200
+    count, oldest, latest = feed()
+    assert count <= 15 and latest - oldest + 1 == count
+
+    # A client resuming from before the retained window reloads the list
+    response = client.get("/api/changes?since=1").get_json()
+    assert response["reset"] and response["seq"] == latest
+    response = client.get(f"/api/changes?since={latest - 1}").get_json()
+    assert not response["reset"] and [c["trip_id"] for c in response["changes"]] == ["T004"]
+
+
+def append(count):
+    conn = get_db()
+    conn.executemany("INSERT INTO ChangeFeed (trip_id, source) VALUES ('T001', 'test')", [()] * count)
+    conn.commit()
+    conn.close()
+
+
+def test_trim_waits_for_the_slack(seeded, monkeypatch):
+    monkeypatch.setattr(changes, "RETENTION", 10)
+    monkeypatch.setattr(changes, "TRIM_SLACK", 5)
+    conn = get_db()
+    conn.execute("DELETE FROM ChangeFeed")
+    conn.commit()
+    conn.close()
+    append(15)
+    assert changes.trim_feed() == 0
+    append(1)
+    assert changes.trim_feed() == 6
+    count, oldest, latest = feed()
+    assert count == 10 and oldest == latest - 9
+
+
+def test_poll_returns_latest_rows_per_trip(client):
+    head = client.get("/api/changes").get_json()["seq"]
+    client.put("/api/deployments/DP003", json={"vehicle_id": "V002", "driver_id": "D003"})
+    client.put("/api/routes/R001", json={"route_display_name": "Renamed"})
+    response = client.get(f"/api/changes?since={head}").get_json()
+    trips = {change["trip_id"]: change for change in response["changes"]}
+    assert set(trips) == {"T001", "T003"}
+    assert all(row["route_name"] == "Renamed" for change in trips.values() for row in change["rows"])
+    assert trips["T003"]["rows"][0]["vehicle_id"] == "V002"
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+from langgraph.checkpoint.base import empty_checkpoint  # noqa: E402
+
+from movi import checkpoint  # noqa: E402
+from movi.checkpoint import EvictingSqliteSaver  # noqa: E402
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(checkpoint, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def saver(tmp_path, clock):
+    conn = sqlite3.connect(str(tmp_path / "checkpoints.db"), check_same_thread=False)
+    saver = EvictingSqliteSaver(conn, ttl_seconds=3600, max_threads=2, sweep_interval=0)
+    saver.setup()
+    yield saver
+    conn.close()
+
+
+def put(saver, thread_id):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    saver.put(config, empty_checkpoint(), {}, {})
+
+
+def threads(saver, table="checkpoints"):
+    return {row[0] for row in saver.conn.execute(f"SELECT DISTINCT thread_id FROM {table}")}
+
+
+def test_put_evicts_least_recently_used_threads_beyond_the_cap(saver, clock):
+    for thread_id in ("t1", "t2", "t3"):
+        clock.now += 1
+        put(saver, thread_id)
+    assert threads(saver) == threads(saver, "thread_activity") == {"t2", "t3"}
+
+    # Activity on t2 keeps it; t3 is now the oldest
+    clock.now += 1
+    put(saver, "t2")
+    clock.now += 1
+    put(saver, "t4")
+    assert threads(saver) == {"t2", "t4"}
+    assert saver.get_tuple({"configurable": {"thread_id": "t3"}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": "t2"}}) is not None
+
+
+def test_idle_threads_expire_after_the_ttl(saver, clock):
+    put(saver, "old")
+    clock.now += 3000
+    put(saver, "active")
+    clock.now += 1000
+    put(saver, "new")
+    assert threads(saver) == {"active", "new"}
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+
+from movi import context  # noqa: E402
+from movi.context import build_context, message_tokens  # noqa: E402
+
+
+def turn(i, rows=0, words=40):
+    """A user request, a tool call with its result and the answer - about 100 tokens with no rows."""
+    text = " ".join(["word"] * words)
+    messages = [HumanMessage(content=f"question {i} {text}")]
+    if rows:
+        messages += [
+            AIMessage(content="", tool_calls=[{"name": "execute_sql_query", "args": {"q": i}, "id": f"c{i}"}]),
+            ToolMessage(content=json.dumps({"status": "success", "result": [{"row": n} for n in range(rows)]}),
+                        tool_call_id=f"c{i}", name="execute_sql_query"),
+        ]
+    messages.append(AIMessage(content=f"answer {i} {text}"))
+    return messages
+
+
+def history(turns, **kwargs):
+    return [message for i in range(turns) for message in turn(i, **kwargs)]
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    def set_budget(tokens):
+        monkeypatch.setitem(context.NODE_BUDGETS, "test_node", tokens)
+    return set_budget
+
+
+def test_short_history_is_sent_unchanged(budget):
+    budget(10_000)
+    messages = history(3)
+    windowed, update = build_context({"messages": messages}, "test_node")
+    assert windowed == messages and update == {}
+
+
+def test_old_turns_roll_into_the_summary_within_budget(budget):
+    budget(150)
+    messages = history(10, words=20)
+    windowed, update = build_context({"messages": messages}, "test_node")
+
+    summary = windowed[0].content
+    assert summary.startswith("Summary of the earlier conversation:")
+    # The latest turn is always verbatim; everything sent fits the budget
+    assert windowed[-2:] == messages[-2:]
+    assert sum(message_tokens(m) for m in windowed[1:]) <= 150
+    dropped = update["context_summary_upto"]
+    assert 0 < dropped < len(messages) and windowed[1] is messages[dropped]
+    assert "User: question 0" in summary and "Movi: answer 0" in summary
+    assert f"question {dropped // 2}" not in summary
+
+
+def test_each_node_uses_its_own_budget(monkeypatch):
+    monkeypatch.setitem(context.NODE_BUDGETS, "small", 200)
+    monkeypatch.setitem(context.NODE_BUDGETS, "large", 1000)
+    messages = history(10)
+    small, _ = build_context({"messages": messages}, "small")
+    large, _ = build_context({"messages": messages}, "large")
+    assert len(small) < len(large)
+
+
+def test_summary_is_extended_not_rebuilt(budget):
+    budget(300)
+    messages = history(6)
+    _, first = build_context({"messages": messages}, "test_node")
+    state = {"messages": messages + turn(6) + turn(7), **first, "context_summary": "KEPT FROM BEFORE"}
+    windowed, second = build_context(state, "test_node")
+    assert second["context_summary"].startswith("KEPT FROM BEFORE\n")
+    assert second["context_summary_upto"] > first["context_summary_upto"]
+    # Messages already summarized are not summarized again
+    assert "question 0" not in second["context_summary"]
+
+
+def test_old_tool_results_are_compressed(budget):
+    budget(10_000)
+    messages = history(2, rows=10)
+    windowed, _ = build_context({"messages": messages}, "test_node")
+    old, current = windowed[2], windowed[6]
+    payload = json.loads(old.content)
+    assert len(payload["result"]) == context.COMPRESSED_ROWS and "7 more row(s)" in payload["truncated"]
+    assert old.tool_call_id == "c0"
+    # The current turn's result is sent in full
+    assert len(json.loads(current.content)["result"]) == 10
+
+
+def test_summary_is_capped(budget, monkeypatch):
+    monkeypatch.setattr(context, "SUMMARY_MAX_CHARS", 300)
+    budget(100)
+    windowed, update = build_context({"messages": history(20)}, "test_node")
+    assert len(update["context_summary"]) == 300
+    # The newest dropped turns are the ones kept
+    assert update["context_summary"].rstrip().endswith("word")
@@ -0,0 +1,60 @@
+import pytest
+
+from movi import fast_path
+from movi.db import get_read_db
+
+HITS = [
+    ("How many trips are there?", "trip_count"),
+    ("how many trips", "trip_count"),
+    ("Which trips have no vehicle assigned?", "unassigned_trips"),
+    ("List trips without a vehicle", "unassigned_trips"),
+    ("Show unassigned trips", "unassigned_trips"),
+    ("Which trips have not been assigned?", "unassigned_trips"),
+    ("What's the status of T001?", "trip_status"),
+    ("status of trip T002", "trip_status"),
+    ("T003 status", "trip_status"),
+    ("What is the status of the trip 'South Corridor - Evening Shift - Trip 2'?", "trip_status"),
+    ("Which routes are active?", "active_routes"),
+    ("How many active routes are there?", "active_routes"),
+    ("List active routes", "active_routes"),
+    ("What routes are currently active?", "active_routes"),
+]
+
+MISSES = [
+    # Other entities or qualifiers than the canned answer covers
+    "Show vehicles on active routes",
+    "Which drivers are on active routes?",
+    "Which trips are not assigned to driver D001?",
+    "List trips without a driver but with a vehicle",
+    "How many trips are on route R001?",
+    "Which unassigned trips are on the North Corridor?",
+    "Status of T001 and its driver's phone number",
+    "What is the status of trip T999?",
+    # Writes always go through the agent's confirmation flow
+    "Assign vehicle V003 to T003",
+    "Remove the vehicle from T001",
+    # Open-ended
+    "Which driver has the most trips?",
+    "",
+]
+
+
+@pytest.mark.parametrize("question, intent", HITS)
+def test_answers_covered_questions(seeded, question, intent):
+    result = fast_path.answer(question, get_read_db)
+    assert result is not None and result["intent"] == intent
+
+
+@pytest.mark.parametrize("question", MISSES)
+def test_falls_through(seeded, question):
+    assert fast_path.answer(question, get_read_db) is None
+
+
+def test_answers_match_database(seeded):
+    assert fast_path.answer("how many trips", get_read_db)["response"] == "There are 4 trips in total."
+    unassigned = fast_path.answer("Show unassigned trips", get_read_db)["response"]
+    assert "T003" in unassigned and "T004" in unassigned and "T001" not in unassigned
+    status = fast_path.answer("T001 status", get_read_db)["response"]
+    assert "KA-01-AB-1234" in status and "Rajesh Kumar" in status
+    routes = fast_path.answer("Which routes are active?", get_read_db)["response"]
+    assert "R001" in routes and "R003" not in routes
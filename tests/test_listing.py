@@ -0,0 +1,72 @@
+import pytest
+
+from movi.db import get_db
+
+
+@pytest.fixture
+def many_trips(client):
+    """30 trips sharing three display names; every third trip has two deployments."""
+    conn = get_db()
+    for i in range(30):
+        trip_id = f"X{i:03d}"
+        conn.execute("INSERT INTO DailyTrips VALUES (?, 'R001', ?, ?, 'Scheduled')",
+                     (trip_id, f"Shuttle {i % 3}", i))
+        conn.execute("INSERT INTO Deployments VALUES (?, ?, 'V003', NULL)", (f"DX{i:03d}", trip_id))
+        if i % 3 == 0:
+            conn.execute("INSERT INTO Deployments VALUES (?, ?, NULL, 'D003')", (f"DY{i:03d}", trip_id))
+    conn.commit()
+    conn.close()
+    return client
+
+
+def _all_pages(client, url):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def _key(row):
+    return row["trip_id"], row["deployment_id"]
+
+
+def test_pages_cover_duplicate_sort_keys_exactly_once(many_trips):
+    full = many_trips.get("/api/daily-trips").get_json()
+    assert len(full) == 4 + 30 + 10
+    for limit in (1, 4, 7, 44, 100):
+        pages = _all_pages(many_trips, f"/api/daily-trips?limit={limit}")
+        rows = [row for page in pages for row in page]
+        assert [_key(r) for r in rows] == [_key(r) for r in full]
+        assert all(len(page) <= limit for page in pages)
+        assert len(pages) == max(1, -(-len(full) // limit))
+
+
+def test_pages_with_filter_and_projection(many_trips):
+    pages = _all_pages(many_trips, "/api/daily-trips?limit=5&vehicle_id=V003&fields=trip_id,deployment_id")
+    rows = [row for page in pages for row in page]
+    assert {tuple(row) for row in rows} == {("trip_id", "deployment_id")}
+    assert sorted(row["trip_id"] for row in rows) == [f"X{i:03d}" for i in range(30)]
+
+
+def test_cursor_survives_inserts_before_it(many_trips):
+    first = many_trips.get("/api/daily-trips?limit=10")
+    cursor = first.headers["X-Next-Cursor"]
+    conn = get_db()
+    conn.execute("INSERT INTO DailyTrips VALUES ('A000', 'R001', 'AAA first', 10, 'Scheduled')")
+    conn.commit()
+    conn.close()
+    second = many_trips.get(f"/api/daily-trips?limit=10&cursor={cursor}").get_json()
+    seen = {_key(r) for r in first.get_json()}
+    assert not seen & {_key(r) for r in second}
+    assert "A000" not in {r["trip_id"] for r in second}
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=x", "cursor=bm90LWpzb24", "fields=nope", "min_booking=high"])
+def test_invalid_parameters(many_trips, query):
+    response = many_trips.get(f"/api/daily-trips?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+from movi.llm_gate import ConcurrencyGate
+
+
+class Tracker:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        with self._lock:
+            self.current -= 1
+
+
+def test_sync_and_async_callers_share_one_limit():
+    gate, tracker = ConcurrencyGate(3), Tracker()
+
+    def sync_call():
+        with gate:
+            tracker.enter()
+            time.sleep(0.02)
+            tracker.exit()
+
+    async def async_call():
+        async with gate:
+            tracker.enter()
+            await asyncio.sleep(0.02)
+            tracker.exit()
+
+    async def run_async():
+        await asyncio.gather(*(async_call() for _ in range(12)))
+
+    threads = [threading.Thread(target=sync_call) for _ in range(12)]
+    threads.append(threading.Thread(target=asyncio.run, args=(run_async(),)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tracker.peak == 3
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    gate = ConcurrencyGate(1)
+
+    async def scenario():
+        async with gate:
+            waiter = asyncio.ensure_future(gate.__aenter__())
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        # The slot is free again once the cancelled waiter's thread hands it back
+        await asyncio.wait_for(gate.__aenter__(), timeout=1)
+        await gate.__aexit__(None, None, None)
+
+    asyncio.run(scenario())
+    assert gate._slots.acquire(blocking=False)
@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+
+from conftest import seed
+from movi.migrations import LATEST_VERSION, MIGRATIONS, check_query_plans, drop_all, get_version, migrate
+from movi.stats import check_stats
+
+# The schema the original init_db() created, before versioned migrations
+BASELINE_SCHEMA = '''
+    CREATE TABLE Stops (stop_id TEXT PRIMARY KEY, name TEXT NOT NULL,
+                        latitude REAL NOT NULL, longitude REAL NOT NULL);
+    CREATE TABLE Paths (path_id TEXT PRIMARY KEY, path_name TEXT NOT NULL,
+                        ordered_list_of_stop_ids TEXT NOT NULL);
+    CREATE TABLE Routes (route_id TEXT PRIMARY KEY, path_id TEXT NOT NULL, route_display_name TEXT NOT NULL,
+                         shift_time TEXT NOT NULL, direction TEXT NOT NULL, start_point TEXT NOT NULL,
+                         end_point TEXT NOT NULL, capacity INTEGER NOT NULL, allowed_waitlist INTEGER NOT NULL,
+                         status TEXT NOT NULL DEFAULT 'active', FOREIGN KEY (path_id) REFERENCES Paths(path_id));
+    CREATE TABLE Vehicles (vehicle_id TEXT PRIMARY KEY, license_plate TEXT NOT NULL UNIQUE,
+                           type TEXT NOT NULL, capacity INTEGER NOT NULL);
+    CREATE TABLE Drivers (driver_id TEXT PRIMARY KEY, name TEXT NOT NULL, phone_number TEXT NOT NULL);
+    CREATE TABLE DailyTrips (trip_id TEXT PRIMARY KEY, route_id TEXT NOT NULL, display_name TEXT NOT NULL,
+                             booking_status_percentage INTEGER NOT NULL, live_status TEXT NOT NULL,
+                             FOREIGN KEY (route_id) REFERENCES Routes(route_id));
+    CREATE TABLE Deployments (deployment_id TEXT PRIMARY KEY, trip_id TEXT NOT NULL, vehicle_id TEXT,
+                              driver_id TEXT, FOREIGN KEY (trip_id) REFERENCES DailyTrips(trip_id),
+                              FOREIGN KEY (vehicle_id) REFERENCES Vehicles(vehicle_id),
+                              FOREIGN KEY (driver_id) REFERENCES Drivers(driver_id));
+'''
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    conn = sqlite3.connect(tmp_path / "baseline.db")
+    conn.executescript(BASELINE_SCHEMA)
+    seed(conn)
+    yield conn
+    conn.close()
+
+
+def _dump(conn, table):
+    return conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall()
+
+
+def test_upgrade_keeps_data_and_fills_derived_tables(baseline):
+    before = {table: _dump(baseline, table) for table in ("Stops", "Paths", "Routes", "DailyTrips", "Deployments")}
+    assert get_version(baseline) == 0
+
+    assert migrate(baseline) == LATEST_VERSION
+    for table, rows in before.items():
+        assert _dump(baseline, table) == rows
+    assert baseline.execute(
+        "SELECT group_concat(stop_id) FROM (SELECT stop_id FROM PathStops WHERE path_id = 'P001' ORDER BY seq)"
+    ).fetchone()[0] == "S001,S002,S004,S003"
+    assert check_stats(baseline) == []
+    assert [(name, problems) for name, _, problems in check_query_plans(baseline) if problems] == []
+
+
+def test_migrate_is_idempotent(baseline):
+    migrate(baseline)
+    schema = _dump(baseline, "sqlite_master")
+    assert migrate(baseline) == LATEST_VERSION
+    assert _dump(baseline, "sqlite_master") == schema
+
+
+def test_stepwise_upgrade_matches_direct(baseline, tmp_path):
+    for version, _, _ in MIGRATIONS:
+        assert migrate(baseline, target=version) == version
+    direct = sqlite3.connect(tmp_path / "direct.db")
+    direct.executescript(BASELINE_SCHEMA)
+    seed(direct)
+    migrate(direct)
+    schema = "SELECT type, name, sql FROM sqlite_master ORDER BY type, name"
+    assert baseline.execute(schema).fetchall() == direct.execute(schema).fetchall()
+    direct.close()
+
+
+def test_triggers_work_after_upgrade(baseline):
+    migrate(baseline)
+    baseline.execute("UPDATE Deployments SET vehicle_id = 'V003', driver_id = 'D003' WHERE trip_id = 'T003'")
+    baseline.execute("INSERT INTO Paths VALUES ('P009', 'Loop', '[\"S005\", \"S001\"]')")
+    baseline.commit()
+    assert check_stats(baseline) == []
+    assert baseline.execute("SELECT COUNT(*) FROM PathStops WHERE path_id = 'P009'").fetchone()[0] == 2
+    assert baseline.execute("SELECT COUNT(*) FROM ChangeFeed WHERE trip_id = 'T003'").fetchone()[0] == 1
+
+
+def test_drop_all_resets(baseline):
+    migrate(baseline)
+    drop_all(baseline)
+    assert get_version(baseline) == 0
+    assert migrate(baseline) == LATEST_VERSION
+    assert baseline.execute("SELECT COUNT(*) FROM Stops").fetchone()[0] == 0
@@ -0,0 +1,141 @@
+import sqlite3
+
+import pytest
+
+from movi import query_cache as qc
+from movi.db import database_path, get_db, get_read_db
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = qc.QueryCache()
+    monkeypatch.setattr(qc, "query_cache", cache)
+    return cache
+
+
+def query(cache, sql):
+    """What execute_sql_query does: a cached result, or run and store."""
+    cached, token = cache.lookup(sql)
+    if cached is not None:
+        return cached, True
+    conn = get_read_db()
+    with qc.track_tables(conn) as access:
+        result = repr([tuple(row) for row in conn.execute(sql)])
+    conn.close()
+    cache.store(token, access, result)
+    return result, False
+
+
+def write(sql, params=()):
+    """What execute_sql_write does."""
+    conn = get_db()
+    with qc.track_tables(conn) as access:
+        conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+    qc.bump_for_access(access)
+    return access
+
+
+def test_repeat_query_hits(seeded, cache):
+    sql = "SELECT * FROM Vehicles WHERE type = 'Bus'"
+    first, hit = query(cache, sql)
+    assert not hit
+    again, hit = query(cache, "select *  from vehicles where type = 'Bus';")
+    assert hit and again == first
+
+
+def test_comma_join_invalidated_by_second_table(seeded, cache):
+    sql = "SELECT dt.trip_id, d.vehicle_id FROM DailyTrips dt, Deployments d WHERE dt.trip_id = d.trip_id"
+    before, _ = query(cache, sql)
+    write("UPDATE Deployments SET vehicle_id = 'V003' WHERE deployment_id = 'DP003'")
+    after, hit = query(cache, sql)
+    assert not hit
+    assert "V003" in after and after != before
+
+
+def test_update_or_ignore_invalidates_target(seeded, cache):
+    sql = "SELECT vehicle_id FROM Deployments WHERE deployment_id = 'DP004'"
+    query(cache, sql)
+    access = write("UPDATE OR IGNORE Deployments SET vehicle_id = 'V003' WHERE deployment_id = 'DP004'")
+    assert "deployments" in access.writes
+    result, hit = query(cache, sql)
+    assert not hit and "V003" in result
+
+
+def test_schema_qualified_name(seeded, cache):
+    sql = "SELECT COUNT(*) FROM main.Vehicles"
+    query(cache, sql)
+    write("INSERT INTO Vehicles VALUES ('V009', 'KA-09-ZZ-0001', 'Cab', 4)")
+    result, hit = query(cache, sql)
+    assert not hit and "5" in result
+
+
+def test_trigger_writes_are_tracked(seeded, cache):
+    sql = "SELECT total_vehicles FROM DashboardStats"
+    query(cache, sql)
+    access = write("DELETE FROM Vehicles WHERE vehicle_id = 'V004'")
+    assert {"vehicles", "dashboardstats"} <= access.writes
+    result, hit = query(cache, sql)
+    assert not hit and "3" in result
+
+
+def test_unrelated_write_keeps_entry(seeded, cache):
+    sql = "SELECT * FROM Drivers"
+    query(cache, sql)
+    write("UPDATE Routes SET status = 'active' WHERE route_id = 'R003'")
+    assert query(cache, sql)[1]
+
+
+def test_schema_change_invalidates_everything(seeded, cache):
+    sql = "SELECT * FROM Drivers"
+    query(cache, sql)
+    access = write("CREATE TABLE Scratch (x)")
+    assert access.uncertain
+    assert not query(cache, sql)[1]
+
+
+def test_volatile_and_tableless_queries_not_cached(seeded, cache):
+    for sql in ("SELECT random() FROM Vehicles", "SELECT 1", "SELECT date('now') FROM Drivers"):
+        query(cache, sql)
+        assert not query(cache, sql)[1]
+
+
+def test_write_during_query_is_not_stored(seeded, cache):
+    sql = "SELECT * FROM Deployments"
+    _, token = cache.lookup(sql)
+    conn = get_read_db()
+    with qc.track_tables(conn) as access:
+        result = repr([tuple(row) for row in conn.execute(sql)])
+    conn.close()
+    write("UPDATE Deployments SET driver_id = 'D003' WHERE deployment_id = 'DP003'")
+    cache.store(token, access, result)
+    assert not query(cache, sql)[1]
+
+
+def test_write_from_another_connection_invalidates(seeded, cache):
+    sql = "SELECT driver_id FROM Deployments WHERE deployment_id = 'DP003'"
+    query(cache, sql)
+    # A worker process or the sqlite3 CLI: nothing in this process is told
+    conn = sqlite3.connect(database_path())
+    conn.execute("UPDATE Deployments SET driver_id = 'D003' WHERE deployment_id = 'DP003'")
+    conn.commit()
+    conn.close()
+    result, hit = query(cache, sql)
+    assert not hit and "D003" in result
+
+
+def test_schema_change_from_another_connection_invalidates(seeded, cache):
+    sql = "SELECT * FROM Drivers"
+    query(cache, sql)
+    conn = sqlite3.connect(database_path())
+    conn.execute("CREATE TABLE Scratch (x)")
+    conn.commit()
+    conn.close()
+    assert not query(cache, sql)[1]
+
+
+def test_unversioned_tables_not_cached(seeded, cache):
+    sql = "SELECT COUNT(*) FROM ChangeFeed"
+    query(cache, sql)
+    assert not query(cache, sql)[1]
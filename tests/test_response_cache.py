@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from movi.db import database_path, get_read_db
+from movi.query_cache import track_tables
+
+
+def test_not_modified_until_a_table_changes(client):
+    first = client.get("/api/daily-trips")
+    etag = first.headers["ETag"]
+    again = client.get("/api/daily-trips", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+    client.put("/api/deployments/DP003", json={"vehicle_id": "V003", "driver_id": "D003"})
+    changed = client.get("/api/daily-trips", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_route_rename_changes_daily_trips(client):
+    etag = client.get("/api/daily-trips").headers["ETag"]
+    client.put("/api/routes/R001", json={"route_display_name": "RENAMED"})
+    response = client.get("/api/daily-trips", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert {row["route_name"] for row in response.get_json() if row["route_id"] == "R001"} == {"RENAMED"}
+
+
+def test_external_writer_invalidates(client, seeded):
+    etag = client.get("/api/vehicles").headers["ETag"]
+    # Another process or tool: no pooled connection, no in-process bump
+    conn = sqlite3.connect(seeded)
+    conn.execute("UPDATE Vehicles SET capacity = 50 WHERE vehicle_id = 'V001'")
+    conn.commit()
+    conn.close()
+    response = client.get("/api/vehicles", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert next(v for v in response.get_json() if v["vehicle_id"] == "V001")["capacity"] == 50
+
+
+def test_unrelated_write_keeps_etag(client):
+    etag = client.get("/api/daily-trips").headers["ETag"]
+    client.post("/api/import/stops?format=ndjson", data='{"stop_id":"S100","name":"New","latitude":1,"longitude":2}')
+    assert client.get("/api/daily-trips", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_stats_follow_trigger_maintained_tables(client):
+    etag = client.get("/api/stats").headers["ETag"]
+    client.delete("/api/deployments/DP001")
+    response = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.get_json()["assigned_trips"] == 1
+
+
+@pytest.mark.parametrize("endpoint, spec_name", [
+    ("get_stops", "STOPS_LIST"),
+    ("get_vehicles", "VEHICLES_LIST"),
+    ("get_drivers", "DRIVERS_LIST"),
+    ("get_deployments", "DEPLOYMENTS_LIST"),
+    ("get_daily_trips", "DAILY_TRIPS_LIST"),
+])
+def test_declared_tables_cover_list_queries(client, endpoint, spec_name):
+    import app
+
+    spec = getattr(app, spec_name)
+    declared = {table.lower() for table in app.app.view_functions[endpoint].cached_tables}
+    # Every filter on, so the tables only they read are seen too
+    args = {name: "1" if convert is None else "0" for name, (_, convert) in spec.filters.items()}
+    conn = get_read_db()
+    with track_tables(conn) as access:
+        cursor, _, _ = spec.page(conn, args)
+        cursor.fetchall()
+    conn.close()
+    assert access.reads <= declared
+
+
+def test_etag_is_the_same_in_another_process(client):
+    etag = client.get("/api/vehicles").headers["ETag"]
+    # A second worker, or this one after a restart
+    code = ("from movi.response_cache import ResponseCache; "
+            "print(ResponseCache().etag('/api/vehicles?', ('Vehicles', 'Deployments')))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    other = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True,
+                           env={**os.environ, "MOVI_DATABASE": database_path()})
+    assert f'"{other.stdout.strip()}"' == etag
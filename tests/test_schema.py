@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+from movi import query_cache as qc
+from movi.db import get_db
+from movi.schema import PROMPT_TABLES, get_schema_text
+
+
+def test_prompt_lists_only_user_tables(seeded):
+    text = get_schema_text(seeded)
+    described = [line.split("(", 1)[0] for line in text.splitlines()[1:]]
+    assert described == list(PROMPT_TABLES)
+    for internal in ("DashboardStats", "RouteStats", "ChangeFeed", "sqlite_sequence"):
+        assert internal not in text
+
+
+def test_prompt_rebuilt_after_schema_change(seeded):
+    conn = get_db()
+    conn.execute("ALTER TABLE Drivers ADD COLUMN license_no TEXT")
+    conn.commit()
+    conn.close()
+    assert "license_no" in get_schema_text(seeded)
+
+
+def test_direct_writes_to_trigger_tables_refused(seeded):
+    conn = get_db()
+    try:
+        for sql in ("UPDATE DashboardStats SET total_trips = 0",
+                    "DELETE FROM PathStops",
+                    "INSERT INTO RouteStats VALUES ('R009', 1, 10)"):
+            with qc.track_tables(conn, read_only=qc.TRIGGER_MAINTAINED) as access:
+                with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+                    conn.execute(sql)
+            assert access.denied
+        # Trigger writes to the same tables still go through
+        with qc.track_tables(conn, read_only=qc.TRIGGER_MAINTAINED) as access:
+            conn.execute("UPDATE Paths SET ordered_list_of_stop_ids = '[\"S001\"]' WHERE path_id = 'P002'")
+        conn.commit()
+        assert "pathstops" in access.writes and not access.denied
+        assert conn.execute("SELECT COUNT(*) FROM PathStops WHERE path_id = 'P002'").fetchone()[0] == 1
+    finally:
+        conn.close()
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from movi import snapshot
+from movi.db import get_db
+
+
+@pytest.fixture
+def snapshots(seeded, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(snapshot, "_current", None)
+    monkeypatch.setattr(snapshot, "_previous", None)
+    yield
+    finish()
+
+
+def finish():
+    builder = snapshot._builder
+    if builder is not None:
+        builder.join(10)
+
+
+def write():
+    conn = get_db()
+    conn.execute("UPDATE Routes SET status = 'active' WHERE route_id = 'R003'")
+    conn.commit()
+    conn.close()
+
+
+def test_first_request_waits_for_the_background_build(snapshots):
+    assert snapshot.get_snapshot() is None
+    finish()
+    first = snapshot.get_snapshot()
+    assert first is not None and snapshot.get_snapshot() is first
+
+
+def test_previous_snapshot_served_while_rebuilding(snapshots, monkeypatch):
+    snapshot.get_snapshot()
+    finish()
+    first = snapshot.get_snapshot()
+
+    build, release = snapshot._build, threading.Event()
+
+    def slow_build(db_path, version):
+        release.wait(10)
+        return build(db_path, version)
+
+    monkeypatch.setattr(snapshot, "_build", slow_build)
+    write()
+    # The request does not wait on the copy: it gets the previous snapshot
+    assert snapshot.get_snapshot() is first and snapshot._builder is not None
+    release.set()
+    finish()
+    second = snapshot.get_snapshot()
+    assert second is not first and second.etag != first.etag
+
+
+def test_export_endpoint_answers_202_until_built(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(snapshot, "_current", None)
+    response = client.get("/api/export/db")
+    assert response.status_code == 202 and response.headers["Retry-After"]
+    finish()
+    response = client.get("/api/export/db")
+    assert response.status_code == 200 and response.headers["ETag"]
+    response.close()
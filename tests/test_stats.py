@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from movi.db import get_db
+from movi.stats import check_stats, read_stats, rebuild_stats, recompute
+
+
+def _random_write(conn, rng, n):
+    trips = [r[0] for r in conn.execute("SELECT trip_id FROM DailyTrips")]
+    vehicles = [r[0] for r in conn.execute("SELECT vehicle_id FROM Vehicles")] + [None]
+    drivers = [r[0] for r in conn.execute("SELECT driver_id FROM Drivers")] + [None]
+    deployments = [r[0] for r in conn.execute("SELECT deployment_id FROM Deployments")]
+    routes = ["R001", "R002", "R003"]
+    choice = rng.randrange(11)
+    if choice == 0:
+        conn.execute("INSERT INTO DailyTrips VALUES (?, ?, 'Trip', ?, 'Scheduled')",
+                     (f"TX{n}", rng.choice(routes), rng.randrange(101)))
+    elif choice == 1 and trips:
+        trip = rng.choice(trips)
+        conn.execute("DELETE FROM Deployments WHERE trip_id = ?", (trip,))
+        conn.execute("DELETE FROM DailyTrips WHERE trip_id = ?", (trip,))
+    elif choice == 2 and trips:
+        conn.execute("UPDATE DailyTrips SET route_id = ?, booking_status_percentage = ? WHERE trip_id = ?",
+                     (rng.choice(routes), rng.randrange(101), rng.choice(trips)))
+    elif choice == 3 and trips:
+        conn.execute("INSERT INTO Deployments VALUES (?, ?, ?, ?)",
+                     (f"DX{n}", rng.choice(trips), rng.choice(vehicles), rng.choice(drivers)))
+    elif choice == 4 and deployments:
+        conn.execute("UPDATE Deployments SET vehicle_id = ?, driver_id = ? WHERE deployment_id = ?",
+                     (rng.choice(vehicles), rng.choice(drivers), rng.choice(deployments)))
+    elif choice == 5 and deployments and trips:
+        conn.execute("UPDATE Deployments SET trip_id = ? WHERE deployment_id = ?",
+                     (rng.choice(trips), rng.choice(deployments)))
+    elif choice == 6 and deployments:
+        conn.execute("DELETE FROM Deployments WHERE deployment_id = ?", (rng.choice(deployments),))
+    elif choice == 7:
+        conn.execute("INSERT INTO Vehicles VALUES (?, ?, 'Cab', 4)", (f"VX{n}", f"KA-X-{n}"))
+    elif choice == 8 and len(vehicles) > 1:
+        vehicle = rng.choice(vehicles[:-1])
+        conn.execute("UPDATE Deployments SET vehicle_id = NULL WHERE vehicle_id = ?", (vehicle,))
+        conn.execute("DELETE FROM Vehicles WHERE vehicle_id = ?", (vehicle,))
+    elif choice == 9:
+        conn.execute("INSERT INTO Drivers VALUES (?, 'Driver', '+91')", (f"DRX{n}",))
+    elif choice == 10 and deployments:
+        # REPLACE deletes the old row first (recursive_triggers keeps the counters right)
+        conn.execute("INSERT OR REPLACE INTO Deployments VALUES (?, ?, ?, ?)",
+                     (rng.choice(deployments), rng.choice(trips), rng.choice(vehicles), rng.choice(drivers)))
+
+
+@pytest.mark.parametrize("seed_value", range(5))
+def test_consistent_after_random_writes(seeded, seed_value):
+    rng = random.Random(seed_value)
+    conn = get_db()
+    try:
+        for n in range(300):
+            _random_write(conn, rng, n)
+            if rng.random() < 0.2:
+                conn.rollback()
+            else:
+                conn.commit()
+            if n % 25 == 0:
+                assert check_stats(conn) == []
+        assert check_stats(conn) == []
+    finally:
+        conn.close()
+
+
+def test_read_stats_matches_recompute(seeded):
+    conn = get_db()
+    stats = read_stats(conn)
+    assert stats == recompute(conn)
+    assert stats["total_trips"] == 4 and stats["assigned_trips"] == 2 and stats["idle_vehicles"] == 2
+    assert [r["route_id"] for r in stats["routes"]] == ["R001", "R002"]
+    conn.close()
+
+
+def test_rebuild_repairs_drift(seeded):
+    conn = get_db()
+    # Simulates writes made with the triggers missing (e.g. an old client's schema)
+    conn.execute("UPDATE DashboardStats SET total_trips = 99")
+    conn.execute("DELETE FROM RouteStats")
+    conn.commit()
+    assert check_stats(conn)
+    rebuild_stats(conn)
+    conn.commit()
+    assert check_stats(conn) == []
+    conn.close()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.tools import tool  # noqa: E402
+
+from movi import tool_node  # noqa: E402
+from movi.tool_node import make_tool_node  # noqa: E402
+
+
+def calls(*specs):
+    return AIMessage(content="", tool_calls=[
+        {"name": name, "args": args, "id": f"call-{i}"} for i, (name, args) in enumerate(specs)
+    ])
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    # A fresh pool wide enough for every call in a test to run at once
+    monkeypatch.setattr(tool_node, "TOOL_PARALLELISM", 4)
+    monkeypatch.setattr(tool_node, "_executor", None)
+    barrier = threading.Barrier(3, timeout=5)
+    order = []
+
+    @tool
+    def lookup(key: str, delay: float) -> str:
+        """Read-only lookup."""
+        # All three reads must be running at once to get past the barrier
+        barrier.wait()
+        time.sleep(delay)
+        order.append(key)
+        return f"value of {key}"
+
+    @tool
+    def update(key: str) -> str:
+        """A write."""
+        order.append(f"update {key}")
+        return "ok"
+
+    yield make_tool_node([lookup, update], read_only={"lookup"}), order
+    if tool_node._executor is not None:
+        tool_node._executor.shutdown()
+
+
+def test_parallel_results_keep_the_call_order(tools):
+    node, order = tools
+    message = calls(("lookup", {"key": "a", "delay": 0.2}), ("lookup", {"key": "b", "delay": 0.1}),
+                    ("lookup", {"key": "c", "delay": 0}))
+    results = node({"messages": [message]})["messages"]
+    # Finished in reverse, returned in call order
+    assert order == ["c", "b", "a"]
+    assert [r.tool_call_id for r in results] == ["call-0", "call-1", "call-2"]
+    assert [r.content for r in results] == ["value of a", "value of b", "value of c"]
+    assert all(r.status == "success" and "elapsed_ms" in r.response_metadata for r in results)
+
+
+def test_batches_with_a_write_run_in_order(tools):
+    node, order = tools
+    message = calls(("update", {"key": "a"}), ("missing", {}), ("update", {"key": "b"}))
+    results = node({"messages": [message]})["messages"]
+    assert order == ["update a", "update b"]
+    assert [r.status for r in results] == ["success", "error", "success"]
+    assert "not a valid tool" in results[1].content
@@ -0,0 +1,78 @@
+import os
+import threading
+
+import pytest
+
+from movi.transcript_cache import TranscriptCache, cache_key
+
+
+def disk_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.endswith(".txt"))
+
+
+def test_rewriting_a_key_counts_its_size_once(tmp_path):
+    cache = TranscriptCache(max_entries=0, disk_dir=str(tmp_path))
+    for text in ("short", "a much longer transcript", "mid length"):
+        cache.put("k1", text)
+    cache.put("k2", "other")
+    assert cache.stats()["disk_bytes"] == disk_size(tmp_path) == len("mid length") + len("other")
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = TranscriptCache(max_entries=0, disk_dir=str(tmp_path), disk_max_bytes=100)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 30)
+        os.utime(tmp_path / f"k{i}.txt", (i, i))
+    stats = cache.stats()
+    assert stats["disk_bytes"] == disk_size(tmp_path) <= 90 and stats["evicted_disk"] > 0
+    assert cache.get("k0") is None and cache.get("k4") == "x" * 30
+
+
+def test_shared_between_instances_on_disk(tmp_path):
+    TranscriptCache(max_entries=0, disk_dir=str(tmp_path)).put("k", "hello")
+    other = TranscriptCache(disk_dir=str(tmp_path))
+    assert other.stats()["disk_bytes"] == 5
+    assert other.get("k") == "hello" and other.get("k") == "hello"
+    assert other.stats()["hit_disk"] == 1 and other.stats()["hit_memory"] == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = TranscriptCache(disk_dir="")
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "text"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == ["text", "text"] and len(calls) == 1
+
+
+def test_failed_compute_stores_nothing():
+    cache = TranscriptCache(disk_dir="")
+
+    def compute():
+        raise RuntimeError("whisper failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", compute)
+    assert cache.get("k") is None
+
+
+def test_key_covers_model_and_options():
+    np = pytest.importorskip("numpy")
+    samples = np.zeros(16000, dtype=np.float32)
+    key = cache_key(samples, "base")
+    assert key == cache_key(samples.copy(), "base", {})
+    assert key != cache_key(samples, "small") and key != cache_key(samples, "base", {"language": "en"})
+    assert key != cache_key(np.ones(16000, dtype=np.float32), "base")
@@ -0,0 +1,33 @@
+import io
+
+import pytest
+
+
+def movi_request(app_module):
+    from werkzeug.datastructures import FileStorage, MultiDict
+
+    files = MultiDict({"audio": FileStorage(io.BytesIO(b"RIFF"), filename="voice.wav")})
+    return app_module._collect_movi_request(MultiDict(), files, {})
+
+
+@pytest.fixture
+def app_module(client):
+    import app
+
+    return app
+
+
+def test_audio_not_reported_as_saved_without_persistence(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "PERSIST_UPLOADS", False)
+    saved, args = movi_request(app_module)
+    assert "audio" not in saved
+    assert args["message_type"] == "audio" and args["audio_data"] == b"RIFF"
+
+
+def test_persisted_audio_is_reported(app_module, monkeypatch):
+    written = []
+    monkeypatch.setattr(app_module, "PERSIST_UPLOADS", True)
+    monkeypatch.setattr(app_module, "_write_upload", lambda *args: written.append(args))
+    saved, _ = movi_request(app_module)
+    app_module._upload_writer.submit(lambda: None).result(5)
+    assert [name for _, name, _ in written] == [saved["audio"]]
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from movi import warmup
+
+
+@pytest.fixture
+def components(monkeypatch):
+    """Replaces the real warm-ups with ones the test releases."""
+    gates = {name: threading.Event() for name in warmup.COMPONENTS}
+    outcomes = {}
+
+    def fake(name):
+        def warm():
+            gates[name].wait(5)
+            if name in outcomes:
+                raise outcomes[name]
+        return warm
+
+    monkeypatch.setattr(warmup, "COMPONENTS", {name: fake(name) for name in warmup.COMPONENTS})
+    monkeypatch.setattr(warmup, "_state", {
+        name: {"status": "pending", "seconds": None, "error": None} for name in warmup.COMPONENTS
+    })
+    monkeypatch.setattr(warmup, "_started", False)
+    monkeypatch.setattr(warmup, "ENABLED", True)
+    monkeypatch.setattr(warmup, "REQUIRED", {"chat", "asr"})
+    yield gates, outcomes
+    for gate in gates.values():
+        gate.set()
+
+
+def finish(name, gates):
+    gates[name].set()
+    for thread in threading.enumerate():
+        if thread.name == f"movi-warmup-{name}":
+            thread.join(5)
+
+
+def statuses():
+    return {name: state["status"] for name, state in warmup.readiness()["components"].items()}
+
+
+def test_not_ready_until_the_required_components_are_warm(components):
+    gates, _ = components
+    assert not warmup.readiness()["ready"]
+    warmup.start_warmup()
+    assert not warmup.readiness()["ready"]
+    finish("chat", gates)
+    assert not warmup.readiness()["ready"] and statuses()["chat"] == "ready"
+    finish("asr", gates)
+    # TTS is optional: still loading, but the instance is ready
+    readiness = warmup.readiness()
+    assert readiness["ready"] and statuses()["tts"] in ("pending", "loading")
+    assert not readiness["components"]["tts"]["required"] and readiness["components"]["asr"]["seconds"] is not None
+
+
+def test_unavailable_counts_as_done_but_failed_does_not(components):
+    gates, outcomes = components
+    outcomes["asr"] = warmup._Unavailable("whisper is not installed")
+    outcomes["chat"] = RuntimeError("no API key")
+    warmup.start_warmup()
+    finish("asr", gates)
+    finish("chat", gates)
+    readiness = warmup.readiness()
+    assert statuses()["asr"] == "unavailable" and statuses()["chat"] == "failed"
+    assert readiness["components"]["chat"]["error"] == "no API key"
+    assert not readiness["ready"]
+
+
+def test_disabled_warmup_reports_skipped_and_ready(components, monkeypatch):
+    monkeypatch.setattr(warmup, "ENABLED", False)
+    warmup.start_warmup()
+    assert set(statuses().values()) == {"skipped"} and warmup.readiness()["ready"]
+
+
+def test_ready_endpoint_answers_503_until_ready(components, client):
+    gates, _ = components
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503 and not response.get_json()["ready"]
+    finish("chat", gates)
+    finish("asr", gates)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200 and response.get_json()["components"]["asr"]["status"] == "ready"